@@ -0,0 +1,284 @@
+"""
+Admission control for the conversation routes
+Every /chat, /chat/stream and /webhook request passes these checks, cheapest
+first, before any intent work is done:
+
+    queue        the request waited longer than AMIGO_MAX_QUEUE_MS in front of
+                 the app (from the proxy's X-Request-Start header)
+    concurrency  this process already serves AMIGO_MAX_IN_FLIGHT requests
+    overload     between AMIGO_SHED_START and AMIGO_MAX_IN_FLIGHT requests in
+                 flight, a rising fraction of requests is shed early
+    ip_rate      the client address exceeded its token bucket (chat routes only;
+                 webhook calls all come from Dialogflow's servers)
+    session_rate the session exceeded its token bucket
+
+A rejected request gets a precomputed supportive reply that includes the 988
+crisis line, and is counted in amigo_admission_rejections_total. Configured
+through environment variables:
+
+    AMIGO_ADMISSION        on (default) or off
+    AMIGO_SESSION_RATE     sustained requests per second per session (default 1)
+    AMIGO_SESSION_BURST    requests a session may send at once (default 10)
+    AMIGO_IP_RATE          sustained requests per second per client address (default 5)
+    AMIGO_IP_BURST         requests a client address may send at once (default 30)
+    AMIGO_MAX_IN_FLIGHT    requests served concurrently per process (default 64)
+    AMIGO_SHED_START       in-flight requests where early shedding starts (default 80% of the maximum)
+    AMIGO_MAX_QUEUE_MS     longest acceptable wait before the app (default 2000)
+    AMIGO_FORWARDED_HOPS   trusted proxies in front of the app, for the client address (default 0)
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import REGISTRY
+from responses import get_crisis_resources
+
+ADMISSION_ENABLED = os.environ.get("AMIGO_ADMISSION", "on").lower() not in ('off', '0', 'false')
+SESSION_RATE = float(os.environ.get("AMIGO_SESSION_RATE", "1"))
+SESSION_BURST = float(os.environ.get("AMIGO_SESSION_BURST", "10"))
+IP_RATE = float(os.environ.get("AMIGO_IP_RATE", "5"))
+IP_BURST = float(os.environ.get("AMIGO_IP_BURST", "30"))
+MAX_IN_FLIGHT = int(os.environ.get("AMIGO_MAX_IN_FLIGHT", "64"))
+SHED_START = int(os.environ.get("AMIGO_SHED_START", str(MAX_IN_FLIGHT * 4 // 5)))
+MAX_QUEUE_MS = float(os.environ.get("AMIGO_MAX_QUEUE_MS", "2000"))
+FORWARDED_HOPS = int(os.environ.get("AMIGO_FORWARDED_HOPS", "0"))
+
+# Buckets remembered per limiter; the least recently seen keys are forgotten first
+MAX_TRACKED_KEYS = 100000
+
+# Routes admission control applies to, and those limited per client address
+ADMISSION_ROUTES = frozenset(['/chat', '/chat/stream', '/webhook'])
+IP_LIMITED_ROUTES = frozenset(['/chat', '/chat/stream'])
+
+# Rejections answered 429 (this client is too fast) rather than 503 (the server is too busy)
+RATE_LIMIT_REASONS = frozenset(['ip_rate', 'session_rate'])
+
+ADMISSION_REJECTIONS = REGISTRY.counter(
+    'amigo_admission_rejections_total', 'Requests shed by admission control', ('route', 'reason')
+)
+
+
+def _build_busy_text():
+    """Compose the overload reply once, with the crisis lines from the response catalog"""
+    crisis = get_crisis_resources()['immediate_danger']
+    return (
+        "I'm talking with a lot of people right now, so I need a moment before I can reply. "
+        "Please take a slow, deep breath and send your message again shortly. "
+        f"{crisis['text']} " + '; '.join(crisis['resources']) + '.'
+    )
+
+
+BUSY_TEXT = _build_busy_text()
+
+# Response bodies are encoded once; a shed request costs no serialization
+_CHAT_BUSY_BODY = json.dumps({'response': BUSY_TEXT, 'intent': 'overloaded'}).encode('utf-8')
+_WEBHOOK_BUSY_BODY = json.dumps({'fulfillmentText': BUSY_TEXT}).encode('utf-8')
+
+
+def shed_response(route, reason):
+    """
+    Get the precomputed reply for a rejected request
+
+    Webhook rejections are answered 200, since Dialogflow discards the text
+    of failed webhook calls and the user would not see the crisis line.
+
+    Args:
+        route (str): Request path
+        reason (str): Rejection reason returned by admit()
+
+    Returns:
+        tuple: (status code, JSON body bytes, list of (header, value) pairs)
+    """
+    if route == '/webhook':
+        return 200, _WEBHOOK_BUSY_BODY, []
+    if reason in RATE_LIMIT_REASONS:
+        return 429, _CHAT_BUSY_BODY, [('Retry-After', '1')]
+    return 503, _CHAT_BUSY_BODY, [('Retry-After', '2')]
+
+
+def parse_request_start(value, now=None):
+    """
+    Milliseconds since a proxy's X-Request-Start timestamp
+
+    Accepts 't=<seconds|milliseconds|microseconds>' or the bare number, as
+    written by nginx, HAProxy and Heroku.
+
+    Args:
+        value (str): Header value
+        now (float): Current epoch time in seconds
+
+    Returns:
+        float: Milliseconds waited, or None when the header is missing or unreadable
+    """
+    if not value:
+        return None
+    try:
+        stamp = float(value.strip().removeprefix('t='))
+    except ValueError:
+        return None
+    if stamp > 1e14:
+        stamp /= 1e6
+    elif stamp > 1e11:
+        stamp /= 1e3
+    return ((now if now is not None else time.time()) - stamp) * 1000
+
+
+def client_address(remote_addr, forwarded_for, hops=FORWARDED_HOPS):
+    """
+    Pick the client address, trusting a fixed number of proxies
+
+    Args:
+        remote_addr (str): Address of the connecting peer
+        forwarded_for (str): X-Forwarded-For header value
+        hops (int): Proxies in front of the app that append to X-Forwarded-For
+
+    Returns:
+        str: The address to rate-limit on
+    """
+    if hops > 0 and forwarded_for:
+        addresses = [address.strip() for address in forwarded_for.split(',') if address.strip()]
+        if addresses:
+            return addresses[-min(hops, len(addresses))]
+    return remote_addr or 'unknown'
+
+
+class TokenBuckets:
+    """
+    Token bucket per key, refilled continuously at a fixed rate
+
+    Buckets live in a bounded LRU map; a forgotten key starts again with a
+    full bucket, which errs on the side of admitting the request.
+    """
+
+    def __init__(self, rate, burst, max_keys=MAX_TRACKED_KEYS):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> [tokens, last refill time]
+        self._lock = threading.Lock()
+
+    def take(self, key, now=None):
+        """
+        Spend one token from a key's bucket
+
+        Args:
+            key (str): Session id or client address
+            now (float): time.monotonic() value, for tests and batching
+
+        Returns:
+            bool: False when the bucket is empty
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.burst, now]
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] < 1:
+                return False
+            bucket[0] -= 1
+            return True
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class AdmissionController:
+    """
+    Per-process admission checks with an in-flight request count
+
+    A request for which admit() returns None has been counted as in flight
+    and must be matched by exactly one release().
+    """
+
+    def __init__(self, enabled=ADMISSION_ENABLED, session_rate=SESSION_RATE, session_burst=SESSION_BURST,
+                 ip_rate=IP_RATE, ip_burst=IP_BURST, max_in_flight=MAX_IN_FLIGHT, shed_start=SHED_START,
+                 max_queue_ms=MAX_QUEUE_MS):
+        self.enabled = enabled
+        self.sessions = TokenBuckets(session_rate, session_burst)
+        self.addresses = TokenBuckets(ip_rate, ip_burst)
+        self.max_in_flight = max_in_flight
+        self.shed_start = min(shed_start, max_in_flight)
+        self.max_queue_ms = max_queue_ms
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._stats = {'admitted': 0, 'rejected': 0}
+
+    def _reject(self, route, reason):
+        ADMISSION_REJECTIONS.inc((route, reason))
+        with self._lock:
+            self._stats['rejected'] += 1
+        return reason
+
+    def admit(self, route, address=None, session_id=None, queued_ms=None):
+        """
+        Decide whether to serve a request
+
+        Args:
+            route (str): Request path
+            address (str): Client address (ignored on routes not limited per address)
+            session_id (str): Chat or Dialogflow session id, when known
+            queued_ms (float): Milliseconds the request waited before reaching the app
+
+        Returns:
+            str: Rejection reason, or None when the request was admitted
+        """
+        if not self.enabled:
+            return None
+        if queued_ms is not None and queued_ms > self.max_queue_ms:
+            return self._reject(route, 'queue')
+
+        with self._lock:
+            in_flight = self.in_flight
+            if in_flight >= self.max_in_flight:
+                reason = 'concurrency'
+            elif in_flight >= self.shed_start and \
+                    random.random() < (in_flight - self.shed_start + 1) / (self.max_in_flight - self.shed_start + 1):
+                reason = 'overload'
+            else:
+                reason = None
+                self.in_flight += 1
+        if reason:
+            return self._reject(route, reason)
+
+        if address and route in IP_LIMITED_ROUTES and not self.addresses.take(address):
+            reason = 'ip_rate'
+        elif session_id and not self.sessions.take(session_id):
+            reason = 'session_rate'
+        if reason:
+            self.release()
+            return self._reject(route, reason)
+
+        with self._lock:
+            self._stats['admitted'] += 1
+        return None
+
+    def release(self):
+        """Mark an admitted request as finished"""
+        with self._lock:
+            self.in_flight -= 1
+
+    def get_stats(self):
+        """
+        Get admission statistics since startup
+
+        Returns:
+            dict: Requests admitted and rejected, requests in flight and buckets tracked
+        """
+        with self._lock:
+            stats = dict(self._stats, in_flight=self.in_flight)
+        stats['tracked_sessions'] = len(self.sessions)
+        stats['tracked_addresses'] = len(self.addresses)
+        return stats
+
+
+ADMISSION = AdmissionController()
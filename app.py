@@ -1,21 +1,220 @@
 import os
+import re
+import json
 import logging
-from flask import Flask, request, jsonify, render_template_string, session
+from flask import Flask, Response, request, jsonify, render_template_string, session, stream_with_context
 from intent_handlers import handle_intent
+from intent_detection import detect_intent_from_message, detect_intents_from_messages
+from context_store import CONTEXT_STORE
+from session_store import record_chat_turn
+from transcripts import record_turn
+from logging_setup import configure_logging, payload_logging_enabled
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY, record_error, record_request
+from profiler import PROFILER, install_signal_handler
+from admission import ADMISSION, ADMISSION_ROUTES, client_address, parse_request_start, shed_response
+from warmup import WARMUP
+from page_cache import CachedPage, load_asset_manifest, load_dist_assets, page_asset_urls
+import hmac
+import time
 import uuid
 
-# Configure logging for debugging
-logging.basicConfig(level=logging.DEBUG)
+# Route logging through the background queue (see logging_setup.py)
+configure_logging()
+
+# Toggle profiling with a signal to this process (see profiler.py)
+install_signal_handler()
 
 # Create Flask app
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "amigo-therapy-bot-secret")
 
+# Built frontend assets (see build_assets.py) and the static pages linking to them,
+# rendered and precompressed once at startup
+ASSET_MANIFEST = load_asset_manifest()
+DIST_ASSETS = load_dist_assets(ASSET_MANIFEST)
+PAGE_ASSETS = page_asset_urls(ASSET_MANIFEST, app.static_url_path)
+CHAT_PAGE = CachedPage.from_template('chat.html', **PAGE_ASSETS)
+WEBHOOK_INFO_PAGE = CachedPage.from_template('webhook_info.html', **PAGE_ASSETS)
+
+# Sentence boundaries used to stream finished replies in pieces
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
+# Bearer token for the /admin endpoints; they answer 404 while it is unset
+ADMIN_TOKEN = os.environ.get("AMIGO_ADMIN_TOKEN", "")
+
+# Disable caching and proxy buffering so streamed events reach the browser immediately
+SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no'
+}
+
+@app.before_request
+def start_request_timer():
+    """Remember when the request started, for the latency metrics, and let the profiler select it"""
+    request.environ['amigo.started'] = time.perf_counter()
+    request.environ['amigo.profile'] = PROFILER.enter()
+
+@app.after_request
+def record_request_metrics(response):
+    """
+    Record request count and latency per route
+    
+    For streamed responses this measures the time until streaming starts.
+    """
+    started = request.environ.get('amigo.started')
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        record_request(route, request.method, response.status_code, time.perf_counter() - started)
+    return response
+
+@app.before_request
+def admit_request():
+    """
+    Apply admission control to the conversation routes
+    
+    A rejected request is answered here with the precomputed busy reply,
+    before any intent work is done.
+    """
+    if request.method != 'POST' or request.path not in ADMISSION_ROUTES:
+        return None
+    if request.path == '/webhook':
+        payload = request.get_json(silent=True)
+        dialogflow_session = payload.get('session') if isinstance(payload, dict) else None
+        session_id = str(dialogflow_session).split('/')[-1] if dialogflow_session else None
+    else:
+        session_id = session.get('session_id')
+    reason = ADMISSION.admit(
+        request.path,
+        client_address(request.remote_addr, request.headers.get('X-Forwarded-For')),
+        session_id,
+        parse_request_start(request.headers.get('X-Request-Start'))
+    )
+    if reason is not None:
+        status, body, headers = shed_response(request.path, reason)
+        return Response(body, status=status, headers=headers, mimetype='application/json')
+    request.environ['amigo.admitted'] = True
+    return None
+
+@app.teardown_request
+def end_request_profile(error=None):
+    """Stop sampling the request's thread, and release its admission slot, once it (and any streamed body) is done"""
+    PROFILER.exit(request.environ.get('amigo.profile'))
+    if request.environ.pop('amigo.admitted', False):
+        ADMISSION.release()
+
+# Upper bound on messages accepted by a single /chat/batch request
+CHAT_BATCH_MAX_SIZE = int(os.environ.get("CHAT_BATCH_MAX_SIZE", "10000"))
+
+def parse_webhook_request(req):
+    """
+    Extract handle_intent arguments from a Dialogflow webhook request
+
+    Args:
+        req (dict): Parsed Dialogflow webhook JSON payload
+
+    Returns:
+        dict: Keyword arguments for handle_intent
+    """
+    query_result = req.get('queryResult', {})
+
+    # Extract intent information
+    intent_info = query_result.get('intent', {})
+    intent_name = intent_info.get('displayName', '')
+
+    # Extract parameters and query text
+    parameters = query_result.get('parameters', {})
+    query_text = query_result.get('queryText', '')
+    session_id = req.get('session', '').split('/')[-1] if req.get('session') else 'unknown'
+
+    # Extract input contexts for conversation state
+    input_contexts = query_result.get('outputContexts', [])
+
+    return {
+        'intent_name': intent_name,
+        'parameters': parameters,
+        'query_text': query_text,
+        'session_id': session_id,
+        'input_contexts': input_contexts
+    }
+
+def format_fulfillment(response_data):
+    """
+    Format handler output as a Dialogflow fulfillment response
+
+    Args:
+        response_data (dict): Result returned by handle_intent
+
+    Returns:
+        dict: Dialogflow webhook response body
+    """
+    dialogflow_response = {
+        "fulfillmentText": response_data.get('text', ''),
+        "outputContexts": response_data.get('output_contexts', [])
+    }
+
+    # Add follow-up event if specified
+    if response_data.get('followup_event'):
+        dialogflow_response["followupEventInput"] = {
+            "name": response_data['followup_event'],
+            "parameters": response_data.get('followup_parameters', {})
+        }
+
+    return dialogflow_response
+
+def build_fulfillment(req, started=None, generative_fallback=True):
+    """
+    Run a Dialogflow webhook request through intent handling
+
+    Args:
+        req (dict): Parsed Dialogflow webhook JSON payload
+        started (float): time.perf_counter() at request start; when given,
+            the turn is queued for transcript persistence
+        generative_fallback (bool): Allow generated fallback replies (see handle_intent)
+
+    Returns:
+        dict: Dialogflow webhook response body
+    """
+    intent_args = parse_webhook_request(req)
+
+    logging.info("Received intent: %s from session: %s", intent_args['intent_name'], intent_args['session_id'])
+    if payload_logging_enabled():
+        logging.debug("Webhook request", extra={'payload': {
+            'query_text': intent_args['query_text'],
+            'parameters': intent_args['parameters']
+        }})
+
+    # Handle the intent and get response
+    response_data = handle_intent(**intent_args, generative_fallback=generative_fallback)
+
+    if started is not None:
+        record_webhook_turn(intent_args, response_data, started)
+
+    return format_fulfillment(response_data)
+
+def record_webhook_turn(intent_args, response_data, started):
+    """
+    Queue a webhook turn for transcript persistence
+
+    Args:
+        intent_args (dict): Arguments returned by parse_webhook_request
+        response_data (dict): Result returned by handle_intent
+        started (float): time.perf_counter() at request start
+    """
+    record_turn(
+        'webhook',
+        intent_args['session_id'],
+        intent_args['intent_name'],
+        intent_args['query_text'],
+        response_data.get('text', ''),
+        (time.perf_counter() - started) * 1000
+    )
+
 @app.route('/webhook', methods=['POST'])
 def webhook():
     """
     Main webhook endpoint to receive requests from Google Dialogflow
     """
+    started = time.perf_counter()
     try:
         # Parse the incoming JSON request from Dialogflow
         req = request.get_json()
@@ -26,58 +225,126 @@ def webhook():
                 "fulfillmentText": "I'm sorry, I didn't receive your message properly. Could you please try again?"
             }), 400
         
-        # Extract intent information
-        intent_info = req.get('queryResult', {}).get('intent', {})
-        intent_name = intent_info.get('displayName', '')
-        
-        # Extract parameters and query text
-        parameters = req.get('queryResult', {}).get('parameters', {})
-        query_text = req.get('queryResult', {}).get('queryText', '')
-        session_id = req.get('session', '').split('/')[-1] if req.get('session') else 'unknown'
+        dialogflow_response = build_fulfillment(req, started)
         
-        # Extract input contexts for conversation state
-        input_contexts = req.get('queryResult', {}).get('outputContexts', [])
-        
-        logging.info(f"Received intent: {intent_name} from session: {session_id}")
-        logging.debug(f"Query text: {query_text}")
-        logging.debug(f"Parameters: {parameters}")
-        
-        # Handle the intent and get response
-        response_data = handle_intent(
-            intent_name=intent_name,
-            parameters=parameters,
-            query_text=query_text,
-            session_id=session_id,
-            input_contexts=input_contexts
-        )
-        
-        # Format response for Dialogflow
-        dialogflow_response = {
-            "fulfillmentText": response_data.get('text', ''),
-            "outputContexts": response_data.get('output_contexts', [])
-        }
-        
-        # Add follow-up event if specified
-        if response_data.get('followup_event'):
-            dialogflow_response["followupEventInput"] = {
-                "name": response_data['followup_event'],
-                "parameters": response_data.get('followup_parameters', {})
-            }
-        
-        logging.debug(f"Sending response: {dialogflow_response}")
+        if payload_logging_enabled():
+            logging.debug("Sending response", extra={'payload': {'response': dialogflow_response}})
         return jsonify(dialogflow_response)
     
     except Exception as e:
         logging.error(f"Error processing webhook request: {str(e)}")
+        record_error('webhook', e)
         return jsonify({
             "fulfillmentText": "I'm experiencing some technical difficulties right now. Please bear with me, and let's try again in a moment."
         }), 500
 
+@app.route('/webhook/bulk', methods=['POST'])
+def webhook_bulk():
+    """
+    Bulk webhook replay endpoint
+
+    Accepts newline-delimited Dialogflow webhook payloads and streams back one
+    fulfillment JSON object per line as each is produced.
+    """
+    input_stream = request.stream
+
+    def generate_fulfillments():
+        for line_number, raw_line in enumerate(input_stream, start=1):
+            if not raw_line.strip():
+                continue
+
+            try:
+                req = json.loads(raw_line)
+                if not isinstance(req, dict):
+                    raise ValueError("Payload must be a JSON object")
+                # Replays get canned fallback replies rather than one generative call per line
+                dialogflow_response = build_fulfillment(req, generative_fallback=False)
+            except Exception as e:
+                logging.error(f"Error processing bulk webhook line {line_number}: {str(e)}")
+                record_error('webhook_bulk', e)
+                dialogflow_response = {
+                    "line": line_number,
+                    "error": str(e)
+                }
+
+            yield json.dumps(dialogflow_response) + "\n"
+
+    return Response(stream_with_context(generate_fulfillments()), mimetype='application/x-ndjson')
+
+def prepare_chat_turn(user_message, session_id):
+    """
+    Detect the intent of a chat message and build the handle_intent arguments
+    
+    The session's still-active contexts from earlier turns become the input
+    contexts, as Dialogflow does for the webhook.
+    
+    Args:
+        user_message (str): Stripped, non-empty user message
+        session_id (str): Chat session identifier
+    
+    Returns:
+        dict: Keyword arguments for handle_intent
+    """
+    # Detect intent from user message
+    detected_intent = detect_intent_from_message(user_message)
+    
+    logging.info("Detected intent: %s", detected_intent)
+    if payload_logging_enabled():
+        logging.debug("Chat message", extra={'payload': {'message': user_message}})
+    
+    return {
+        'intent_name': detected_intent,
+        'parameters': {},
+        'query_text': user_message,
+        'session_id': session_id,
+        'input_contexts': CONTEXT_STORE.get(session_id)
+    }
+
+def complete_chat_turn(intent_args, response_data, started=None):
+    """
+    Build the /chat response body from handler output
+    
+    Also advances the session's contexts, which are written to the
+    server-side session store before returning when one is configured
+    (DATABASE_URL), and queues the turn count and the transcript, which
+    are written off the request path.
+    
+    Args:
+        intent_args (dict): Arguments returned by prepare_chat_turn
+        response_data (dict): Result returned by handle_intent
+        started (float): time.perf_counter() at request start, for the transcript latency
+    
+    Returns:
+        dict: JSON body for the chat response
+    """
+    CONTEXT_STORE.advance(
+        intent_args['session_id'],
+        intent_args['input_contexts'],
+        response_data.get('output_contexts')
+    )
+    
+    record_chat_turn(intent_args['session_id'], intent_args['intent_name'])
+    
+    record_turn(
+        'chat',
+        intent_args['session_id'],
+        intent_args['intent_name'],
+        intent_args['query_text'],
+        response_data.get('text', ''),
+        (time.perf_counter() - started) * 1000 if started is not None else 0.0
+    )
+    
+    return {
+        'response': response_data.get('text', ''),
+        'intent': intent_args['intent_name']
+    }
+
 @app.route('/chat', methods=['POST'])
 def chat():
     """
     Chat endpoint for direct web interface communication
     """
+    started = time.perf_counter()
     try:
         data = request.get_json()
         user_message = data.get('message', '').strip()
@@ -91,94 +358,206 @@ def chat():
         
         session_id = session['session_id']
         
-        # Detect intent from user message
-        detected_intent = detect_intent_from_message(user_message)
-        
-        logging.info(f"Chat message: {user_message}")
-        logging.info(f"Detected intent: {detected_intent}")
-        
         # Handle the intent using existing system
-        response_data = handle_intent(
-            intent_name=detected_intent,
-            parameters={},
-            query_text=user_message,
-            session_id=session_id,
-            input_contexts=[]
-        )
+        intent_args = prepare_chat_turn(user_message, session_id)
+        response_data = handle_intent(**intent_args)
         
-        return jsonify({
-            'response': response_data.get('text', ''),
-            'intent': detected_intent
-        })
+        return jsonify(complete_chat_turn(intent_args, response_data, started))
         
     except Exception as e:
         logging.error(f"Error in chat endpoint: {str(e)}")
+        record_error('chat', e)
         return jsonify({
             'response': "I'm experiencing some technical difficulties right now. Please bear with me, and let's try again in a moment."
         }), 500
 
-def detect_intent_from_message(message):
-    """
-    Simple intent detection based on keywords and patterns
+def iter_response_chunks(response_data):
     """
-    message_lower = message.lower()
+    Split handler output into the pieces streamed by /chat/stream
     
-    # Check more specific patterns first to avoid false matches
+    A handler backed by a generator can return 'text_stream', an iterable of
+    text pieces, which is streamed as produced. Otherwise the finished text
+    is streamed sentence by sentence.
     
-    # Positive emotions and wellbeing (check early to celebrate good moments)
-    if any(phrase in message_lower for phrase in ['i am good', 'i\'m good', 'feeling good', 'doing well', 'i\'m great', 'i am great', 'feeling better', 'much better', 'doing better', 'i\'m fine', 'i am fine', 'feeling fine', 'i\'m okay', 'i am okay', 'feeling happy', 'feeling positive']):
-        return 'positive_wellbeing'
+    Args:
+        response_data (dict): Result returned by handle_intent
     
-    # Breathing exercise patterns (check first - most specific)
-    if any(phrase in message_lower for phrase in ['breathing exercise', 'breathing technique', 'need a breathing', 'breathing help']):
-        return 'breathing_exercise'
-    
-    # Grounding technique patterns
-    if any(phrase in message_lower for phrase in ['grounding', 'ground me', 'present moment', 'grounding technique']):
-        return 'grounding_technique'
-    
-    # Coping strategy patterns
-    if any(phrase in message_lower for phrase in ['coping strategy', 'coping mechanism', 'help me cope', 'need coping help', 'what can i do', 'how do i']):
-        return 'ask_coping_strategy'
-    
-    # Positive affirmation patterns
-    if any(phrase in message_lower for phrase in ['affirmation', 'positive thoughts', 'encourage me', 'motivation', 'need encouragement']):
-        return 'positive_affirmation'
-    
-    # Sadness patterns
-    if any(word in message_lower for word in ['sad', 'depressed', 'down', 'upset', 'cry', 'crying', 'heartbroken', 'grief', 'feel sad']):
-        return 'express_sadness'
+    Yields:
+        str: Text pieces that concatenate to the full reply
+    """
+    text_stream = response_data.get('text_stream')
+    if text_stream is not None:
+        yield from text_stream
+        return
     
-    # Anxiety patterns
-    if any(word in message_lower for word in ['anxious', 'anxiety', 'worried', 'nervous', 'panic', 'stress', 'overwhelmed', 'feel anxious']):
-        return 'express_anxiety'
+    sentences = SENTENCE_BOUNDARY.split(response_data.get('text', ''))
+    for index, sentence in enumerate(sentences):
+        yield sentence if index == len(sentences) - 1 else sentence + ' '
+
+def format_sse(event, data):
+    """
+    Format one Server-Sent Events message
     
-    # Anger patterns
-    if any(word in message_lower for word in ['angry', 'mad', 'furious', 'frustrated', 'annoyed', 'irritated', 'feel angry']):
-        return 'express_anger'
+    Args:
+        event (str): Event name
+        data (dict): JSON-serializable event payload
     
-    # Check-in patterns
-    if any(phrase in message_lower for phrase in ['how are you', 'checking in', 'check in']):
-        return 'check_in'
+    Returns:
+        str: Encoded SSE message, terminated by a blank line
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def iter_chat_events(intent_args, response_data, started=None):
+    """
+    Produce the SSE stream for one chat turn
     
-    # Greeting patterns (more specific now)
-    if any(word in message_lower for word in ['hello', 'hi there', 'hey', 'good morning', 'good afternoon', 'good evening']) and not any(word in message_lower for word in ['need', 'help', 'feel', 'want']):
-        return 'greeting'
+    Emits one 'chunk' event per text piece, then a 'done' event carrying the
+    same body /chat would have returned.
     
-    # Handle "hi" separately to avoid conflicts
-    if message_lower.strip() in ['hi', 'hello', 'hey']:
-        return 'greeting'
+    Args:
+        intent_args (dict): Arguments returned by prepare_chat_turn
+        response_data (dict): Result returned by handle_intent
+        started (float): time.perf_counter() at request start, for the transcript latency
     
-    # Goodbye patterns
-    if any(word in message_lower for word in ['bye', 'goodbye', 'see you', 'talk later', 'take care']):
-        return 'goodbye'
+    Yields:
+        str: Encoded SSE messages
+    """
+    pieces = []
+    for piece in iter_response_chunks(response_data):
+        if piece:
+            pieces.append(piece)
+            yield format_sse('chunk', {'text': piece})
     
-    # Breathing related (less specific patterns)
-    if 'breathe' in message_lower or 'calm down' in message_lower:
-        return 'breathing_exercise'
+    completed = dict(response_data, text=''.join(pieces))
+    yield format_sse('done', complete_chat_turn(intent_args, completed, started))
+
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Streaming variant of /chat that sends the reply as Server-Sent Events
+    """
+    started = time.perf_counter()
+    try:
+        data = request.get_json()
+        user_message = data.get('message', '').strip()
+        
+        if not user_message:
+            return jsonify({'response': "I didn't receive your message. Could you please try again?"}), 400
+        
+        # Get or create session ID
+        if 'session_id' not in session:
+            session['session_id'] = str(uuid.uuid4())
+        
+        intent_args = prepare_chat_turn(user_message, session['session_id'])
+        response_data = handle_intent(**intent_args, stream=True)
+        
+    except Exception as e:
+        logging.error(f"Error in chat stream endpoint: {str(e)}")
+        record_error('chat_stream', e)
+        return jsonify({
+            'response': "I'm experiencing some technical difficulties right now. Please bear with me, and let's try again in a moment."
+        }), 500
     
-    # Default fallback for unrecognized patterns
-    return 'fallback'
+    return Response(
+        stream_with_context(iter_chat_events(intent_args, response_data, started)),
+        mimetype='text/event-stream',
+        headers=SSE_HEADERS
+    )
+
+def classify_messages(messages, session_id='batch', generative_fallback=False):
+    """
+    Run the chat detection and handling pipeline over many messages at once
+
+    Used by /chat/batch and directly by replay jobs, with no per-message
+    Flask request or session overhead. Unrecognized messages get the canned
+    fallback reply unless generative_fallback is set, so a large batch never
+    turns into thousands of generative backend calls.
+
+    Each result's elapsed_ms covers that message's whole pipeline: its
+    handling, plus an equal share of the detection run once for the batch.
+
+    Args:
+        messages (list): User messages to classify
+        session_id (str): Session identifier passed to every handler
+        generative_fallback (bool): Allow generated fallback replies (see handle_intent)
+
+    Returns:
+        list: One result dict per message, in input order
+    """
+    # Detect every valid message in one pass, so classifier engines can score the batch at once
+    valid = [message.strip() for message in messages if isinstance(message, str) and message.strip()]
+    detection_started = time.perf_counter()
+    detected_intents = iter(detect_intents_from_messages(valid))
+    detection_ms = (time.perf_counter() - detection_started) * 1000 / len(valid) if valid else 0.0
+
+    results = []
+    for message in messages:
+        started = time.perf_counter()
+
+        if not isinstance(message, str) or not message.strip():
+            results.append({
+                'message': message,
+                'error': 'Message must be a non-empty string',
+                'elapsed_ms': (time.perf_counter() - started) * 1000
+            })
+            continue
+
+        user_message = message.strip()
+        detected_intent = next(detected_intents)
+        response_data = handle_intent(
+            intent_name=detected_intent,
+            parameters={},
+            query_text=user_message,
+            session_id=session_id,
+            input_contexts=[],
+            generative_fallback=generative_fallback
+        )
+
+        results.append({
+            'message': message,
+            'intent': detected_intent,
+            'response': response_data.get('text', ''),
+            'output_contexts': response_data.get('output_contexts', []),
+            'elapsed_ms': detection_ms + (time.perf_counter() - started) * 1000
+        })
+
+    return results
+
+@app.route('/chat/batch', methods=['POST'])
+def chat_batch():
+    """
+    Batch classification endpoint for replaying many messages in one request
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': "Expected a JSON object with a 'messages' list"}), 400
+        messages = data.get('messages')
+
+        if not isinstance(messages, list) or not messages:
+            return jsonify({'error': "Expected a non-empty 'messages' list"}), 400
+
+        if len(messages) > CHAT_BATCH_MAX_SIZE:
+            return jsonify({'error': f"A batch may contain at most {CHAT_BATCH_MAX_SIZE} messages"}), 413
+
+        session_id = str(data.get('session_id') or 'batch')
+
+        started = time.perf_counter()
+        results = classify_messages(messages, session_id=session_id)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        logging.info("Batch classified %d messages in %.1f ms", len(results), elapsed_ms)
+
+        return jsonify({
+            'results': results,
+            'count': len(results),
+            'elapsed_ms': elapsed_ms
+        })
+
+    except Exception as e:
+        logging.error(f"Error in chat batch endpoint: {str(e)}")
+        record_error('chat_batch', e)
+        return jsonify({'error': "Batch classification failed"}), 500
 
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -191,480 +570,93 @@ def health_check():
         "version": "1.0.0"
     })
 
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """
+    Readiness endpoint: 200 once startup warmup has finished, 503 until then
+    """
+    status = WARMUP.status()
+    return jsonify(status), 200 if WARMUP.ready else 503
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Prometheus metrics, summed across all workers when AMIGO_METRICS_DIR is set
+    """
+    return Response(REGISTRY.render(), content_type=METRICS_CONTENT_TYPE)
+
+def admin_authorized():
+    """
+    Check the request's bearer token against AMIGO_ADMIN_TOKEN
+    
+    Returns:
+        bool: True when admin endpoints are enabled and the token matches
+    """
+    if not ADMIN_TOKEN:
+        return False
+    supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    return hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode())
+
+@app.route('/admin/profiler', methods=['GET', 'POST', 'DELETE'])
+def admin_profiler():
+    """
+    Control the sampling profiler in the worker serving this request
+    
+    GET reports its status, POST starts a session ({"every": N, "seconds": S})
+    and DELETE stops it, writing the collapsed stacks to AMIGO_PROFILE_DIR.
+    """
+    if not admin_authorized():
+        return jsonify({'error': 'Not found'}), 404
+    
+    if request.method == 'POST':
+        options = request.get_json(silent=True) or {}
+        try:
+            every = int(options.get('every', 1))
+            seconds = float(options['seconds']) if options.get('seconds') else None
+        except (TypeError, ValueError):
+            return jsonify({'error': "'every' and 'seconds' must be numbers"}), 400
+        return jsonify(PROFILER.start(every=every, seconds=seconds))
+    
+    if request.method == 'DELETE':
+        PROFILER.stop()
+    
+    return jsonify(PROFILER.status())
+
+@app.route('/admin/profiler/stacks', methods=['GET'])
+def admin_profiler_stacks():
+    """
+    Collapsed stacks collected so far by the current or last session
+    """
+    if not admin_authorized():
+        return jsonify({'error': 'Not found'}), 404
+    return Response(PROFILER.collapsed(), mimetype='text/plain')
+
 @app.route('/', methods=['GET'])
 def home():
     """
     Main page with chat interface
     """
-    return """
-    <!DOCTYPE html>
-    <html lang="en" data-bs-theme="dark">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>AMIGO - AI Therapy Chatbot</title>
-        <link href="https://cdn.replit.com/agent/bootstrap-agent-dark-theme.min.css" rel="stylesheet">
-        <link href="https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.0/font/bootstrap-icons.css" rel="stylesheet">
-        <style>
-            body {
-                height: 100vh;
-                overflow: hidden;
-            }
-            .loading-screen {
-                position: fixed;
-                top: 0;
-                left: 0;
-                width: 100%;
-                height: 100%;
-                background: var(--bs-body-bg);
-                display: flex;
-                flex-direction: column;
-                justify-content: center;
-                align-items: center;
-                z-index: 9999;
-                transition: opacity 0.5s ease-out;
-            }
-            .loading-screen.hidden {
-                opacity: 0;
-                pointer-events: none;
-            }
-            .loading-spinner {
-                width: 50px;
-                height: 50px;
-                border: 4px solid var(--bs-border-color);
-                border-top: 4px solid var(--bs-primary);
-                border-radius: 50%;
-                animation: spin 1s linear infinite;
-                margin-bottom: 1rem;
-            }
-            @keyframes spin {
-                0% { transform: rotate(0deg); }
-                100% { transform: rotate(360deg); }
-            }
-            .loading-dots {
-                display: inline-flex;
-                align-items: center;
-                gap: 4px;
-            }
-            .loading-dots .dot {
-                width: 8px;
-                height: 8px;
-                border-radius: 50%;
-                background-color: var(--bs-primary);
-                animation: loading-dots 1.4s infinite ease-in-out both;
-            }
-            .loading-dots .dot:nth-child(1) { animation-delay: -0.32s; }
-            .loading-dots .dot:nth-child(2) { animation-delay: -0.16s; }
-            @keyframes loading-dots {
-                0%, 80%, 100% {
-                    transform: scale(0);
-                    opacity: 0.5;
-                }
-                40% {
-                    transform: scale(1);
-                    opacity: 1;
-                }
-            }
-            .container {
-                height: 100vh;
-                display: flex;
-                flex-direction: column;
-                padding: 1rem;
-            }
-            .header-section {
-                flex-shrink: 0;
-                margin-bottom: 1rem;
-            }
-            .chat-card {
-                flex: 1;
-                display: flex;
-                flex-direction: column;
-                min-height: 0;
-            }
-            .chat-container {
-                flex: 1;
-                overflow-y: auto;
-                border: 1px solid var(--bs-border-color);
-                border-radius: 0.375rem;
-                padding: 1rem;
-                background: var(--bs-body-bg);
-                min-height: 0;
-            }
-            .input-section {
-                flex-shrink: 0;
-                border-top: 1px solid var(--bs-border-color);
-                padding: 1rem;
-            }
-            .footer-section {
-                flex-shrink: 0;
-                text-align: center;
-                margin-top: 0.5rem;
-            }
-            .message {
-                margin-bottom: 1rem;
-                display: flex;
-                align-items: flex-start;
-            }
-            .message.user {
-                justify-content: flex-end;
-            }
-            .message.bot {
-                justify-content: flex-start;
-            }
-            .message-content {
-                max-width: 70%;
-                padding: 0.75rem 1rem;
-                border-radius: 1rem;
-                position: relative;
-            }
-            .message.user .message-content {
-                background: var(--bs-primary);
-                color: white;
-                border-bottom-right-radius: 0.25rem;
-            }
-            .message.bot .message-content {
-                background: var(--bs-secondary-bg);
-                border: 1px solid var(--bs-border-color);
-                border-bottom-left-radius: 0.25rem;
-            }
-            .message-avatar {
-                width: 36px;
-                height: 36px;
-                border-radius: 50%;
-                display: flex;
-                align-items: center;
-                justify-content: center;
-                margin: 0 0.5rem;
-                font-size: 1.2rem;
-            }
-            .message.user .message-avatar {
-                background: var(--bs-info);
-                order: 2;
-            }
-            .message.bot .message-avatar {
-                background: var(--bs-success);
-                order: 1;
-            }
-            .typing-indicator {
-                display: none;
-                padding: 1rem;
-                color: var(--bs-secondary);
-                font-style: italic;
-                display: flex;
-                align-items: center;
-                gap: 8px;
-            }
-            .typing-indicator.show {
-                display: flex;
-            }
-            .quick-actions {
-                margin-bottom: 1rem;
-            }
-            .quick-action-btn {
-                margin: 0.25rem;
-                font-size: 0.875rem;
-            }
-        </style>
-    </head>
-    <body>
-        <!-- Loading Screen -->
-        <div id="loadingScreen" class="loading-screen">
-            <div class="loading-spinner"></div>
-            <h2 class="text-primary mb-3">
-                <i class="bi bi-heart-pulse"></i> AMIGO
-            </h2>
-            <p class="text-muted">Preparing your safe space...</p>
-            <div class="loading-dots mt-3">
-                <div class="dot"></div>
-                <div class="dot"></div>
-                <div class="dot"></div>
-            </div>
-        </div>
-
-        <div class="container">
-            <div class="row justify-content-center h-100">
-                <div class="col-lg-8 d-flex flex-column h-100">
-                    <div class="header-section text-center">
-                        <h1 class="h3 fw-bold text-primary mb-1">
-                            <i class="bi bi-heart-pulse"></i> AMIGO
-                        </h1>
-                        <p class="text-muted small mb-0">Your compassionate AI therapy companion</p>
-                    </div>
-                    
-                    <div class="card chat-card">
-                        <div class="card-body p-0 d-flex flex-column h-100">
-                            <div id="chatContainer" class="chat-container">
-                                <div class="message bot">
-                                    <div class="message-avatar">
-                                        <i class="bi bi-robot"></i>
-                                    </div>
-                                    <div class="message-content">
-                                        <strong>AMIGO</strong><br>
-                                        Hello! I'm AMIGO, and I'm here to listen and support you. How are you feeling today?
-                                    </div>
-                                </div>
-                            </div>
-                            
-                            <div id="typingIndicator" class="typing-indicator">
-                                <div class="loading-dots">
-                                    <div class="dot"></div>
-                                    <div class="dot"></div>
-                                    <div class="dot"></div>
-                                </div>
-                                <span>AMIGO is thinking...</span>
-                            </div>
-                            
-                            <div class="input-section">
-                                <div class="quick-actions">
-                                    <div class="text-muted small mb-2">Quick options:</div>
-                                    <button class="btn btn-outline-secondary btn-sm quick-action-btn" onclick="sendQuickMessage('I feel sad today')">
-                                        <i class="bi bi-emoji-frown"></i> Feeling sad
-                                    </button>
-                                    <button class="btn btn-outline-secondary btn-sm quick-action-btn" onclick="sendQuickMessage('I feel anxious')">
-                                        <i class="bi bi-emoji-dizzy"></i> Feeling anxious
-                                    </button>
-                                    <button class="btn btn-outline-secondary btn-sm quick-action-btn" onclick="sendQuickMessage('Can you help me with a coping strategy?')">
-                                        <i class="bi bi-lightbulb"></i> Need coping help
-                                    </button>
-                                    <button class="btn btn-outline-secondary btn-sm quick-action-btn" onclick="sendQuickMessage('I need a breathing exercise')">
-                                        <i class="bi bi-wind"></i> Breathing exercise
-                                    </button>
-                                </div>
-                                
-                                <div class="input-group">
-                                    <input type="text" id="messageInput" class="form-control" 
-                                           placeholder="Share what's on your mind..." 
-                                           onkeypress="handleKeyPress(event)">
-                                    <button class="btn btn-primary" onclick="sendMessage()">
-                                        <i class="bi bi-send"></i> Send
-                                    </button>
-                                </div>
-                            </div>
-                        </div>
-                    </div>
-                    
-                    <div class="footer-section">
-                        <small class="text-warning mb-1 d-block">
-                            <i class="bi bi-exclamation-triangle"></i> 
-                            <strong>Crisis?</strong> Call 988 (Suicide & Crisis Lifeline) or 911 immediately
-                        </small>
-                        <small class="text-muted">
-                            <i class="bi bi-shield-check"></i> 
-                            Safe space • 
-                            <a href="/webhook-info" class="text-muted">
-                                <i class="bi bi-code-slash"></i> Developer info
-                            </a>
-                        </small>
-                    </div>
-                </div>
-            </div>
-        </div>
-
-        <script>
-            // Hide loading screen when page is fully loaded
-            window.addEventListener('load', function() {
-                setTimeout(function() {
-                    const loadingScreen = document.getElementById('loadingScreen');
-                    loadingScreen.classList.add('hidden');
-                    
-                    // Remove from DOM after animation completes
-                    setTimeout(function() {
-                        loadingScreen.style.display = 'none';
-                    }, 500);
-                }, 1000); // Show loading for at least 1 second for better UX
-            });
-
-            function handleKeyPress(event) {
-                if (event.key === 'Enter') {
-                    sendMessage();
-                }
-            }
-            
-            function sendQuickMessage(message) {
-                document.getElementById('messageInput').value = message;
-                sendMessage();
-            }
-            
-            async function sendMessage() {
-                const input = document.getElementById('messageInput');
-                const message = input.value.trim();
-                
-                if (!message) return;
-                
-                // Add user message to chat
-                addMessage(message, 'user');
-                input.value = '';
-                
-                // Show typing indicator
-                showTyping(true);
-                
-                try {
-                    const response = await fetch('/chat', {
-                        method: 'POST',
-                        headers: {
-                            'Content-Type': 'application/json',
-                        },
-                        body: JSON.stringify({ message: message })
-                    });
-                    
-                    const data = await response.json();
-                    
-                    // Hide typing indicator
-                    showTyping(false);
-                    
-                    // Add bot response
-                    addMessage(data.response, 'bot');
-                    
-                } catch (error) {
-                    showTyping(false);
-                    addMessage("I'm having trouble connecting right now. Please try again in a moment.", 'bot');
-                }
-            }
-            
-            function addMessage(text, sender) {
-                const chatContainer = document.getElementById('chatContainer');
-                const messageDiv = document.createElement('div');
-                messageDiv.className = `message ${sender}`;
-                
-                const avatar = sender === 'user' ? 
-                    '<div class="message-avatar"><i class="bi bi-person-circle"></i></div>' :
-                    '<div class="message-avatar"><i class="bi bi-robot"></i></div>';
-                
-                const senderName = sender === 'user' ? 'You' : 'AMIGO';
-                
-                messageDiv.innerHTML = `
-                    ${avatar}
-                    <div class="message-content">
-                        <strong>${senderName}</strong><br>
-                        ${text}
-                    </div>
-                `;
-                
-                chatContainer.appendChild(messageDiv);
-                chatContainer.scrollTop = chatContainer.scrollHeight;
-            }
-            
-            function showTyping(show) {
-                const typingIndicator = document.getElementById('typingIndicator');
-                if (show) {
-                    typingIndicator.classList.add('show');
-                    typingIndicator.style.display = 'flex';
-                } else {
-                    typingIndicator.classList.remove('show');
-                    typingIndicator.style.display = 'none';
-                }
-                
-                if (show) {
-                    const chatContainer = document.getElementById('chatContainer');
-                    chatContainer.scrollTop = chatContainer.scrollHeight;
-                }
-            }
-        </script>
-    </body>
-    </html>
-    """
+    return CHAT_PAGE.to_response(request)
 
 @app.route('/webhook-info', methods=['GET'])
 def webhook_info():
     """
     Information page for developers wanting to integrate with Dialogflow
     """
-    return """
-    <!DOCTYPE html>
-    <html lang="en" data-bs-theme="dark">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>AMIGO - Webhook Integration</title>
-        <link href="https://cdn.replit.com/agent/bootstrap-agent-dark-theme.min.css" rel="stylesheet">
-        <link href="https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.0/font/bootstrap-icons.css" rel="stylesheet">
-    </head>
-    <body>
-        <div class="container mt-5">
-            <div class="row justify-content-center">
-                <div class="col-lg-8">
-                    <div class="text-center mb-5">
-                        <h1 class="display-4 fw-bold text-primary mb-3">
-                            <i class="bi bi-code-slash"></i> AMIGO Webhook
-                        </h1>
-                        <p class="lead text-muted">Developer Integration Guide</p>
-                        <a href="/" class="btn btn-outline-primary">
-                            <i class="bi bi-arrow-left"></i> Back to Chat Demo
-                        </a>
-                    </div>
-                    
-                    <div class="card mb-4">
-                        <div class="card-body">
-                            <h2 class="card-title h4 mb-3">
-                                <i class="bi bi-link-45deg"></i> Webhook Endpoints
-                            </h2>
-                            <div class="row g-3">
-                                <div class="col-md-6">
-                                    <div class="p-3 bg-dark rounded">
-                                        <strong class="text-success">Main Webhook:</strong><br>
-                                        <code class="text-light">/webhook</code><br>
-                                        <small class="text-muted">For Dialogflow integration</small>
-                                    </div>
-                                </div>
-                                <div class="col-md-6">
-                                    <div class="p-3 bg-dark rounded">
-                                        <strong class="text-info">Health Check:</strong><br>
-                                        <code class="text-light">/health</code><br>
-                                        <small class="text-muted">Server status monitoring</small>
-                                    </div>
-                                </div>
-                            </div>
-                        </div>
-                    </div>
-
-                    <div class="card mb-4">
-                        <div class="card-body">
-                            <h3 class="card-title h5 mb-3">
-                                <i class="bi bi-gear"></i> Dialogflow Setup
-                            </h3>
-                            <ol class="list-group list-group-numbered list-group-flush">
-                                <li class="list-group-item bg-transparent border-0 px-0">
-                                    Copy this webhook URL to your Google Dialogflow agent
-                                </li>
-                                <li class="list-group-item bg-transparent border-0 px-0">
-                                    Navigate to <strong>Fulfillment</strong> in your Dialogflow console
-                                </li>
-                                <li class="list-group-item bg-transparent border-0 px-0">
-                                    Enable webhook and paste the URL with <code>/webhook</code> endpoint
-                                </li>
-                                <li class="list-group-item bg-transparent border-0 px-0">
-                                    Configure your intents to use webhook fulfillment
-                                </li>
-                            </ol>
-                        </div>
-                    </div>
-
-                    <div class="card">
-                        <div class="card-body">
-                            <h3 class="card-title h5 mb-3">
-                                <i class="bi bi-code"></i> Sample Test Request
-                            </h3>
-                            <p class="text-muted">Use this curl command to test the webhook:</p>
-                            <pre class="bg-dark p-3 rounded"><code class="text-light">curl -X POST [YOUR_WEBHOOK_URL]/webhook \\
-  -H "Content-Type: application/json" \\
-  -d '{
-    "queryResult": {
-      "intent": {
-        "displayName": "express_sadness"
-      },
-      "queryText": "I feel really sad today",
-      "parameters": {}
-    },
-    "session": "projects/test-project/agent/sessions/test-session"
-  }'</code></pre>
-                        </div>
-                    </div>
-                </div>
-            </div>
-        </div>
-    </body>
-    </html>
+    return WEBHOOK_INFO_PAGE.to_response(request)
+
+@app.route('/static/dist/<path:filename>', methods=['GET'])
+def dist_asset(filename):
     """
+    Serve content-hashed build output from memory with immutable caching
+    """
+    asset = DIST_ASSETS.get(filename)
+    if asset is None:
+        return jsonify({'error': 'Not found'}), 404
+    return asset.to_response(request)
+
+# Preload and precompute what the first requests would otherwise pay for (see warmup.py)
+WARMUP.start(app)
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=True)
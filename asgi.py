@@ -0,0 +1,415 @@
+"""
+ASGI entry point for AMIGO
+
+/chat and /webhook run natively on the asyncio event loop through
+handle_intent_async, so awaitable handlers (LLM or database calls) do not tie
+up a worker while they wait. Every other route is served by the Flask app
+through asgiref's WSGI adapter.
+
+Run with:
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+"""
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+
+from asgiref.wsgi import WsgiToAsgi
+
+from app import (
+    SSE_HEADERS,
+    app as flask_app,
+    complete_chat_turn,
+    format_fulfillment,
+    iter_chat_events,
+    record_webhook_turn,
+    parse_webhook_request,
+    prepare_chat_turn,
+)
+from admission import ADMISSION, client_address, parse_request_start, shed_response
+from intent_handlers import handle_intent_async
+from metrics import record_error, record_request
+from profiler import PROFILER
+from session_store import flush_session_turns
+from transcripts import flush_transcripts
+
+# Largest request body accepted by the native async routes
+MAX_BODY_BYTES = 1024 * 1024
+
+TECHNICAL_DIFFICULTIES_TEXT = "I'm experiencing some technical difficulties right now. Please bear with me, and let's try again in a moment."
+
+_wsgi_app = WsgiToAsgi(flask_app)
+
+# Signs and reads the same session cookie the Flask app uses
+_session_serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+_session_cookie_name = flask_app.config['SESSION_COOKIE_NAME']
+
+
+class RequestTooLarge(Exception):
+    """Raised when a request body exceeds MAX_BODY_BYTES"""
+
+
+async def read_body(receive):
+    """
+    Read the complete request body from an ASGI receive channel
+
+    Args:
+        receive: ASGI receive callable
+
+    Returns:
+        bytes: Request body
+    """
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            raise RequestTooLarge()
+        chunks.append(chunk)
+        if not message.get('more_body', False):
+            break
+    return b''.join(chunks)
+
+
+async def send_json(send, payload, status=200, headers=()):
+    """
+    Send a complete JSON response
+
+    Args:
+        send: ASGI send callable
+        payload (dict): JSON-serializable response body
+        status (int): HTTP status code
+        headers (tuple): Extra (name, value) byte-string header pairs
+    """
+    body = json.dumps(payload).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode('latin-1')),
+            *headers
+        ]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def parse_json_body(body):
+    """
+    Decode a JSON request body
+
+    Args:
+        body (bytes): Raw request body
+
+    Returns:
+        dict: Parsed object, or None when the body is not a JSON object
+    """
+    try:
+        data = json.loads(body) if body else None
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def load_session(scope):
+    """
+    Read the signed Flask session cookie from an ASGI request
+
+    Args:
+        scope (dict): ASGI connection scope
+
+    Returns:
+        dict: Session data, empty when the cookie is missing or invalid
+    """
+    for name, value in scope.get('headers', ()):
+        if name != b'cookie':
+            continue
+        for cookie in value.decode('latin-1').split(';'):
+            key, _, data = cookie.strip().partition('=')
+            if key == _session_cookie_name:
+                try:
+                    return dict(_session_serializer.loads(data))
+                except Exception:
+                    return {}
+    return {}
+
+
+def get_chat_session(scope):
+    """
+    Get the chat session id for a request, creating a session if needed
+
+    Args:
+        scope (dict): ASGI connection scope
+
+    Returns:
+        tuple: (session_id, tuple of extra response headers)
+    """
+    session_data = load_session(scope)
+    if 'session_id' in session_data:
+        return session_data['session_id'], ()
+    session_data['session_id'] = str(uuid.uuid4())
+    return session_data['session_id'], (session_cookie_header(session_data),)
+
+
+def session_cookie_header(session_data):
+    """
+    Build a Set-Cookie header compatible with the Flask session cookie
+
+    Args:
+        session_data (dict): Session data to sign
+
+    Returns:
+        tuple: (name, value) byte-string header pair
+    """
+    cookie = f"{_session_cookie_name}={_session_serializer.dumps(session_data)}; Path=/; HttpOnly"
+    same_site = flask_app.config.get('SESSION_COOKIE_SAMESITE')
+    if same_site:
+        cookie += f"; SameSite={same_site}"
+    if flask_app.config.get('SESSION_COOKIE_SECURE'):
+        cookie += "; Secure"
+    return (b'set-cookie', cookie.encode('latin-1'))
+
+
+def request_header(scope, name):
+    """
+    Get a request header from an ASGI scope
+
+    Args:
+        scope (dict): ASGI connection scope
+        name (bytes): Lowercase header name
+
+    Returns:
+        str: Header value, or None when absent
+    """
+    for key, value in scope.get('headers', ()):
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+
+async def admit_or_shed(scope, send, session_id):
+    """
+    Apply admission control, answering a rejected request with the busy reply
+
+    An admitted request is marked in the scope so serve_with_metrics releases it.
+
+    Args:
+        scope (dict): ASGI connection scope
+        send: ASGI send callable
+        session_id (str): Chat or Dialogflow session id
+
+    Returns:
+        bool: True when the request may be served
+    """
+    client = scope.get('client')
+    reason = ADMISSION.admit(
+        scope['path'],
+        client_address(client[0] if client else None, request_header(scope, b'x-forwarded-for')),
+        session_id,
+        parse_request_start(request_header(scope, b'x-request-start'))
+    )
+    if reason is None:
+        scope['amigo.admitted'] = True
+        return True
+    status, body, headers = shed_response(scope['path'], reason)
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode('latin-1')),
+            *((name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers)
+        ]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+    return False
+
+
+async def webhook(scope, receive, send):
+    """
+    Async Dialogflow webhook endpoint, equivalent to app.webhook
+    """
+    started = time.perf_counter()
+    try:
+        req = parse_json_body(await read_body(receive))
+
+        if not req:
+            logging.error("No JSON payload received")
+            await send_json(send, {
+                "fulfillmentText": "I'm sorry, I didn't receive your message properly. Could you please try again?"
+            }, status=400)
+            return
+
+        intent_args = parse_webhook_request(req)
+        if not await admit_or_shed(scope, send, intent_args['session_id']):
+            return
+        logging.info("Received intent: %s from session: %s", intent_args['intent_name'], intent_args['session_id'])
+
+        response_data = await handle_intent_async(**intent_args)
+        record_webhook_turn(intent_args, response_data, started)
+        await send_json(send, format_fulfillment(response_data))
+
+    except RequestTooLarge:
+        await send_json(send, {"fulfillmentText": "That message was too large for me to process."}, status=413)
+    except Exception as e:
+        logging.error(f"Error processing webhook request: {str(e)}")
+        record_error('webhook', e)
+        await send_json(send, {"fulfillmentText": TECHNICAL_DIFFICULTIES_TEXT}, status=500)
+
+
+async def chat(scope, receive, send):
+    """
+    Async chat endpoint, equivalent to app.chat
+    """
+    started = time.perf_counter()
+    try:
+        data = parse_json_body(await read_body(receive)) or {}
+        user_message = str(data.get('message', '')).strip()
+
+        if not user_message:
+            await send_json(send, {'response': "I didn't receive your message. Could you please try again?"}, status=400)
+            return
+
+        # Get or create session ID
+        session_id, headers = get_chat_session(scope)
+        # A session created by this request has no history to rate-limit yet
+        if not await admit_or_shed(scope, send, None if headers else session_id):
+            return
+
+        # Contexts may come from the shared cache (SQLite I/O), so keep the lookup off the event loop
+        intent_args = await asyncio.to_thread(prepare_chat_turn, user_message, session_id)
+        response_data = await handle_intent_async(**intent_args)
+
+        # Recording the turn may hit the database, so keep it off the event loop
+        body = await asyncio.to_thread(complete_chat_turn, intent_args, response_data, started)
+        await send_json(send, body, headers=headers)
+
+    except RequestTooLarge:
+        await send_json(send, {'response': "That message was too long for me to read."}, status=413)
+    except Exception as e:
+        logging.error(f"Error in chat endpoint: {str(e)}")
+        record_error('chat', e)
+        await send_json(send, {'response': TECHNICAL_DIFFICULTIES_TEXT}, status=500)
+
+
+async def chat_stream(scope, receive, send):
+    """
+    Async Server-Sent Events chat endpoint, equivalent to app.chat_stream
+    """
+    started = time.perf_counter()
+    try:
+        data = parse_json_body(await read_body(receive)) or {}
+        user_message = str(data.get('message', '')).strip()
+
+        if not user_message:
+            await send_json(send, {'response': "I didn't receive your message. Could you please try again?"}, status=400)
+            return
+
+        session_id, headers = get_chat_session(scope)
+        # A session created by this request has no history to rate-limit yet
+        if not await admit_or_shed(scope, send, None if headers else session_id):
+            return
+
+        # Contexts may come from the shared cache (SQLite I/O), so keep the lookup off the event loop
+        intent_args = await asyncio.to_thread(prepare_chat_turn, user_message, session_id)
+        response_data = await handle_intent_async(**intent_args, stream=True)
+
+    except RequestTooLarge:
+        await send_json(send, {'response': "That message was too long for me to read."}, status=413)
+        return
+    except Exception as e:
+        logging.error(f"Error in chat stream endpoint: {str(e)}")
+        record_error('chat_stream', e)
+        await send_json(send, {'response': TECHNICAL_DIFFICULTIES_TEXT}, status=500)
+        return
+
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            *((name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in SSE_HEADERS.items()),
+            *headers
+        ]
+    })
+    # The final event records the turn, which may hit the database
+    events = iter_chat_events(intent_args, response_data, started)
+    while (event := await asyncio.to_thread(next, events, None)) is not None:
+        await send({'type': 'http.response.body', 'body': event.encode('utf-8'), 'more_body': True})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+# POST routes served natively on the event loop
+ASYNC_ROUTES = {
+    '/webhook': webhook,
+    '/chat': chat,
+    '/chat/stream': chat_stream
+}
+
+
+async def serve_with_metrics(route, scope, receive, send):
+    """
+    Run a native async route, recording its request count and latency
+    
+    A request selected by the profiler has the event loop thread sampled while
+    it runs, so its stacks also include other coroutines scheduled meanwhile.
+    The route's admission slot, if admit_or_shed granted one, is released here.
+    
+    Args:
+        route: Async route function from ASYNC_ROUTES
+        scope (dict): ASGI connection scope
+        receive: ASGI receive callable
+        send: ASGI send callable
+    """
+    started = time.perf_counter()
+    status = [500]
+    profile = PROFILER.enter()
+
+    async def send_and_capture(message):
+        if message['type'] == 'http.response.start':
+            status[0] = message['status']
+        await send(message)
+
+    try:
+        await route(scope, receive, send_and_capture)
+    finally:
+        PROFILER.exit(profile)
+        if scope.pop('amigo.admitted', False):
+            ADMISSION.release()
+        record_request(scope['path'], scope['method'], status[0], time.perf_counter() - started)
+
+
+async def lifespan(receive, send):
+    """Acknowledge ASGI lifespan events, flushing queued session turns and transcripts on shutdown"""
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await asyncio.to_thread(flush_session_turns)
+            await asyncio.to_thread(flush_transcripts)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    """
+    ASGI application: async /chat and /webhook, everything else via Flask
+    """
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+
+    if scope['type'] == 'http' and scope['method'] == 'POST':
+        route = ASYNC_ROUTES.get(scope['path'])
+        if route is not None:
+            await serve_with_metrics(route, scope, receive, send)
+            return
+
+    await _wsgi_app(scope, receive, send)
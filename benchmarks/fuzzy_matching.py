@@ -0,0 +1,175 @@
+"""
+Benchmark typo-tolerant keyword matching against exact matching
+
+Runs the labeled corpus through the keyword rules four ways and reports
+nanoseconds per message and the slowdown against exact matching, overall
+and by message length, and accuracy:
+
+    exact           no typo correction
+    fuzzy           the symmetric-delete index as deployed (corrections memoized)
+    fuzzy_uncached  the same index with memoization off: every unknown token is looked up
+    brute_force     each unknown token compared with every vocabulary word (the baseline the index replaces)
+
+It also times single-token corrections by token length, index against brute
+force. The cached figures flatter the index on a corpus that repeats its
+typos; fuzzy_uncached on long messages is the cost of a message full of
+tokens never seen before. With --max-slowdown, exits non-zero when
+fuzzy_uncached is more than that many times slower than exact, overall or
+in any message length bucket, for use as a regression check.
+
+Usage:
+    python benchmarks/fuzzy_matching.py [--corpus FILE] [--repeat N] [--max-slowdown X]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fuzzy_index import edit_distance  # noqa: E402
+from generate_corpus import DEFAULT_CORPUS  # noqa: E402
+from intent_detection import (  # noqa: E402
+    INTENT_RULES, build_fuzzy_index, detect_intent_from_tokens, normalize_message, tokenize
+)
+from intent_detector import LENGTH_BUCKETS, length_bucket, score_predictions, time_per_message  # noqa: E402
+from intent_engines import load_samples  # noqa: E402
+
+
+class BruteForceCorrector:
+    """
+    Same correction rules as SymmetricDeleteIndex, found by scanning the whole vocabulary
+
+    Not memoized: every call pays the full scan.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self.words = index.words
+        self.vocabulary = frozenset(index.words)
+
+    def correct(self, token):
+        index = self.index
+        if not index.min_length <= len(token) <= index.max_length or token in index.protected:
+            return None
+        limit = index.max_edits(len(token))
+        best, best_distance = None, limit + 1
+        for word in self.words:
+            if word[0] != token[0]:
+                continue
+            distance = edit_distance(token, word, limit)
+            if distance < best_distance:
+                best, best_distance = word, distance
+        return best
+
+    def correct_tokens(self, tokens):
+        vocabulary = self.vocabulary
+        return [token if token in vocabulary else (self.correct(token) or token) for token in tokens]
+
+
+def keyword_detector(corrector):
+    """Keyword rules with a token corrector applied first (None for exact matching)"""
+    if corrector is None:
+        return lambda message: detect_intent_from_tokens(tokenize(normalize_message(message)))
+    return lambda message: detect_intent_from_tokens(corrector.correct_tokens(tokenize(normalize_message(message))))
+
+
+def time_corrections(correct, tokens, repeat):
+    """Best-of-repeat nanoseconds per correction over a list of tokens"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter_ns()
+        for token in tokens:
+            correct(token)
+        elapsed = time.perf_counter_ns() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(tokens)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS, help='labeled JSON Lines file')
+    parser.add_argument('--repeat', type=int, default=5, help='timed passes per measurement (fastest kept)')
+    parser.add_argument('--max-slowdown', type=float, default=None, metavar='X',
+                        help='fail when uncached fuzzy matching is more than X times slower than exact')
+    args = parser.parse_args()
+
+    samples = load_samples(args.corpus)
+    messages = [message for message, _ in samples]
+    buckets = {}
+    for message in messages:
+        buckets.setdefault(length_bucket(message), []).append(message)
+
+    index = build_fuzzy_index(INTENT_RULES)
+    uncached = build_fuzzy_index(INTENT_RULES, cache_size=0)
+    brute_force = BruteForceCorrector(uncached)
+    detectors = (
+        ('exact', keyword_detector(None)),
+        ('fuzzy', keyword_detector(index)),
+        ('fuzzy_uncached', keyword_detector(uncached)),
+        ('brute_force', keyword_detector(brute_force)),
+    )
+
+    reports = []
+    exact_ns = exact_by_length = None
+    for name, detect in detectors:
+        predictions = [detect(message) for message in messages]
+        ns_per_message = time_per_message(detect, messages, args.repeat)
+        ns_by_length = {
+            bucket: time_per_message(detect, buckets[bucket], args.repeat)
+            for _, bucket in LENGTH_BUCKETS if bucket in buckets
+        }
+        exact_ns = exact_ns or ns_per_message
+        exact_by_length = exact_by_length or ns_by_length
+        scores = score_predictions(predictions, samples)
+        reports.append({
+            'detector': name,
+            'ns_per_message': round(ns_per_message),
+            'slowdown': round(ns_per_message / exact_ns, 2),
+            'ns_by_length': {bucket: round(ns) for bucket, ns in ns_by_length.items()},
+            'slowdown_by_length': {
+                bucket: round(ns / exact_by_length[bucket], 2) for bucket, ns in ns_by_length.items()
+            },
+            'accuracy': scores['accuracy'],
+        })
+
+    # Tokens the correctors actually see: not in the vocabulary and within the length limits
+    known = frozenset(index.words)
+    unknown = sorted({
+        token for message in messages for token in tokenize(normalize_message(message))
+        if token not in known and index.min_length <= len(token) <= index.max_length
+    })
+    by_length = {}
+    for token in unknown:
+        by_length.setdefault(min(len(token), 12), []).append(token)
+    token_report = {}
+    for length, tokens in sorted(by_length.items()):
+        index_ns = time_corrections(uncached.correct, tokens, args.repeat)
+        brute_force_ns = time_corrections(brute_force.correct, tokens, args.repeat)
+        token_report['12+' if length == 12 else str(length)] = {
+            'tokens': len(tokens),
+            'index_ns': round(index_ns),
+            'brute_force_ns': round(brute_force_ns),
+            'index_vs_brute_force': round(index_ns / brute_force_ns, 2),
+        }
+
+    print(json.dumps({
+        'corpus': os.path.basename(args.corpus),
+        'messages': len(samples),
+        'vocabulary': index.get_stats()['words'],
+        'delete_variants': index.get_stats()['variants'],
+        'max_token_length': index.max_length,
+        'detectors': reports,
+        'correction_by_token_length': token_report,
+    }, indent=2))
+
+    uncached_report = next(report for report in reports if report['detector'] == 'fuzzy_uncached')
+    slowdown = max(uncached_report['slowdown'], *uncached_report['slowdown_by_length'].values())
+    if args.max_slowdown is not None and slowdown > args.max_slowdown:
+        sys.exit(f"fuzzy_uncached is up to {slowdown}x slower than exact matching (limit {args.max_slowdown}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+"""
+Generate the labeled message corpus used by the intent detector benchmark
+
+Messages are assembled from per-intent core phrases with optional openers,
+context clauses and filler sentences, then varied with casing, punctuation,
+typographic apostrophes, emoji and occasional typos, so the corpus covers
+short one-word turns up to long rambling messages. Output is deterministic
+for a given seed.
+
+Usage:
+    python benchmarks/generate_corpus.py [--count N] [--seed N] [--output FILE]
+"""
+
+import argparse
+import json
+import os
+import random
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'intent_corpus.jsonl')
+
+# What people say for each intent; a phrase carries the label on its own
+CORE_PHRASES = {
+    'greeting': [
+        'hi', 'hello', 'hey', 'hi there', 'hey there', 'hello there', 'good morning', 'good afternoon',
+        'good evening', 'hey amigo', 'hello amigo', 'hiya', 'morning', 'yo', 'howdy', 'greetings',
+        'hey hey', 'hi amigo, nice to meet you',
+    ],
+    'positive_wellbeing': [
+        "i'm good", 'i am good', "i'm doing well", 'doing well today', "i'm great", 'i am great',
+        "i'm feeling better", 'feeling much better', 'doing better than yesterday', "i'm fine",
+        'i am fine', "i'm okay", 'feeling happy', 'feeling positive about things', "i'm feeling good",
+        'things are going well', 'today was a good day', "i'm in a good mood", 'i feel great',
+        'honestly pretty happy right now', 'life is good lately', 'i feel calm and content',
+    ],
+    'express_sadness': [
+        'i feel sad', "i'm so sad", 'i am depressed', "i've been feeling down", 'i feel really down',
+        "i'm upset", 'i keep crying', 'i want to cry', "i'm heartbroken", 'dealing with a lot of grief',
+        'everything feels hopeless', 'i feel empty inside', 'i miss my dad so much', "i'm really lonely",
+        'nothing makes me happy anymore', 'i feel so low', 'my heart hurts', "i can't stop crying",
+        'i feel worthless', 'i lost my dog and i am devastated',
+    ],
+    'express_anxiety': [
+        "i'm anxious", 'i have so much anxiety', "i'm worried", "i'm really nervous", 'i am panicking',
+        'having a panic attack', "i'm so stressed", 'i feel overwhelmed', 'work is really stressful',
+        "i can't stop worrying", 'my chest is tight and my mind is racing', 'i feel on edge',
+        "i'm scared about tomorrow", "i'm freaking out", 'i keep overthinking everything',
+        'my heart is pounding', 'i am terrified of the exam', "i'm dreading the meeting",
+    ],
+    'express_anger': [
+        "i'm angry", "i'm so mad", "i'm furious", "i'm frustrated", 'i am annoyed', "i'm irritated",
+        'i feel angry', 'my boss makes me so mad', "i'm fed up", "i'm pissed off", 'i want to scream',
+        'this makes me livid', 'i hate how they treated me', "i'm sick of this", 'i am so irritated',
+        'everyone is getting on my nerves',
+    ],
+    'ask_coping_strategy': [
+        'what coping strategies can i use', 'i need a coping strategy', 'help me cope',
+        'what are some coping mechanisms', 'what can i do', 'how do i deal with this',
+        'how do i handle stress better', 'any tips for coping', 'give me some coping techniques',
+        'how can i manage my feelings', 'what should i do when it gets bad', 'need coping help',
+        'what helps with bad days', 'suggest something to help me cope',
+    ],
+    'breathing_exercise': [
+        'breathing exercise', 'can we do a breathing exercise', 'teach me a breathing technique',
+        'i need a breathing exercise', 'breathing help', 'help me breathe', 'i need to breathe',
+        'help me calm down', 'i need to calm down', 'show me how to breathe slowly',
+        'guide me through some breathing', 'box breathing please', 'can you do breathing techniques with me',
+    ],
+    'grounding_technique': [
+        'grounding', 'i need grounding', 'can you ground me', 'help me stay in the present moment',
+        'grounding technique please', 'teach me a grounding exercise', 'the 5 4 3 2 1 thing',
+        'bring me back to the present moment', 'i feel disconnected, ground me', 'some grounding would help',
+    ],
+    'positive_affirmation': [
+        'give me an affirmation', 'i need some affirmations', 'say something positive',
+        'i need encouragement', 'encourage me', 'i need motivation', 'motivate me',
+        'tell me something nice', 'i need positive thoughts', 'remind me that i matter',
+        'can you hype me up', 'share a motivational quote',
+    ],
+    'check_in': [
+        'how are you', 'how are you doing', 'how are you today', 'just checking in', 'check in',
+        "how's it going", 'how have you been', "what's up", 'you doing ok?', 'how is your day',
+    ],
+    'goodbye': [
+        'bye', 'goodbye', 'see you', 'see you later', 'talk later', 'take care', 'bye for now',
+        'gotta go', 'good night', 'thanks, bye', "i'm logging off", 'catch you later', 'later',
+        "that's all for today",
+    ],
+    'fallback': [
+        'what is the weather', 'tell me a joke', 'who won the game last night', 'what time is it',
+        'can you order pizza', 'purple elephants', 'asdf', 'do you like movies', 'what is 2 plus 2',
+        'recommend a book', 'where do you live', 'is it going to rain', 'ok', 'hmm', 'what is this',
+        'translate hello to french', 'i like trains', 'are you a robot',
+    ],
+}
+
+OPENERS = ['', '', '', 'so ', 'honestly ', 'um ', 'well ', 'ok so ', 'ugh ', 'idk ', 'hmm ', 'tbh ']
+
+# Clauses that add length without changing the intent
+CONTEXT_CLAUSES = [
+    'today', 'right now', 'this week', 'after work', 'since this morning', 'lately', 'again',
+    'at the moment', 'tonight', 'after the meeting', 'about my exams', 'because of my job',
+    'since the move', 'about my family',
+]
+
+# Neutral sentences used to pad long messages; none of them contains a keyword
+FILLER_SENTENCES = [
+    'It has been a long week.', 'My sister visited on Sunday.', 'I started a new job last month.',
+    'We moved to a new city in the spring.', 'I was on the train for an hour.', 'The kids are at school.',
+    'My phone died earlier.', 'I just got home.', 'It is raining outside.', 'I had pasta for dinner.',
+    'My roommate is out.', 'I have an exam on Friday.', 'The meeting ran late.', 'I did laundry.',
+]
+
+EMOJI = ['', '', '', ' 🙂', ' 😔', ' 😤', ' 🙏', ' 😅', ' ❤️']
+PUNCTUATION = ['', '', '.', '!', '?', '...', '!!']
+
+
+def add_typo(text, rng):
+    """Swap two adjacent letters in one longer word"""
+    words = text.split(' ')
+    candidates = [index for index, word in enumerate(words) if len(word) > 4 and word.isalpha()]
+    if not candidates:
+        return text
+    index = rng.choice(candidates)
+    word = words[index]
+    position = rng.randrange(1, len(word) - 2)
+    words[index] = word[:position] + word[position + 1] + word[position] + word[position + 2:]
+    return ' '.join(words)
+
+
+def vary_case(text, rng):
+    """Apply the casing habits of real chat users"""
+    roll = rng.random()
+    if roll < 0.5:
+        return text
+    if roll < 0.8:
+        return text[:1].upper() + text[1:]
+    if roll < 0.9:
+        return text.upper()
+    return text.title()
+
+
+def make_message(intent, rng, typo_rate):
+    """
+    Assemble one message for an intent
+
+    Args:
+        intent (str): Label the message is built for
+        rng (random.Random): Random source
+        typo_rate (float): Probability of a letter swap in the core phrase
+
+    Returns:
+        str: The message
+    """
+    core = rng.choice(CORE_PHRASES[intent])
+    if typo_rate and rng.random() < typo_rate:
+        core = add_typo(core, rng)
+    # Greetings, goodbyes and fallback chatter stay short; other intents get context
+    if intent not in ('greeting', 'goodbye', 'fallback', 'check_in') and rng.random() < 0.4:
+        core = f"{core} {rng.choice(CONTEXT_CLAUSES)}"
+    text = vary_case(rng.choice(OPENERS) + core, rng) + rng.choice(PUNCTUATION)
+
+    if intent not in ('greeting', 'fallback') and rng.random() < 0.25:
+        padding = rng.sample(FILLER_SENTENCES, rng.randint(1, 4))
+        if rng.random() < 0.5:
+            text = ' '.join(padding + [text])
+        else:
+            text = ' '.join([text] + padding)
+
+    if rng.random() < 0.1:
+        text = text.replace("'", '’')
+    return text + rng.choice(EMOJI)
+
+
+def generate_corpus(count, seed, typo_rate=0.08):
+    """
+    Generate a balanced, labeled corpus
+
+    Args:
+        count (int): Number of messages, spread evenly across intents
+        seed (int): Random seed
+        typo_rate (float): Probability of a typo in a message's core phrase
+
+    Returns:
+        list: {'message', 'intent'} dicts
+    """
+    rng = random.Random(seed)
+    intents = sorted(CORE_PHRASES)
+    corpus = [{'message': make_message(intents[index % len(intents)], rng, typo_rate),
+               'intent': intents[index % len(intents)]} for index in range(count)]
+    rng.shuffle(corpus)
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=4800, help='messages to generate')
+    parser.add_argument('--seed', type=int, default=7, help='random seed')
+    parser.add_argument('--typo-rate', type=float, default=0.08, help='probability of a typo per message')
+    parser.add_argument('--output', default=DEFAULT_CORPUS, help='JSON Lines file to write')
+    args = parser.parse_args()
+
+    corpus = generate_corpus(args.count, args.seed, args.typo_rate)
+    with open(args.output, 'w', encoding='utf-8') as output:
+        for item in corpus:
+            output.write(json.dumps(item, ensure_ascii=False) + '\n')
+    print(f"Wrote {len(corpus)} messages to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+"""
+Microbenchmark intent detectors on the labeled corpus
+
+Times each detector one message at a time and reports messages per second,
+nanoseconds per message by message-length bucket, accuracy, per-intent
+precision and recall, a confusion matrix, and how many messages each
+detector routes differently from the first one. Detectors are named with
+--detector and compared side by side:
+
+    current     intent_detection.detect_intent_from_message (AMIGO_INTENT_ENGINE)
+    keyword     the keyword trie engine (with typo correction unless AMIGO_FUZZY_MATCHING=off)
+    exact       the keyword trie engine without typo correction
+    classifier  the statistical classifier engine
+    hybrid      keyword rules with the classifier for unmatched messages
+    legacy      the original substring cascade (benchmarks/legacy_detectors.py)
+    module:function  any importable function taking a message and returning an intent
+
+Usage:
+    python benchmarks/intent_detector.py [--detector current --detector legacy ...]
+                                         [--corpus FILE] [--repeat N] [--confusion] [--diff N]
+"""
+
+import argparse
+import importlib
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from generate_corpus import DEFAULT_CORPUS  # noqa: E402
+from intent_detection import (  # noqa: E402
+    INTENT_ENGINES, detect_intent_exact, detect_intent_from_message, load_intent_engine
+)
+from intent_engines import load_samples  # noqa: E402
+from legacy_detectors import detect_intent_substring_cascade  # noqa: E402
+
+# Upper bounds (characters, inclusive) of the message-length buckets
+LENGTH_BUCKETS = ((16, '1-16'), (40, '17-40'), (80, '41-80'), (None, '81+'))
+
+
+def resolve_detector(spec):
+    """
+    Turn a --detector argument into a callable
+
+    Args:
+        spec (str): A built-in name or 'module:function'
+
+    Returns:
+        function: Detector taking a message and returning an intent name
+    """
+    if spec == 'current':
+        return detect_intent_from_message
+    if spec == 'legacy':
+        return detect_intent_substring_cascade
+    if spec == 'exact':
+        return detect_intent_exact
+    if spec in INTENT_ENGINES:
+        return load_intent_engine(spec)[0]
+    module_name, separator, function_name = spec.partition(':')
+    if not separator:
+        raise ValueError(f"Unknown detector '{spec}'; use a built-in name or module:function")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def length_bucket(message):
+    """Name of the length bucket a message falls in"""
+    for limit, name in LENGTH_BUCKETS:
+        if limit is None or len(message) <= limit:
+            return name
+
+
+def time_per_message(detect, messages, repeat):
+    """
+    Best-of-repeat nanoseconds per call over a list of messages
+
+    Args:
+        detect: Detector function
+        messages (list): Messages passed one per call
+        repeat (int): Timed passes; the fastest is kept to suppress noise
+
+    Returns:
+        float: Nanoseconds per message
+    """
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter_ns()
+        for message in messages:
+            detect(message)
+        elapsed = time.perf_counter_ns() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(messages)
+
+
+def score_predictions(predictions, samples):
+    """
+    Accuracy, per-intent precision and recall, and the confusion matrix
+
+    Args:
+        predictions (list): Predicted intent per sample
+        samples (list): (message, expected intent) pairs
+
+    Returns:
+        dict: Scores, with confusion as {expected: {predicted: count}}
+    """
+    confusion = {}
+    for predicted, (_, expected) in zip(predictions, samples):
+        row = confusion.setdefault(expected, {})
+        row[predicted] = row.get(predicted, 0) + 1
+
+    predicted_totals = {}
+    for row in confusion.values():
+        for predicted, count in row.items():
+            predicted_totals[predicted] = predicted_totals.get(predicted, 0) + count
+
+    per_intent = {}
+    for intent in sorted(set(confusion) | set(predicted_totals)):
+        correct = confusion.get(intent, {}).get(intent, 0)
+        expected_total = sum(confusion.get(intent, {}).values())
+        predicted_total = predicted_totals.get(intent, 0)
+        per_intent[intent] = {
+            'support': expected_total,
+            'precision': round(correct / predicted_total, 4) if predicted_total else 0.0,
+            'recall': round(correct / expected_total, 4) if expected_total else 0.0,
+        }
+
+    correct = sum(row.get(intent, 0) for intent, row in confusion.items())
+    return {
+        'accuracy': round(correct / len(samples), 4),
+        'per_intent': per_intent,
+        'confusion': {intent: dict(sorted(row.items())) for intent, row in sorted(confusion.items())},
+    }
+
+
+def benchmark_detector(spec, samples, repeat):
+    """
+    Benchmark one detector
+
+    Args:
+        spec (str): Detector name from the command line
+        samples (list): (message, expected intent) pairs
+        repeat (int): Timed passes per measurement
+
+    Returns:
+        tuple: (report dict, list of predictions)
+    """
+    detect = resolve_detector(spec)
+    messages = [message for message, _ in samples]
+    predictions = [detect(message) for message in messages]
+
+    buckets = {}
+    for message in messages:
+        buckets.setdefault(length_bucket(message), []).append(message)
+
+    ns_per_message = time_per_message(detect, messages, repeat)
+    report = {
+        'detector': spec,
+        'messages_per_second': round(1e9 / ns_per_message),
+        'ns_per_message': round(ns_per_message),
+        'ns_by_length': {
+            name: {'messages': len(buckets[name]), 'ns_per_message': round(time_per_message(detect, buckets[name], repeat))}
+            for _, name in LENGTH_BUCKETS if name in buckets
+        },
+    }
+    report.update(score_predictions(predictions, samples))
+    return report, predictions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--detector', action='append', help='detector to run (repeatable; default current and legacy)')
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS, help='labeled JSON Lines file')
+    parser.add_argument('--repeat', type=int, default=5, help='timed passes per measurement (fastest kept)')
+    parser.add_argument('--confusion', action='store_true', help='include the confusion matrices')
+    parser.add_argument('--diff', type=int, default=0, metavar='N',
+                        help='include up to N messages each detector routes differently from the first')
+    args = parser.parse_args()
+
+    samples = load_samples(args.corpus)
+    reports = []
+    reference = None
+    for spec in args.detector or ['current', 'legacy']:
+        report, predictions = benchmark_detector(spec, samples, args.repeat)
+        if not args.confusion:
+            report.pop('confusion')
+        if reference is None:
+            reference = (spec, predictions)
+        else:
+            changed = [index for index, (ours, theirs) in enumerate(zip(predictions, reference[1])) if ours != theirs]
+            report['routed_differently'] = {'from': reference[0], 'messages': len(changed)}
+            if args.diff:
+                report['routed_differently']['examples'] = [
+                    {'message': samples[index][0], 'expected': samples[index][1],
+                     reference[0]: reference[1][index], spec: predictions[index]}
+                    for index in changed[:args.diff]
+                ]
+        reports.append(report)
+
+    print(json.dumps({'corpus': os.path.basename(args.corpus), 'messages': len(samples), 'detectors': reports},
+                     indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
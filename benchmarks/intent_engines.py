@@ -0,0 +1,163 @@
+"""
+Compare the intent detection engines for accuracy and throughput
+
+Runs every engine in intent_detection.INTENT_ENGINES over a labeled sample
+file, one message at a time and as a single batch, and prints a JSON report.
+The samples must be disjoint from the classifier's training set (compared
+after the normalization the classifier applies); the run stops when any is
+not, unless --exclude-training-overlap drops those samples.
+
+Usage:
+    python benchmarks/intent_engines.py [--samples FILE] [--repeat N] [--exclude-training-overlap]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intent_classifier import build_training_set  # noqa: E402
+from intent_detection import INTENT_ENGINES, load_intent_engine  # noqa: E402
+from text_vectors import stemmed_text  # noqa: E402
+
+DEFAULT_SAMPLES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'intent_samples.jsonl')
+
+
+def load_samples(path):
+    """
+    Read labeled messages from a JSON Lines file
+
+    Args:
+        path (str): File with one {"message": ..., "intent": ...} object per line
+
+    Returns:
+        list: (message, expected intent) pairs
+    """
+    with open(path, encoding='utf-8') as samples:
+        return [(item['message'], item['intent']) for item in map(json.loads, samples) if item]
+
+
+def training_overlap(samples):
+    """
+    Find the samples the classifier was trained on
+
+    Args:
+        samples (list): (message, expected intent) pairs
+
+    Returns:
+        list: Messages whose normalized text is also a training text
+    """
+    training = {stemmed_text(text) for _, text in build_training_set()}
+    return [message for message, _ in samples if stemmed_text(message) in training]
+
+
+def measure_accuracy(predictions, samples):
+    """
+    Score predictions against the expected intents
+
+    Args:
+        predictions (list): Predicted intent per sample
+        samples (list): (message, expected intent) pairs
+
+    Returns:
+        dict: Overall accuracy, per-intent accuracy and the misclassified messages
+    """
+    per_intent = {}
+    errors = []
+    for predicted, (message, expected) in zip(predictions, samples):
+        counts = per_intent.setdefault(expected, [0, 0])
+        counts[1] += 1
+        if predicted == expected:
+            counts[0] += 1
+        else:
+            errors.append({'message': message, 'expected': expected, 'predicted': predicted})
+    correct = sum(hits for hits, _ in per_intent.values())
+    return {
+        'accuracy': correct / len(samples),
+        'per_intent': {intent: hits / total for intent, (hits, total) in sorted(per_intent.items())},
+        'errors': errors
+    }
+
+
+def measure_throughput(function, argument, calls):
+    """
+    Time repeated calls of a function
+
+    Args:
+        function: Callable to time
+        argument: Value passed to every call
+        calls (int): Number of calls
+
+    Returns:
+        float: Seconds per call
+    """
+    started = time.perf_counter()
+    for _ in range(calls):
+        function(argument)
+    return (time.perf_counter() - started) / calls
+
+
+def benchmark_engine(name, samples, repeat):
+    """
+    Benchmark one engine
+
+    Args:
+        name (str): Engine name from INTENT_ENGINES
+        samples (list): (message, expected intent) pairs
+        repeat (int): Passes over the samples for the throughput figures
+
+    Returns:
+        dict: Accuracy and messages-per-second figures
+    """
+    started = time.perf_counter()
+    detect, detect_batch = load_intent_engine(name)
+    load_seconds = time.perf_counter() - started
+
+    messages = [message for message, _ in samples]
+    report = measure_accuracy(detect_batch(messages), samples)
+
+    single_seconds = measure_throughput(lambda batch: [detect(message) for message in batch], messages, repeat)
+    batch_seconds = measure_throughput(detect_batch, messages, repeat)
+
+    report.update({
+        'engine': name,
+        'load_ms': load_seconds * 1000,
+        'single_messages_per_second': len(messages) / single_seconds,
+        'batch_messages_per_second': len(messages) / batch_seconds,
+    })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--samples', default=DEFAULT_SAMPLES, help='labeled JSON Lines file')
+    parser.add_argument('--repeat', type=int, default=20, help='passes over the samples when timing')
+    parser.add_argument('--errors', action='store_true', help='include misclassified messages in the report')
+    parser.add_argument('--exclude-training-overlap', action='store_true',
+                        help='drop samples that are classifier training data instead of stopping')
+    args = parser.parse_args()
+
+    samples = load_samples(args.samples)
+    overlap = training_overlap(samples)
+    if overlap and not args.exclude_training_overlap:
+        sys.exit(f"{len(overlap)} of {len(samples)} samples are classifier training data "
+                 f"(e.g. {overlap[0]!r}); remove them or pass --exclude-training-overlap")
+    if overlap:
+        excluded = set(overlap)
+        samples = [(message, intent) for message, intent in samples if message not in excluded]
+    reports = []
+    for name in INTENT_ENGINES:
+        report = benchmark_engine(name, samples, args.repeat)
+        if not args.errors:
+            report.pop('errors')
+        reports.append(report)
+
+    print(json.dumps({'samples': len(samples), 'excluded_training_overlap': len(overlap), 'engines': reports},
+                     indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Earlier detector implementations kept as benchmark baselines
+
+These are frozen copies; the application does not import them.
+"""
+
+
+def detect_intent_substring_cascade(message):
+    """
+    The original detector: an if-cascade of substring checks over the lowercased message
+
+    Superseded by the token trie in intent_detection.py, which matches whole
+    words only (so 'sad' no longer matches inside 'crusade').
+
+    Args:
+        message (str): Raw user message
+
+    Returns:
+        str: Detected intent name, or 'fallback'
+    """
+    message_lower = message.lower()
+
+    if any(phrase in message_lower for phrase in ['i am good', 'i\'m good', 'feeling good', 'doing well', 'i\'m great', 'i am great', 'feeling better', 'much better', 'doing better', 'i\'m fine', 'i am fine', 'feeling fine', 'i\'m okay', 'i am okay', 'feeling happy', 'feeling positive']):
+        return 'positive_wellbeing'
+
+    if any(phrase in message_lower for phrase in ['breathing exercise', 'breathing technique', 'need a breathing', 'breathing help']):
+        return 'breathing_exercise'
+
+    if any(phrase in message_lower for phrase in ['grounding', 'ground me', 'present moment', 'grounding technique']):
+        return 'grounding_technique'
+
+    if any(phrase in message_lower for phrase in ['coping strategy', 'coping mechanism', 'help me cope', 'need coping help', 'what can i do', 'how do i']):
+        return 'ask_coping_strategy'
+
+    if any(phrase in message_lower for phrase in ['affirmation', 'positive thoughts', 'encourage me', 'motivation', 'need encouragement']):
+        return 'positive_affirmation'
+
+    if any(word in message_lower for word in ['sad', 'depressed', 'down', 'upset', 'cry', 'crying', 'heartbroken', 'grief', 'feel sad']):
+        return 'express_sadness'
+
+    if any(word in message_lower for word in ['anxious', 'anxiety', 'worried', 'nervous', 'panic', 'stress', 'overwhelmed', 'feel anxious']):
+        return 'express_anxiety'
+
+    if any(word in message_lower for word in ['angry', 'mad', 'furious', 'frustrated', 'annoyed', 'irritated', 'feel angry']):
+        return 'express_anger'
+
+    if any(phrase in message_lower for phrase in ['how are you', 'checking in', 'check in']):
+        return 'check_in'
+
+    if any(word in message_lower for word in ['hello', 'hi there', 'hey', 'good morning', 'good afternoon', 'good evening']) and not any(word in message_lower for word in ['need', 'help', 'feel', 'want']):
+        return 'greeting'
+
+    if message_lower.strip() in ['hi', 'hello', 'hey']:
+        return 'greeting'
+
+    if any(word in message_lower for word in ['bye', 'goodbye', 'see you', 'talk later', 'take care']):
+        return 'goodbye'
+
+    if 'breathe' in message_lower or 'calm down' in message_lower:
+        return 'breathing_exercise'
+
+    return 'fallback'
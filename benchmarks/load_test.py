@@ -0,0 +1,469 @@
+"""
+Load-test /chat and /webhook and report latency percentiles as JSON
+
+Builds realistic traffic from the labeled samples: chat messages for every
+intent, and Dialogflow webhook payloads for every intent name registered in
+intent_handlers. The traffic is sent at each requested concurrency through
+one or both drivers:
+
+    inprocess  the Flask test client, one client per thread (no network or server overhead)
+    gunicorn   a real gunicorn server started on a free local port, over HTTP
+
+The report has throughput and p50/p95/p99 latency per endpoint and per
+intent, plus the git commit, so that runs can be saved and compared. With
+--baseline, the changes against an earlier report are included as well.
+
+Usage:
+    python benchmarks/load_test.py [--driver inprocess|gunicorn|both] [--concurrency 1,8,32]
+                                   [--requests N] [--output FILE] [--baseline FILE]
+"""
+
+import argparse
+import contextlib
+import http.client
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Keep console logging from dominating the timings; set AMIGO_LOG_LEVEL explicitly to measure with it
+os.environ.setdefault('AMIGO_LOG_LEVEL', 'WARNING')
+# Every client thread reuses one session, so the per-session rate limit would shed most of the
+# traffic; set AMIGO_ADMISSION=on explicitly to measure admission control itself
+os.environ.setdefault('AMIGO_ADMISSION', 'off')
+# The load only hits the API, so the servers may start without a frontend build
+os.environ.setdefault('AMIGO_REQUIRE_ASSETS', 'off')
+
+from intent_engines import DEFAULT_SAMPLES, load_samples  # noqa: E402
+from intent_handlers import get_dispatch_table  # noqa: E402
+
+ENDPOINTS = ('/chat', '/webhook')
+DRIVERS = ('inprocess', 'gunicorn')
+PERCENTILES = (50, 95, 99)
+
+# Seconds to wait for a started gunicorn to answer /health
+SERVER_START_TIMEOUT = 30
+
+# Seconds every client thread may take to connect and send its warmup requests
+WARMUP_TIMEOUT = 120
+
+
+def build_chat_requests(samples):
+    """
+    Build /chat request bodies from labeled messages
+
+    Args:
+        samples (list): (message, expected intent) pairs
+
+    Returns:
+        list: (endpoint, expected intent, body) tuples
+    """
+    return [('/chat', intent, {'message': message}) for message, intent in samples]
+
+
+def build_webhook_requests(samples, rng):
+    """
+    Build Dialogflow webhook payloads for every registered intent name
+
+    Intent names sharing a handler (e.g. 'Default Welcome Intent' and
+    'greeting') share that handler's sample messages as queryText.
+
+    Args:
+        samples (list): (message, expected intent) pairs
+        rng (random.Random): Source of session ids and confidences
+
+    Returns:
+        list: (endpoint, intent name, body) tuples
+    """
+    table = get_dispatch_table()
+    messages_by_intent = {}
+    for message, intent in samples:
+        messages_by_intent.setdefault(intent, []).append(message)
+    label_by_handler = {table[intent]: intent for intent in messages_by_intent if intent in table}
+
+    requests = []
+    for intent_name in sorted(table):
+        label = label_by_handler.get(table[intent_name])
+        for message in messages_by_intent.get(label) or [intent_name.replace('_', ' ')]:
+            session = f"projects/amigo-load-test/agent/sessions/{rng.getrandbits(64):016x}"
+            requests.append(('/webhook', intent_name, {
+                'responseId': f"{rng.getrandbits(128):032x}",
+                'session': session,
+                'queryResult': {
+                    'queryText': message,
+                    'parameters': {},
+                    'allRequiredParamsPresent': True,
+                    'intent': {
+                        'name': f"projects/amigo-load-test/agent/intents/{intent_name}",
+                        'displayName': intent_name
+                    },
+                    'intentDetectionConfidence': round(rng.uniform(0.6, 1.0), 3),
+                    'languageCode': 'en',
+                    'outputContexts': []
+                },
+                'originalDetectIntentRequest': {'payload': {}}
+            }))
+    return requests
+
+
+def build_plan(samples, endpoints, count, seed):
+    """
+    Build the shuffled list of requests to send
+
+    Args:
+        samples (list): (message, expected intent) pairs
+        endpoints (list): Endpoints to include
+        count (int): Requests per endpoint; the payloads are cycled to reach it
+        seed (int): Random seed, so runs send identical traffic
+
+    Returns:
+        list: (endpoint, intent, body) tuples
+    """
+    rng = random.Random(seed)
+    builders = {
+        '/chat': lambda: build_chat_requests(samples),
+        '/webhook': lambda: build_webhook_requests(samples, rng),
+    }
+    plan = []
+    for endpoint in endpoints:
+        payloads = builders[endpoint]()
+        plan.extend(payloads[index % len(payloads)] for index in range(count))
+    rng.shuffle(plan)
+    return plan
+
+
+class InProcessClient:
+    """Sends requests through the Flask test client, keeping the session cookie"""
+
+    def __init__(self, flask_app):
+        self.client = flask_app.test_client()
+
+    def post(self, path, body):
+        response = self.client.post(path, json=body)
+        return response.status_code, response.get_json(silent=True)
+
+
+class HttpClient:
+    """Sends requests over one HTTP connection, reconnecting when the server closes it"""
+
+    def __init__(self, host, port):
+        self.connection = http.client.HTTPConnection(host, port, timeout=30)
+        self.cookie = None
+
+    def post(self, path, body):
+        headers = {'Content-Type': 'application/json'}
+        if self.cookie:
+            headers['Cookie'] = self.cookie
+        try:
+            self.connection.request('POST', path, json.dumps(body), headers)
+            response = self.connection.getresponse()
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            self.connection.close()
+            self.connection.request('POST', path, json.dumps(body), headers)
+            response = self.connection.getresponse()
+        data = response.read()
+        cookie = response.getheader('Set-Cookie')
+        if cookie:
+            self.cookie = cookie.split(';', 1)[0]
+        try:
+            return response.status, json.loads(data)
+        except ValueError:
+            return response.status, None
+
+    def close(self):
+        self.connection.close()
+
+
+def run_load(make_client, plan, concurrency, warmup):
+    """
+    Send the plan from several threads and time every request
+
+    Args:
+        make_client: Callable returning a new client (one per thread)
+        plan (list): (endpoint, intent, body) tuples
+        concurrency (int): Number of sending threads
+        warmup (int): Requests each thread sends, untimed, before the run
+
+    Returns:
+        tuple: (list of (endpoint, intent, seconds, ok) results, wall seconds)
+
+    Raises:
+        RuntimeError: A client failed to start or warm up, or the warmup
+            took longer than WARMUP_TIMEOUT
+    """
+    shares = [plan[index::concurrency] for index in range(concurrency)]
+    results = [[] for _ in range(concurrency)]
+    # The timeout breaks the barrier for everyone if a client hangs during warmup
+    ready = threading.Barrier(concurrency + 1, timeout=WARMUP_TIMEOUT)
+    go = threading.Event()
+    warmup_errors = []
+
+    def worker(share, output):
+        client = None
+        try:
+            client = make_client()
+            for endpoint, _, body in share[:warmup]:
+                client.post(endpoint, body)
+        except Exception as e:
+            # Release every thread waiting at the barrier instead of leaving them to hang
+            warmup_errors.append(e)
+            ready.abort()
+        try:
+            try:
+                ready.wait()
+            except threading.BrokenBarrierError:
+                return
+            go.wait()
+            for endpoint, intent, body in share:
+                started = time.perf_counter()
+                try:
+                    status, data = client.post(endpoint, body)
+                    ok = status == 200
+                except Exception:
+                    data, ok = None, False
+                elapsed = time.perf_counter() - started
+                # /chat reports the intent it actually routed to; the webhook's is fixed by the payload
+                if endpoint == '/chat' and isinstance(data, dict) and data.get('intent'):
+                    intent = data['intent']
+                output.append((endpoint, intent, elapsed, ok))
+        finally:
+            close = getattr(client, 'close', None)
+            if close is not None:
+                close()
+
+    threads = [threading.Thread(target=worker, args=(share, output), daemon=True)
+               for share, output in zip(shares, results)]
+    for thread in threads:
+        thread.start()
+    try:
+        ready.wait()
+    except threading.BrokenBarrierError:
+        ready.abort()
+        if warmup_errors:
+            raise RuntimeError(f"A load-test client failed during warmup: {warmup_errors[0]!r}") from warmup_errors[0]
+        raise RuntimeError(f"Load-test clients did not finish their warmup within {WARMUP_TIMEOUT}s")
+    started = time.perf_counter()
+    go.set()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    return [result for output in results for result in output], wall
+
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * percent // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(results, wall):
+    """
+    Reduce timed results to throughput and latency figures
+
+    Args:
+        results (list): (endpoint, intent, seconds, ok) tuples
+        wall (float): Wall-clock seconds the results were collected over
+
+    Returns:
+        dict: Count, errors, requests per second and latency in milliseconds
+    """
+    latencies = sorted(seconds * 1000 for _, _, seconds, _ in results)
+    summary = {
+        'requests': len(results),
+        'errors': sum(1 for _, _, _, ok in results if not ok),
+        'throughput_rps': round(len(results) / wall, 1) if wall else 0.0,
+        'mean_ms': round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+    }
+    for percent in PERCENTILES:
+        summary[f"p{percent}_ms"] = round(percentile(latencies, percent), 3)
+    summary['max_ms'] = round(latencies[-1], 3) if latencies else 0.0
+    return summary
+
+
+def build_report(driver, concurrency, results, wall):
+    """
+    Summarize one run overall, per endpoint and per endpoint and intent
+
+    Returns:
+        dict: The run's section of the JSON report
+    """
+    by_endpoint = {}
+    for result in results:
+        by_endpoint.setdefault(result[0], []).append(result)
+
+    endpoints = {}
+    for endpoint, endpoint_results in sorted(by_endpoint.items()):
+        by_intent = {}
+        for result in endpoint_results:
+            by_intent.setdefault(result[1], []).append(result)
+        endpoints[endpoint] = dict(
+            summarize(endpoint_results, wall),
+            intents={intent: summarize(intent_results, wall) for intent, intent_results in sorted(by_intent.items())}
+        )
+
+    return dict(summarize(results, wall), driver=driver, concurrency=concurrency,
+                elapsed_s=round(wall, 3), endpoints=endpoints)
+
+
+def find_free_port():
+    """Ask the OS for an unused local TCP port"""
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+@contextlib.contextmanager
+def gunicorn_server(workers, threads, extra_args=()):
+    """
+    Run gunicorn serving main:app for the duration of the block
+
+    Args:
+        workers (int): Worker processes
+        threads (int): Threads per worker (gthread worker class when > 1)
+        extra_args (tuple): Further gunicorn command-line arguments
+
+    Yields:
+        tuple: (host, port, master process) of the running server
+    """
+    host, port = '127.0.0.1', find_free_port()
+    command = [sys.executable, '-m', 'gunicorn', '--bind', f"{host}:{port}", '--workers', str(workers),
+               '--threads', str(threads), *extra_args, 'main:app']
+    with tempfile.TemporaryFile() as server_log:
+        server = subprocess.Popen(command, cwd=ROOT, stdout=server_log, stderr=subprocess.STDOUT)
+        try:
+            deadline = time.monotonic() + SERVER_START_TIMEOUT
+            while True:
+                if server.poll() is not None:
+                    server_log.seek(0)
+                    raise RuntimeError(f"gunicorn exited during startup:\n{server_log.read().decode(errors='replace')}")
+                try:
+                    connection = http.client.HTTPConnection(host, port, timeout=1)
+                    connection.request('GET', '/health')
+                    if connection.getresponse().status == 200:
+                        connection.close()
+                        break
+                except OSError:
+                    pass
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"gunicorn did not answer /health within {SERVER_START_TIMEOUT}s")
+                time.sleep(0.1)
+            yield host, port, server
+        finally:
+            server.terminate()
+            try:
+                server.wait(10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+
+def git_commit():
+    """Current commit of the repository, or None outside a git checkout"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_runs(runs, baseline):
+    """
+    Attach the relative change against a baseline report to each matching run
+
+    Runs are matched on driver and concurrency. Changes are fractions:
+    positive throughput_change is faster, positive p95/p99_change is slower.
+
+    Args:
+        runs (list): Run reports from this invocation
+        baseline (dict): A report previously written by this script
+    """
+    def change(current, previous):
+        return round((current - previous) / previous, 4) if previous else None
+
+    previous_runs = {(run['driver'], run['concurrency']): run for run in baseline.get('runs', [])}
+    for run in runs:
+        previous = previous_runs.get((run['driver'], run['concurrency']))
+        if previous is None:
+            continue
+        run['vs_baseline'] = {'commit': baseline.get('commit')}
+        for endpoint, figures in run['endpoints'].items():
+            before = previous.get('endpoints', {}).get(endpoint)
+            if before is None:
+                continue
+            run['vs_baseline'][endpoint] = {
+                'throughput_change': change(figures['throughput_rps'], before['throughput_rps']),
+                'p95_change': change(figures['p95_ms'], before['p95_ms']),
+                'p99_change': change(figures['p99_ms'], before['p99_ms']),
+            }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--driver', choices=DRIVERS + ('both',), default='inprocess')
+    parser.add_argument('--concurrency', default='1,8,32', help='comma-separated thread counts, one run each')
+    parser.add_argument('--requests', type=int, default=2000, help='requests per endpoint per run')
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS), help='comma-separated endpoints to load')
+    parser.add_argument('--warmup', type=int, default=5, help='untimed requests per thread before each run')
+    parser.add_argument('--samples', default=DEFAULT_SAMPLES, help='labeled JSON Lines file of chat messages')
+    parser.add_argument('--seed', type=int, default=1, help='seed for the generated traffic')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn threads per worker')
+    parser.add_argument('--output', help='also write the report to this file')
+    parser.add_argument('--baseline', help='earlier report to compare against')
+    args = parser.parse_args()
+
+    endpoints = [endpoint.strip() for endpoint in args.endpoints.split(',') if endpoint.strip()]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+    levels = [int(level) for level in args.concurrency.split(',')]
+    drivers = DRIVERS if args.driver == 'both' else (args.driver,)
+
+    plan = build_plan(load_samples(args.samples), endpoints, args.requests, args.seed)
+
+    runs = []
+    for driver in drivers:
+        if driver == 'inprocess':
+            from app import app as flask_app
+            server = contextlib.nullcontext()
+            make_client = lambda: InProcessClient(flask_app)  # noqa: E731
+        else:
+            server = gunicorn_server(args.workers, args.threads)
+        with server as address:
+            if driver == 'gunicorn':
+                make_client = lambda: HttpClient(address[0], address[1])  # noqa: E731
+            for level in levels:
+                results, wall = run_load(make_client, plan, level, args.warmup)
+                runs.append(build_report(driver, level, results, wall))
+
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'requests_per_endpoint': args.requests,
+        'gunicorn': {'workers': args.workers, 'threads': args.threads} if 'gunicorn' in drivers else None,
+        'runs': runs,
+    }
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as baseline_file:
+            compare_runs(runs, json.load(baseline_file))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            output_file.write(output + '\n')
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
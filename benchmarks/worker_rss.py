@@ -0,0 +1,134 @@
+"""
+Measure memory per gunicorn worker under the production profile
+
+Starts gunicorn with gunicorn.conf.py, sends some traffic so every worker has
+touched its hot path, then reads /proc/<pid>/smaps_rollup for the master and
+each worker (Linux only). Reported per process, in MiB:
+
+    rss      resident pages, counting shared pages in full for every process
+    pss      proportional share: shared pages divided among the processes sharing them
+    private  pages only this process uses: the real cost of one more worker
+
+With --compare, the measurement is repeated with AMIGO_PRELOAD=off to show
+what copy-on-write sharing of the preloaded app saves.
+
+Usage:
+    python benchmarks/worker_rss.py [--workers N] [--threads N] [--requests N] [--compare]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from load_test import HttpClient, build_plan, gunicorn_server, run_load
+from intent_engines import DEFAULT_SAMPLES, load_samples
+
+# smaps_rollup fields read, in kB
+MEMORY_FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+
+
+def read_memory(pid):
+    """
+    Read a process's memory totals
+
+    Args:
+        pid (int): Process id
+
+    Returns:
+        dict: rss, pss, shared and private MiB
+    """
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as rollup:
+        for line in rollup:
+            name, _, rest = line.partition(':')
+            if name in MEMORY_FIELDS:
+                values[name] = int(rest.split()[0])
+    return {
+        'pid': pid,
+        'rss_mb': round(values.get('Rss', 0) / 1024, 1),
+        'pss_mb': round(values.get('Pss', 0) / 1024, 1),
+        'shared_mb': round((values.get('Shared_Clean', 0) + values.get('Shared_Dirty', 0)) / 1024, 1),
+        'private_mb': round((values.get('Private_Clean', 0) + values.get('Private_Dirty', 0)) / 1024, 1),
+    }
+
+
+def child_pids(parent):
+    """Ids of the processes whose parent is the given process"""
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as stat:
+                # The command name may contain spaces; fields after it are space-separated
+                ppid = int(stat.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == parent:
+            children.append(int(entry))
+    return sorted(children)
+
+
+def wait_for_workers(master_pid, workers, timeout=30):
+    """Wait until the master has forked every worker, then give them a moment to finish booting"""
+    deadline = time.monotonic() + timeout
+    while len(child_pids(master_pid)) < workers:
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"only {len(child_pids(master_pid))} of {workers} workers started")
+        time.sleep(0.1)
+    time.sleep(1.0)
+
+
+def measure(workers, threads, requests, preload):
+    """
+    Start a server, load it, and read every process's memory
+
+    Returns:
+        dict: Per-process figures and worker averages
+    """
+    os.environ['AMIGO_PRELOAD'] = 'on' if preload else 'off'
+    plan = build_plan(load_samples(DEFAULT_SAMPLES), ('/chat', '/webhook'), requests, seed=1)
+    with gunicorn_server(workers, threads) as (host, port, master):
+        wait_for_workers(master.pid, workers)
+        if plan:
+            run_load(lambda: HttpClient(host, port), plan, workers * threads, warmup=0)
+        master_memory = read_memory(master.pid)
+        worker_memory = [read_memory(pid) for pid in child_pids(master.pid)]
+
+    count = len(worker_memory)
+    mean = {
+        field: round(sum(worker[field] for worker in worker_memory) / count, 1)
+        for field in ('rss_mb', 'pss_mb', 'shared_mb', 'private_mb')
+    } if count else {}
+    return {
+        'preload': preload,
+        'workers': count,
+        'threads': threads,
+        'master': master_memory,
+        'worker_mean': mean,
+        'total_pss_mb': round(master_memory['pss_mb'] + sum(worker['pss_mb'] for worker in worker_memory), 1),
+        'per_worker': worker_memory,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=8, help='threads per worker')
+    parser.add_argument('--requests', type=int, default=500, help='requests per endpoint sent before measuring')
+    parser.add_argument('--compare', action='store_true', help='also measure with preloading off')
+    args = parser.parse_args()
+
+    if not os.path.exists('/proc/self/smaps_rollup'):
+        sys.exit('worker_rss.py needs Linux /proc/<pid>/smaps_rollup')
+
+    runs = [measure(args.workers, args.threads, args.requests, preload=True)]
+    if args.compare:
+        runs.append(measure(args.workers, args.threads, args.requests, preload=False))
+    print(json.dumps({'runs': runs}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,646 @@
+"""
+Frontend asset build for AMIGO
+Vendors the third-party stylesheets and icon fonts, strips the CSS rules the
+pages never use, subsets the icon fonts to the icons left, minifies the CSS
+and writes content-hashed bundles plus a manifest to static/dist/ so the app
+can serve all assets from its own origin.
+
+Vendor files are committed under assets/vendor/ and pinned by the SHA-256
+sums in assets/vendor/checksums.json: the build refuses a file whose sum does
+not match, or that is not pinned at all, so it never depends on the network
+and never picks up a changed upstream file unnoticed. Font subsetting needs
+fontTools (pip install fonttools); without it the fonts are shipped whole.
+
+Usage:
+    python build_assets.py                     # build from the pinned files in assets/vendor/
+    python build_assets.py --update-checksums  # download missing vendor files and pin them
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import sys
+import urllib.parse
+import urllib.request
+
+from page_cache import DIST_DIR, STATIC_DIR, TEMPLATE_DIR, VENDOR_STYLESHEETS
+
+try:
+    from fontTools import subset as font_subset
+    from fontTools.ttLib import TTFont
+except ImportError:  # fontTools is optional; icon fonts are then shipped whole
+    font_subset = None
+
+VENDOR_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets', 'vendor')
+VENDOR_CHECKSUMS = os.path.join(VENDOR_DIR, 'checksums.json')
+
+# @font-face families holding icons only, subset to the icons the purged CSS still uses
+ICON_FONT_FAMILIES = ('bootstrap-icons',)
+
+# Font formats fontTools can subset, and the flavor each is saved in
+_FONT_FLAVORS = {'.woff2': 'woff2', '.woff': 'woff', '.ttf': None, '.otf': None}
+
+# First-party sources bundled after the vendor stylesheets
+SOURCE_STYLESHEETS = ('chat.css',)
+SOURCE_SCRIPTS = ('chat.js',)
+
+_COMMENT_PATTERN = re.compile(r'/\*.*?\*/', re.S)
+_URL_PATTERN = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+_CLASS_ATTR_PATTERN = re.compile(r'class\s*=\s*"([^"]*)"')
+_ID_ATTR_PATTERN = re.compile(r'id\s*=\s*"([^"]*)"')
+_IDENTIFIER_PATTERN = re.compile(r'[A-Za-z_][A-Za-z0-9_-]*')
+_SELECTOR_CLASS_PATTERN = re.compile(r'\.((?:\\.|[A-Za-z0-9_-])+)')
+_SELECTOR_ID_PATTERN = re.compile(r'#((?:\\.|[A-Za-z0-9_-])+)')
+_NOT_PSEUDO_PATTERN = re.compile(r':not\([^()]*\)')
+_KEYFRAMES_PATTERN = re.compile(r'@(?:-webkit-)?keyframes\s+([A-Za-z0-9_-]+)')
+_FONT_FACE_PATTERN = re.compile(r'@font-face\s*\{([^}]*)\}')
+_FONT_FAMILY_PATTERN = re.compile(r'font-family\s*:\s*["\']?([^;"\'}]+)')
+_CONTENT_PATTERN = re.compile(r'content\s*:\s*(["\'])((?:\\.|(?!\1).)*)\1')
+_CSS_ESCAPE_PATTERN = re.compile(r'\\([0-9a-fA-F]{1,6})\s?|\\(.)')
+
+# Stands in for a referenced file until its final (subset, hashed) name is known
+_RESOURCE_PLACEHOLDER = 'amigo-resource-{}'
+
+# At-rules whose blocks contain ordinary rules that can be purged
+_NESTED_AT_RULES = ('@media', '@supports', '@container', '@layer')
+
+
+def vendor_path(url):
+    """
+    Map a remote URL to its cached location under assets/vendor/
+
+    Args:
+        url (str): Absolute URL of a vendor file
+
+    Returns:
+        str: Local file path
+    """
+    parsed = urllib.parse.urlsplit(url)
+    return os.path.join(VENDOR_DIR, parsed.netloc, parsed.path.lstrip('/'))
+
+
+def load_checksums(path=VENDOR_CHECKSUMS):
+    """
+    Read the pinned SHA-256 sums of the vendor files
+
+    Args:
+        path (str): checksums.json location
+
+    Returns:
+        dict: URL mapped to hex digest; empty when nothing is pinned yet
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as source:
+        return json.load(source)
+
+
+def save_checksums(checksums, path=VENDOR_CHECKSUMS):
+    """Write the pinned sums, sorted so the file diffs cleanly"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as output:
+        json.dump(dict(sorted(checksums.items())), output, indent=2)
+        output.write('\n')
+
+
+def fetch_vendor_file(url, checksums, update=False):
+    """
+    Read a vendored file, checking it against its pinned checksum
+
+    Args:
+        url (str): Absolute URL of the vendor file
+        checksums (dict): Pinned sums (see load_checksums); updated in place when update is set
+        update (bool): Download missing files and pin files that are not pinned yet
+
+    Returns:
+        bytes: File contents
+
+    Raises:
+        FileNotFoundError: The file is not vendored and update is not set
+        ValueError: The file does not match its pinned sum, or is not pinned
+    """
+    path = vendor_path(url)
+    if os.path.exists(path):
+        with open(path, 'rb') as vendored:
+            content = vendored.read()
+    elif update:
+        print(f"Downloading {url}")
+        with urllib.request.urlopen(url, timeout=30) as response:
+            content = response.read()
+    else:
+        raise FileNotFoundError(f"{url} is not vendored at {path}; run with --update-checksums to add it")
+
+    digest = hashlib.sha256(content).hexdigest()
+    pinned = checksums.get(url)
+    if pinned is None and update:
+        checksums[url] = pinned = digest
+    if pinned is None:
+        raise ValueError(f"{url} is not pinned in {VENDOR_CHECKSUMS}; run with --update-checksums to pin it")
+    if digest != pinned:
+        raise ValueError(f"{path} does not match its pinned checksum (sha256 {digest}, expected {pinned})")
+
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as vendored:
+            vendored.write(content)
+    return content
+
+
+def split_css_strings(css):
+    """
+    Split CSS into alternating code and quoted-string segments
+
+    Args:
+        css (str): Stylesheet text
+
+    Returns:
+        list: (is_string, text) segments in order
+    """
+    segments = []
+    position = 0
+    for match in re.finditer(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'', css):
+        if match.start() > position:
+            segments.append((False, css[position:match.start()]))
+        segments.append((True, match.group(0)))
+        position = match.end()
+    if position < len(css):
+        segments.append((False, css[position:]))
+    return segments
+
+
+def parse_css_blocks(css):
+    """
+    Split stylesheet text into top-level (prelude, body) blocks
+
+    Braces inside quoted strings are ignored. Statements without a block
+    (such as @charset) are returned with a body of None.
+
+    Args:
+        css (str): Comment-free stylesheet text
+
+    Returns:
+        list: (prelude, body) tuples
+    """
+    blocks = []
+    depth = 0
+    prelude_start = 0
+    body_start = 0
+    prelude = ''
+    index = 0
+    length = len(css)
+    quote = None
+    while index < length:
+        char = css[index]
+        if quote:
+            if char == '\\':
+                index += 2
+                continue
+            if char == quote:
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif char == '{':
+            if depth == 0:
+                prelude = css[prelude_start:index].strip()
+                body_start = index + 1
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                blocks.append((prelude, css[body_start:index]))
+                prelude_start = index + 1
+        elif char == ';' and depth == 0:
+            statement = css[prelude_start:index].strip()
+            if statement:
+                blocks.append((statement, None))
+            prelude_start = index + 1
+        index += 1
+    return blocks
+
+
+def split_selectors(prelude):
+    """
+    Split a selector list on top-level commas
+
+    Args:
+        prelude (str): Selector list of a rule
+
+    Returns:
+        list: Individual selectors
+    """
+    selectors = []
+    depth = 0
+    start = 0
+    for index, char in enumerate(prelude):
+        if char in '([':
+            depth += 1
+        elif char in ')]':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            selectors.append(prelude[start:index].strip())
+            start = index + 1
+    selectors.append(prelude[start:].strip())
+    return [selector for selector in selectors if selector]
+
+
+def selector_is_used(selector, used_classes, used_ids):
+    """
+    Decide whether a selector can match anything on the pages
+
+    Classes inside :not() never make a selector unused.
+
+    Args:
+        selector (str): A single CSS selector
+        used_classes (set): Class names referenced by the pages and scripts
+        used_ids (set): Element ids referenced by the pages and scripts
+
+    Returns:
+        bool: True when every class and id in the selector is in use
+    """
+    positive = _NOT_PSEUDO_PATTERN.sub('', selector)
+    for name in _SELECTOR_CLASS_PATTERN.findall(positive):
+        if name.replace('\\', '') not in used_classes:
+            return False
+    for name in _SELECTOR_ID_PATTERN.findall(positive):
+        if name.replace('\\', '') not in used_ids:
+            return False
+    return True
+
+
+def purge_css(css, used_classes, used_ids):
+    """
+    Drop every rule whose selectors cannot match the pages
+
+    Args:
+        css (str): Comment-free stylesheet text
+        used_classes (set): Class names referenced by the pages and scripts
+        used_ids (set): Element ids referenced by the pages and scripts
+
+    Returns:
+        str: Stylesheet containing only reachable rules
+    """
+    output = []
+    for prelude, body in parse_css_blocks(css):
+        if body is None:
+            if not prelude.startswith('@import'):
+                output.append(prelude + ';')
+            continue
+
+        if prelude.startswith(_NESTED_AT_RULES):
+            inner = purge_css(body, used_classes, used_ids)
+            if inner.strip():
+                output.append(f"{prelude}{{{inner}}}")
+        elif prelude.startswith('@'):
+            # @font-face, @keyframes, @page ... (keyframes are pruned afterwards)
+            output.append(f"{prelude}{{{body}}}")
+        else:
+            selectors = [selector for selector in split_selectors(prelude)
+                         if selector_is_used(selector, used_classes, used_ids)]
+            if selectors:
+                output.append(f"{','.join(selectors)}{{{body}}}")
+    return '\n'.join(output)
+
+
+def prune_unused_keyframes(css):
+    """
+    Remove @keyframes blocks whose animation name is never referenced
+
+    Args:
+        css (str): Purged stylesheet text
+
+    Returns:
+        str: Stylesheet without unreferenced keyframes
+    """
+    blocks = parse_css_blocks(css)
+    names = {}
+    for prelude, _ in blocks:
+        match = _KEYFRAMES_PATTERN.match(prelude)
+        if match:
+            names[prelude] = match.group(1)
+
+    referenced = set()
+    for prelude, body in blocks:
+        if body is not None and prelude not in names:
+            referenced.update(_IDENTIFIER_PATTERN.findall(body))
+
+    output = []
+    for prelude, body in blocks:
+        if prelude in names and names[prelude] not in referenced:
+            continue
+        output.append(prelude + ';' if body is None else f"{prelude}{{{body}}}")
+    return '\n'.join(output)
+
+
+def minify_css(css):
+    """
+    Minify stylesheet text without touching quoted strings
+
+    Args:
+        css (str): Stylesheet text
+
+    Returns:
+        str: Minified stylesheet
+    """
+    css = _COMMENT_PATTERN.sub('', css)
+    strings = []
+    code = []
+    for is_string, text in split_css_strings(css):
+        if is_string:
+            code.append(f"\x00{len(strings)}\x00")
+            strings.append(text)
+        else:
+            code.append(text)
+
+    text = re.sub(r'\s+', ' ', ''.join(code))
+    text = re.sub(r'\s*([{};,>])\s*', r'\1', text)
+    text = re.sub(r'\s*:\s*(?=[^{}]*[;}])', ':', text)
+    text = text.replace(';}', '}')
+    return re.sub(r'\x00(\d+)\x00', lambda match: strings[int(match.group(1))], text).strip()
+
+
+def collect_used_names(html_sources, script_sources):
+    """
+    Collect the class names and ids the pages can reference
+
+    Every identifier in a script counts as used, since scripts build class
+    names dynamically (e.g. `message ${sender}`).
+
+    Args:
+        html_sources (list): Page template texts
+        script_sources (list): Script texts
+
+    Returns:
+        tuple: (set of class names, set of ids)
+    """
+    used_classes = set()
+    used_ids = set()
+    for html in html_sources:
+        for value in _CLASS_ATTR_PATTERN.findall(html):
+            used_classes.update(value.split())
+        for value in _ID_ATTR_PATTERN.findall(html):
+            used_ids.update(value.split())
+    for script in script_sources:
+        identifiers = set(_IDENTIFIER_PATTERN.findall(script))
+        used_classes.update(identifiers)
+        used_ids.update(identifiers)
+    return used_classes, used_ids
+
+
+def hashed_name(name, content):
+    """
+    Build a content-hashed file name
+
+    Args:
+        name (str): Logical file name, e.g. 'amigo.css'
+        content (bytes): File contents
+
+    Returns:
+        str: Name with a hash inserted before the extension
+    """
+    stem, extension = os.path.splitext(name)
+    digest = hashlib.sha256(content).hexdigest()[:12]
+    return f"{stem}.{digest}{extension}"
+
+
+def vendor_stylesheet(url, checksums, update, resources):
+    """
+    Load a vendor stylesheet and every file it references
+
+    Referenced files (fonts) are collected into resources and their url()
+    references replaced by placeholders; write_resources() writes them
+    once the purged stylesheet shows which icons are still needed.
+
+    Args:
+        url (str): Stylesheet URL
+        checksums (dict): Pinned vendor file sums
+        update (bool): Download and pin files that are missing (see fetch_vendor_file)
+        resources (dict): Receives placeholder -> (file name, contents)
+
+    Returns:
+        str: Comment-free stylesheet text with placeholder url() references
+    """
+    css = _COMMENT_PATTERN.sub('', fetch_vendor_file(url, checksums, update).decode('utf-8'))
+    placeholders = {}
+
+    def rewrite(match):
+        reference = match.group(2).strip()
+        if reference.startswith(('data:', '#')):
+            return match.group(0)
+        absolute = urllib.parse.urljoin(url, reference)
+        resource_url = urllib.parse.urldefrag(absolute)[0].split('?')[0]
+        placeholder = placeholders.get(resource_url)
+        if placeholder is None:
+            placeholder = _RESOURCE_PLACEHOLDER.format(len(resources))
+            placeholders[resource_url] = placeholder
+            resources[placeholder] = (
+                os.path.basename(urllib.parse.urlsplit(resource_url).path),
+                fetch_vendor_file(resource_url, checksums, update)
+            )
+        return f'url("{placeholder}")'
+
+    return _URL_PATTERN.sub(rewrite, css)
+
+
+def decode_css_string(text):
+    """Resolve the escapes of a quoted CSS string body ("\\f101" -> U+F101)"""
+    def unescape(match):
+        if match.group(1):
+            return chr(int(match.group(1), 16))
+        return match.group(2)
+    return _CSS_ESCAPE_PATTERN.sub(unescape, text)
+
+
+def content_codepoints(css):
+    """
+    Collect the characters the stylesheet inserts through content properties
+
+    Args:
+        css (str): Stylesheet text
+
+    Returns:
+        set: Unicode code points (icon glyphs for icon fonts)
+    """
+    codepoints = set()
+    for match in _CONTENT_PATTERN.finditer(css):
+        codepoints.update(ord(char) for char in decode_css_string(match.group(2)))
+    return codepoints
+
+
+def icon_font_placeholders(css):
+    """Find the resource placeholders referenced by @font-face rules of ICON_FONT_FAMILIES"""
+    placeholders = set()
+    for match in _FONT_FACE_PATTERN.finditer(css):
+        family = _FONT_FAMILY_PATTERN.search(match.group(1))
+        if family is not None and family.group(1).strip().lower() in ICON_FONT_FAMILIES:
+            placeholders.update(re.findall(r'amigo-resource-\d+', match.group(1)))
+    return placeholders
+
+
+def subset_font(content, filename, codepoints):
+    """
+    Keep only the glyphs of the given code points in a font file
+
+    Args:
+        content (bytes): Font file
+        filename (str): File name, whose extension gives the format
+        codepoints (set): Code points to keep
+
+    Returns:
+        bytes: The subset font; the original when fontTools is not installed
+            or cannot write the format (woff2 also needs brotli)
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    if font_subset is None or extension not in _FONT_FLAVORS:
+        return content
+    options = font_subset.Options()
+    options.flavor = _FONT_FLAVORS[extension]
+    try:
+        font = TTFont(io.BytesIO(content))
+        subsetter = font_subset.Subsetter(options)
+        subsetter.populate(unicodes=codepoints)
+        subsetter.subset(font)
+        output = io.BytesIO()
+        font.save(output)
+    except ImportError:
+        return content
+    return output.getvalue()
+
+
+def write_resources(css, resources, written):
+    """
+    Write referenced files to static/dist/ and point the stylesheet at them
+
+    Icon fonts are subset to the icons the stylesheet still uses first.
+
+    Args:
+        css (str): Purged stylesheet with placeholder url() references
+        resources (dict): Placeholder -> (file name, contents), from vendor_stylesheet()
+        written (list): Receives the names of files written to static/dist/
+
+    Returns:
+        tuple: (stylesheet with final file names, bytes before, bytes after subsetting)
+    """
+    icon_fonts = icon_font_placeholders(css)
+    codepoints = content_codepoints(css)
+    referenced = set(re.findall(r'amigo-resource-\d+', css))
+    before = after = 0
+    filenames = {}
+    for placeholder, (name, content) in resources.items():
+        if placeholder not in referenced:
+            continue  # only referenced by rules the purge removed
+        if placeholder in icon_fonts:
+            before += len(content)
+            content = subset_font(content, name, codepoints)
+            after += len(content)
+        filename = hashed_name(name, content)
+        with open(os.path.join(DIST_DIR, filename), 'wb') as output:
+            output.write(content)
+        if filename not in written:
+            written.append(filename)
+        filenames[placeholder] = filename
+    css = re.sub(r'amigo-resource-\d+', lambda match: filenames[match.group(0)], css)
+    return css, before, after
+
+
+def write_bundle(name, text, written):
+    """
+    Write a bundle to static/dist/ under its content-hashed name
+
+    Args:
+        name (str): Logical bundle name
+        text (str): Bundle contents
+        written (list): Receives the name of the written file
+
+    Returns:
+        str: Hashed file name
+    """
+    content = text.encode('utf-8')
+    filename = hashed_name(name, content)
+    with open(os.path.join(DIST_DIR, filename), 'wb') as output:
+        output.write(content)
+    written.append(filename)
+    return filename
+
+
+def read_text(directory, filename):
+    """Read a UTF-8 source file"""
+    with open(os.path.join(directory, filename), encoding='utf-8') as source:
+        return source.read()
+
+
+def build(update_checksums=False):
+    """
+    Build the hashed, minified asset bundles and the manifest
+
+    Args:
+        update_checksums (bool): Download missing vendor files and pin the
+            ones not pinned yet, instead of failing on them
+
+    Returns:
+        dict: The manifest that was written
+    """
+    if os.path.isdir(DIST_DIR):
+        shutil.rmtree(DIST_DIR)
+    os.makedirs(DIST_DIR)
+
+    templates = [read_text(TEMPLATE_DIR, name) for name in sorted(os.listdir(TEMPLATE_DIR))
+                 if name.endswith('.html')]
+    scripts = [read_text(STATIC_DIR, name) for name in SOURCE_SCRIPTS]
+    used_classes, used_ids = collect_used_names(templates, scripts)
+
+    checksums = load_checksums(VENDOR_CHECKSUMS)
+    pinned = dict(checksums)
+    resources = {}
+    stylesheets = [vendor_stylesheet(url, checksums, update_checksums, resources) for url in VENDOR_STYLESHEETS]
+    stylesheets.extend(_COMMENT_PATTERN.sub('', read_text(STATIC_DIR, name)) for name in SOURCE_STYLESHEETS)
+    if checksums != pinned:
+        save_checksums(checksums, VENDOR_CHECKSUMS)
+        print(f"Pinned {len(checksums) - len(pinned)} new vendor files in {VENDOR_CHECKSUMS}; commit them")
+
+    written = []
+    combined_css = prune_unused_keyframes(purge_css('\n'.join(stylesheets), used_classes, used_ids))
+    css_text, font_bytes, subset_bytes = write_resources(minify_css(combined_css), resources, written)
+    css_file = write_bundle('amigo.css', css_text, written)
+    # Scripts are bundled unminified on purpose: stripping comments safely needs a real
+    # JavaScript tokenizer (strings, template literals and regex literals can all contain
+    # // and /*), and brotli/gzip already recover most of what minification would save
+    js_file = write_bundle('amigo.js', '\n'.join(scripts), written)
+
+    manifest = {
+        'stylesheets': [css_file],
+        'scripts': [js_file],
+        'files': sorted(written)
+    }
+    with open(os.path.join(DIST_DIR, 'manifest.json'), 'w', encoding='utf-8') as output:
+        json.dump(manifest, output, indent=2)
+
+    source_bytes = sum(len(text) for text in stylesheets) + sum(len(text) for text in scripts)
+    bundle_bytes = sum(os.path.getsize(os.path.join(DIST_DIR, name)) for name in (css_file, js_file))
+    print(f"Wrote {len(written)} files to {DIST_DIR} "
+          f"(css+js {source_bytes} -> {bundle_bytes} bytes)")
+    if font_subset is None:
+        print("fontTools is not installed; icon fonts were shipped whole (pip install fonttools)")
+    elif font_bytes:
+        print(f"Subset icon fonts: {font_bytes} -> {subset_bytes} bytes")
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build self-hosted, minified frontend assets")
+    parser.add_argument('--update-checksums', action='store_true',
+                        help="download vendor files missing from assets/vendor/ and pin any unpinned ones")
+    args = parser.parse_args(argv)
+    try:
+        build(update_checksums=args.update_checksums)
+    except (OSError, ValueError) as e:
+        print(f"Asset build failed: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,270 @@
+"""
+Per-session conversation contexts for the /chat interface
+Dialogflow keeps the contexts a handler returns alive for lifespanCount
+turns and passes them back as input contexts; this store does the same for
+the web chat. Sessions are kept in process memory, evicted least recently
+used first once the store is full and after a period of inactivity. With a
+database configured (see session_store.py) they are kept in each session's
+server-side state, so every worker on every host sees the same contexts;
+otherwise, with a shared cache configured (see shared_cache.py), they are
+kept there, shared by the workers of one host.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import REGISTRY
+from session_store import get_session_store
+from shared_cache import get_shared_cache
+
+# Sessions held in memory, and seconds of inactivity before a session's contexts expire
+CONTEXT_MAX_SESSIONS = int(os.environ.get("AMIGO_CONTEXT_MAX_SESSIONS", "100000"))
+CONTEXT_TTL = float(os.environ.get("AMIGO_CONTEXT_TTL", "1800"))
+
+CONTEXT_EVENTS = REGISTRY.counter(
+    'amigo_context_store_events_total', 'Chat context lookups by result, and sessions dropped', ('event',)
+)
+
+
+def context_short_name(context):
+    """
+    Get the last path segment of a context name
+
+    Args:
+        context (dict): Context with a full 'name' (projects/.../contexts/<name>)
+
+    Returns:
+        str: The short context name
+    """
+    return context.get('name', '').rsplit('/', 1)[-1]
+
+
+def advance_contexts(active_contexts, output_contexts):
+    """
+    Apply one conversation turn to a session's active contexts
+
+    Every active context loses one turn of lifespan and is dropped when it
+    reaches zero; contexts the handler returned then replace those with the
+    same name (a lifespanCount of 0 removes the context).
+
+    Args:
+        active_contexts (tuple): Contexts that were input to the turn
+        output_contexts (list): Contexts returned by the handler
+
+    Returns:
+        tuple: The contexts active for the next turn
+    """
+    contexts = OrderedDict()
+    for context in active_contexts:
+        lifespan = context.get('lifespanCount', 1) - 1
+        if lifespan > 0:
+            contexts[context_short_name(context)] = dict(context, lifespanCount=lifespan)
+
+    for context in output_contexts or ():
+        name = context_short_name(context)
+        contexts.pop(name, None)
+        if context.get('lifespanCount', 1) > 0:
+            contexts[name] = context
+
+    return tuple(contexts.values())
+
+
+def _drop_contexts(state):
+    """Remove the contexts from a session's server-side state"""
+    state.pop('contexts', None)
+    state.pop('contexts_expire', None)
+
+
+class ContextStore:
+    """
+    Bounded LRU + TTL map of session_id to active contexts
+
+    Stored contexts are treated as immutable: get() hands out shallow copies
+    of the list and advance_contexts() builds new dicts instead of editing.
+    With a session store, contexts live in each session's state (read
+    through its cache, written with its version check); otherwise with a
+    shared cache they live under its 'contexts' namespace. Either way the
+    in-process map stays empty.
+    """
+
+    def __init__(self, max_sessions=CONTEXT_MAX_SESSIONS, ttl=CONTEXT_TTL, shared=None, sessions=None):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.shared = shared
+        self.sessions = sessions
+        self._sessions = OrderedDict()  # session_id -> (expires, contexts), least recently used first
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0, 'errors': 0}
+
+    def _count(self, event):
+        """Count a lookup result or dropped session (caller holds the lock)"""
+        self._stats[event] += 1
+        CONTEXT_EVENTS.inc((event,))
+
+    def get(self, session_id):
+        """
+        Get the contexts to pass into a session's next turn
+
+        Args:
+            session_id (str): Chat session identifier
+
+        Returns:
+            list: Active contexts, empty for a new or expired session
+        """
+        if self.sessions is not None:
+            return self._get_from_sessions(session_id)
+
+        if self.shared is not None:
+            contexts = self.shared.get('contexts', session_id)
+            with self._lock:
+                self._count('hits' if contexts is not None else 'misses')
+            return contexts or []
+
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                self._count('misses')
+                return []
+            if entry[0] <= time.monotonic():
+                del self._sessions[session_id]
+                self._count('expired')
+                self._count('misses')
+                return []
+            self._sessions.move_to_end(session_id)
+            self._count('hits')
+            return list(entry[1])
+
+    def advance(self, session_id, input_contexts, output_contexts):
+        """
+        Store the contexts left active after a turn
+
+        Args:
+            session_id (str): Chat session identifier
+            input_contexts (list): Contexts that were passed into the turn
+            output_contexts (list): Contexts returned by the handler
+        """
+        if self.sessions is not None:
+            self._advance_in_sessions(session_id, input_contexts, output_contexts)
+            return
+
+        contexts = advance_contexts(input_contexts, output_contexts)
+        if self.shared is not None:
+            if contexts:
+                self.shared.set('contexts', session_id, contexts, self.ttl)
+            elif input_contexts:
+                self.shared.delete('contexts', session_id)
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            if contexts:
+                self._sessions[session_id] = (now + self.ttl, contexts)
+                self._sessions.move_to_end(session_id)
+            else:
+                self._sessions.pop(session_id, None)
+            self._evict(now)
+
+    def _get_from_sessions(self, session_id):
+        """Read contexts from the session's server-side state"""
+        try:
+            state, _ = self.sessions.load(session_id)
+        except Exception as e:
+            # Replies go on without contexts rather than fail
+            logging.error(f"Failed to load contexts for {session_id}: {str(e)}")
+            with self._lock:
+                self._count('errors')
+                self._count('misses')
+            return []
+
+        contexts = state.get('contexts')
+        with self._lock:
+            if contexts and state.get('contexts_expire', 0) <= time.time():
+                self._count('expired')
+                contexts = None
+            self._count('hits' if contexts else 'misses')
+        return list(contexts or ())
+
+    def _advance_in_sessions(self, session_id, input_contexts, output_contexts):
+        """
+        Write the contexts left after a turn into the session's state
+
+        The write is synchronous, so the next turn finds the contexts on any
+        host. The turn is applied to the contexts stored now rather than the
+        ones it was given: when another host wrote the session since this
+        one's cached copy was read, the version check makes the store reload
+        and the turn lands on top of the other host's.
+        """
+        if not input_contexts and not output_contexts:
+            return
+        ttl = self.ttl
+
+        def change(state):
+            current = state.get('contexts') or ()
+            if current and state.get('contexts_expire', 0) <= time.time():
+                current = ()
+            contexts = advance_contexts(current, output_contexts)
+            if contexts:
+                state['contexts'] = list(contexts)
+                state['contexts_expire'] = time.time() + ttl
+            else:
+                _drop_contexts(state)
+
+        try:
+            self.sessions.update(session_id, change)
+        except Exception as e:
+            logging.error(f"Failed to save contexts for {session_id}: {str(e)}")
+            with self._lock:
+                self._count('errors')
+
+    def _evict(self, now):
+        """Drop expired sessions from the cold end, then enforce the size bound (lock held)"""
+        sessions = self._sessions
+        while sessions:
+            session_id, (expires, _) = next(iter(sessions.items()))
+            if expires > now:
+                break
+            del sessions[session_id]
+            self._count('expired')
+        while len(sessions) > self.max_sessions:
+            sessions.popitem(last=False)
+            self._count('evictions')
+
+    def clear(self, session_id):
+        """
+        Forget a session's contexts
+
+        Args:
+            session_id (str): Chat session identifier
+        """
+        if self.sessions is not None:
+            self.sessions.update(session_id, _drop_contexts)
+            return
+        if self.shared is not None:
+            self.shared.delete('contexts', session_id)
+            return
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def get_stats(self):
+        """
+        Get hit and eviction statistics since startup
+
+        The counts are also exported as amigo_context_store_events_total.
+
+        Returns:
+            dict: Hits, misses, expired and evicted sessions, storage errors, current
+                size and hit_rate (sessions held in this process; 0 with a
+                session store or shared cache)
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['sessions'] = len(self._sessions)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+
+CONTEXT_STORE = ContextStore(shared=get_shared_cache(), sessions=get_session_store())
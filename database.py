@@ -0,0 +1,116 @@
+"""
+Pooled database engine shared by the server-side stores
+The engine is created lazily once per process (gunicorn workers each get
+their own pool after fork) from DATABASE_URL. PostgreSQL is used in
+production through psycopg2; sqlite:/// URLs work for local testing.
+"""
+
+import os
+import threading
+
+from sqlalchemy import MetaData, create_engine, event
+from sqlalchemy.pool import StaticPool
+
+DATABASE_URL = os.environ.get("DATABASE_URL", "")
+
+# Connections kept open per process, and extra connections allowed under bursts
+DB_POOL_SIZE = int(os.environ.get("AMIGO_DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.environ.get("AMIGO_DB_MAX_OVERFLOW", "10"))
+
+# Seconds to wait for a pooled connection before failing the request
+DB_POOL_TIMEOUT = float(os.environ.get("AMIGO_DB_POOL_TIMEOUT", "5"))
+
+# Recycle connections before typical server-side idle timeouts drop them
+DB_POOL_RECYCLE = 1800
+
+# Tables of every store; created on first engine use
+METADATA = MetaData()
+
+_engine = None
+_engine_pid = None
+_engine_lock = threading.Lock()
+
+
+def normalize_database_url(url):
+    """
+    Map legacy and driverless PostgreSQL URLs to the psycopg2 driver
+
+    Args:
+        url (str): Database URL as configured
+
+    Returns:
+        str: URL accepted by SQLAlchemy
+    """
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    if url.startswith('postgresql://'):
+        url = 'postgresql+psycopg2://' + url[len('postgresql://'):]
+    return url
+
+
+def _enable_sqlite_wal(dbapi_connection, connection_record):
+    """Let SQLite readers proceed while another connection writes"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.close()
+
+
+def create_database_engine(url):
+    """
+    Create a pooled engine for a database URL
+
+    Args:
+        url (str): SQLAlchemy or Heroku-style database URL
+
+    Returns:
+        Engine: Engine with a connection pool sized for this process
+    """
+    url = normalize_database_url(url)
+
+    if url.startswith('sqlite'):
+        if url in ('sqlite://', 'sqlite:///:memory:'):
+            # One shared connection, or every checkout would see an empty database
+            return create_engine(url, poolclass=StaticPool, connect_args={'check_same_thread': False})
+        engine = create_engine(url, connect_args={'check_same_thread': False, 'timeout': DB_POOL_TIMEOUT})
+        event.listen(engine, 'connect', _enable_sqlite_wal)
+        return engine
+
+    return create_engine(
+        url,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=True
+    )
+
+
+def is_configured():
+    """
+    Check whether a database has been configured
+
+    Returns:
+        bool: True when DATABASE_URL is set
+    """
+    return bool(DATABASE_URL)
+
+
+def get_engine():
+    """
+    Get this process's engine, creating it and the tables on first use
+
+    Returns:
+        Engine: The shared engine for DATABASE_URL
+    """
+    global _engine, _engine_pid
+    if _engine is None or _engine_pid != os.getpid():
+        with _engine_lock:
+            if _engine is None or _engine_pid != os.getpid():
+                if _engine is not None:
+                    # Inherited across fork: drop the parent's connections without closing them
+                    _engine.dispose(close=False)
+                engine = create_database_engine(DATABASE_URL)
+                METADATA.create_all(engine)
+                _engine, _engine_pid = engine, os.getpid()
+    return _engine
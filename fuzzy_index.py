@@ -0,0 +1,204 @@
+"""
+Typo correction against a small vocabulary with a symmetric-delete index
+Every vocabulary word is stored under each string obtained by deleting up to
+max_distance characters from its prefix. A misspelled token is corrected by
+generating the same deletes of its own prefix and looking them up: any word
+within the edit distance shares at least one of them, so only those few
+candidates are checked with a real edit distance, never the whole vocabulary.
+Only the first prefix_length characters are used (as in SymSpell), which caps
+the deletes per token whatever its length. Corrections are memoized, so a
+token seen before costs one dictionary lookup.
+"""
+
+from functools import lru_cache
+
+
+def deletes(word, max_deletes):
+    """
+    Every string obtained by deleting up to max_deletes characters after the first
+
+    The first character is kept, since corrections never change it.
+
+    Args:
+        word (str): Word to delete characters from
+        max_deletes (int): Most characters deleted
+
+    Returns:
+        set: The variants, including the word itself
+    """
+    variants = {word}
+    frontier = [(word, 1)]
+    for _ in range(max_deletes):
+        # Positions only move forward, so each combination of deletes is made once
+        frontier = [
+            (variant[:position] + variant[position + 1:], position)
+            for variant, start in frontier for position in range(start, len(variant))
+        ]
+        variants.update(variant for variant, _ in frontier)
+    return variants
+
+
+def edit_distance(source, target, limit):
+    """
+    Optimal string alignment distance (Levenshtein plus adjacent transpositions)
+
+    Args:
+        source (str): Misspelled token
+        target (str): Vocabulary word
+        limit (int): Largest distance of interest
+
+    Returns:
+        int: The distance, or limit + 1 once it is known to exceed the limit
+    """
+    source_length, target_length = len(source), len(target)
+    too_far = limit + 1
+    if abs(source_length - target_length) > limit:
+        return too_far
+    # Only cells within limit of the diagonal can stay within the limit
+    previous2 = None
+    previous = [j if j <= limit else too_far for j in range(target_length + 1)]
+    for i in range(1, source_length + 1):
+        source_char = source[i - 1]
+        current = [too_far] * (target_length + 1)
+        if i <= limit:
+            current[0] = i
+        row_best = current[0]
+        for j in range(max(1, i - limit), min(target_length, i + limit) + 1):
+            target_char = target[j - 1]
+            if source_char == target_char:
+                value = previous[j - 1]
+            else:
+                value = min(previous[j - 1], previous[j], current[j - 1]) + 1
+                if previous2 is not None and j > 1 and source_char == target[j - 2] and source[i - 2] == target_char:
+                    value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+            if value < row_best:
+                row_best = value
+        if row_best > limit:
+            return too_far
+        previous2, previous = previous, current
+    return previous[target_length] if previous[target_length] <= limit else too_far
+
+
+class SymmetricDeleteIndex:
+    """
+    Corrects tokens to the nearest vocabulary word within a length-scaled distance
+
+    The edits allowed grow with token length: edit_lengths[i] is the
+    shortest token allowed i + 1 edits, so the default (5, 8, 14) allows
+    none below 5 letters, one from 5, two from 8 and three from 14. Tokens
+    too long to be within reach of any word are never looked up. A
+    correction keeps the first letter, which people rarely mistype and which
+    rules out most real words near a keyword ("curious" is not "furious").
+    Protected tokens, known real words, are never corrected. Ties go to the
+    word added first, so callers add words in priority order.
+    """
+
+    def __init__(self, words, edit_lengths=(5, 8, 14), prefix_length=7, protected=(), cache_size=65536):
+        self.edit_lengths = tuple(edit_lengths)
+        self.min_length = self.edit_lengths[0]
+        self.max_distance = len(self.edit_lengths)
+        self.prefix_length = prefix_length
+        self.protected = protected if isinstance(protected, (set, frozenset)) else frozenset(protected)
+        self._rank = {}
+        self._deletes = {}  # prefix delete (first letter kept) -> words it was derived from, in rank order
+        for word in words:
+            if word in self._rank:
+                continue
+            self._rank[word] = len(self._rank)
+            for variant in deletes(word[:prefix_length], self.max_distance):
+                self._deletes.setdefault(variant, []).append(word)
+        self.words = tuple(self._rank)
+        # Longer tokens cannot be within reach of any word
+        self.max_length = max(map(len, self.words), default=0) + self.max_distance
+        self.correct = lru_cache(maxsize=cache_size)(self._correct)
+
+    def __len__(self):
+        return len(self.words)
+
+    def max_edits(self, length):
+        """
+        Get the edits allowed for a token of a given length
+
+        Args:
+            length (int): Token length
+
+        Returns:
+            int: Edits allowed, 0 for tokens too short to correct
+        """
+        edits = 0
+        for shortest in self.edit_lengths:
+            if length < shortest:
+                break
+            edits += 1
+        return edits
+
+    def _correct(self, token):
+        """
+        Find the vocabulary word a token was most likely meant to be
+
+        Args:
+            token (str): Lowercase word token not in the vocabulary
+
+        Returns:
+            str: The closest word, or None when nothing is close enough
+        """
+        length = len(token)
+        if length < self.min_length or length > self.max_length or token in self.protected:
+            return None
+        limit = self.max_edits(length)
+
+        best, best_key = None, None
+        seen = set()
+        for variant in deletes(token[:self.prefix_length], limit):
+            for word in self._deletes.get(variant, ()):
+                if word in seen:
+                    continue
+                seen.add(word)
+                # Cheap length check first: most candidates sharing a prefix delete are too long or short
+                if abs(len(word) - length) > limit:
+                    continue
+                distance = edit_distance(token, word, limit)
+                if distance <= limit and (best_key is None or (distance, self._rank[word]) < best_key):
+                    best, best_key = word, (distance, self._rank[word])
+        return best
+
+    def correct_tokens(self, tokens):
+        """
+        Replace misspelled tokens with the vocabulary words they were meant to be
+
+        Args:
+            tokens (list): Tokens produced by intent_detection.tokenize()
+
+        Returns:
+            list: The tokens, corrected where a close word exists (the same
+                list when nothing changed)
+        """
+        rank = self._rank
+        min_length, max_length = self.min_length, self.max_length
+        corrected = None
+        for position, token in enumerate(tokens):
+            if token in rank or not min_length <= len(token) <= max_length:
+                continue
+            word = self.correct(token)
+            if word is not None:
+                if corrected is None:
+                    corrected = list(tokens)
+                corrected[position] = word
+        return corrected if corrected is not None else tokens
+
+    def get_stats(self):
+        """
+        Get index size and correction cache statistics
+
+        Returns:
+            dict: Words, delete variants, and cache hits, misses and size
+        """
+        cache = self.correct.cache_info()
+        return {
+            'words': len(self.words),
+            'variants': len(self._deletes),
+            'cache_hits': cache.hits,
+            'cache_misses': cache.misses,
+            'cache_size': cache.currsize,
+        }
@@ -0,0 +1,484 @@
+"""
+Optional generative replies for messages no intent handler recognizes
+Calls go through a bounded worker pool with a hard per-call deadline; when the
+backend is disabled, saturated, slow or failing, callers get None and fall
+back to the canned reply. Configured through environment variables:
+
+    AMIGO_GENERATIVE_BACKEND      off (default), openai or stub
+    AMIGO_GENERATIVE_TIMEOUT      per-call deadline in seconds (default 2.5)
+    AMIGO_GENERATIVE_CONCURRENCY  calls allowed in flight per process (default 8)
+    AMIGO_GENERATIVE_MODEL        OpenAI model name (default gpt-4o-mini)
+    AMIGO_STUB_LATENCY_MS         simulated stub backend latency (default 0)
+    AMIGO_RESPONSE_CACHE_SIZE     cached replies per process, 0 disables (default 1024)
+    AMIGO_RESPONSE_CACHE_TTL      seconds a cached reply stays valid (default 3600)
+    AMIGO_RESPONSE_CACHE_THRESHOLD  cosine similarity needed to reuse a reply (default 0.8)
+
+Cached replies are also shared between workers when AMIGO_SHARED_CACHE is set.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from metrics import REGISTRY
+
+GENERATIVE_BACKEND = os.environ.get("AMIGO_GENERATIVE_BACKEND", "off").lower()
+GENERATIVE_TIMEOUT = float(os.environ.get("AMIGO_GENERATIVE_TIMEOUT", "2.5"))
+GENERATIVE_CONCURRENCY = int(os.environ.get("AMIGO_GENERATIVE_CONCURRENCY", "8"))
+GENERATIVE_MODEL = os.environ.get("AMIGO_GENERATIVE_MODEL", "gpt-4o-mini")
+STUB_LATENCY_MS = float(os.environ.get("AMIGO_STUB_LATENCY_MS", "0"))
+RESPONSE_CACHE_SIZE = int(os.environ.get("AMIGO_RESPONSE_CACHE_SIZE", "1024"))
+RESPONSE_CACHE_TTL = float(os.environ.get("AMIGO_RESPONSE_CACHE_TTL", "3600"))
+RESPONSE_CACHE_THRESHOLD = float(os.environ.get("AMIGO_RESPONSE_CACHE_THRESHOLD", "0.8"))
+
+# Replies are kept short; they stand in for a canned sentence or two
+MAX_REPLY_TOKENS = 160
+
+SYSTEM_PROMPT = (
+    "You are AMIGO, a warm, supportive mental health companion. Reply in two or "
+    "three short sentences: reflect what the user said, validate their feelings "
+    "and ask one gentle follow-up question. Never diagnose or give medical advice. "
+    "If the user mentions self-harm or suicide, encourage them to call or text 988 "
+    "(Suicide & Crisis Lifeline) or text HOME to 741741."
+)
+
+
+GENERATIVE_CALLS = REGISTRY.counter(
+    'amigo_generative_calls_total', 'Generative fallback calls by backend and outcome', ('backend', 'outcome')
+)
+
+
+class StubBackend:
+    """
+    Deterministic offline backend for development and load testing
+
+    The same message always produces the same reply, after an optional
+    simulated latency.
+    """
+
+    name = 'stub'
+
+    REPLIES = (
+        "Thank you for telling me that. It sounds like there's a lot on your mind. What feels most important to talk about right now?",
+        "I hear you, and what you're feeling matters. Could you tell me a little more about what's been happening?",
+        "That sounds like it's been weighing on you. How long have you been feeling this way?",
+        "I'm really glad you shared this with me. What would feel most supportive for you in this moment?",
+    )
+
+    def __init__(self, latency_ms=0.0):
+        self.latency = latency_ms / 1000
+
+    def complete(self, message, timeout):
+        """
+        Produce a reply for a user message
+
+        Args:
+            message (str): The user's message
+            timeout (float): Seconds the caller will wait (unused)
+
+        Returns:
+            str: Reply text
+        """
+        if self.latency:
+            time.sleep(self.latency)
+        return self._reply(message)
+
+    def stream(self, message, timeout):
+        """
+        Produce a reply word by word, spreading the simulated latency over the words
+
+        Args:
+            message (str): The user's message
+            timeout (float): Seconds the caller will wait for each piece (unused)
+
+        Yields:
+            str: Reply pieces that concatenate to the full reply
+        """
+        words = self._reply(message).split(' ')
+        for index, word in enumerate(words):
+            if self.latency:
+                time.sleep(self.latency / len(words))
+            yield word if index == len(words) - 1 else word + ' '
+
+    def _reply(self, message):
+        digest = hashlib.blake2b(message.encode('utf-8'), digest_size=4).digest()
+        return self.REPLIES[int.from_bytes(digest, 'big') % len(self.REPLIES)]
+
+
+class OpenAIBackend:
+    """
+    Chat completions through the OpenAI API
+
+    One client is created per process and reused for every call, so requests
+    share its pooled keep-alive connections instead of paying a TLS handshake
+    each time.
+    """
+
+    name = 'openai'
+
+    def __init__(self, model=GENERATIVE_MODEL):
+        self.model = model
+        self._client = None
+        self._client_pid = None
+        self._client_lock = threading.Lock()
+
+    def _get_client(self):
+        """Create the API client on first use in this process"""
+        if self._client is None or self._client_pid != os.getpid():
+            with self._client_lock:
+                if self._client is None or self._client_pid != os.getpid():
+                    import openai
+                    self._client = openai.OpenAI(max_retries=0)
+                    self._client_pid = os.getpid()
+        return self._client
+
+    def warm(self):
+        """Import the SDK and create this process's client without calling the API"""
+        self._get_client()
+
+    def complete(self, message, timeout):
+        """
+        Produce a reply for a user message
+
+        Args:
+            message (str): The user's message
+            timeout (float): Request timeout in seconds
+
+        Returns:
+            str: Reply text
+        """
+        completion = self._get_client().chat.completions.create(
+            model=self.model,
+            messages=[
+                {'role': 'system', 'content': SYSTEM_PROMPT},
+                {'role': 'user', 'content': message}
+            ],
+            max_tokens=MAX_REPLY_TOKENS,
+            temperature=0.7,
+            timeout=timeout
+        )
+        return completion.choices[0].message.content
+
+    def stream(self, message, timeout):
+        """
+        Produce a reply as the API streams its tokens
+
+        Args:
+            message (str): The user's message
+            timeout (float): Request timeout in seconds
+
+        Yields:
+            str: Reply pieces that concatenate to the full reply
+        """
+        response = self._get_client().chat.completions.create(
+            model=self.model,
+            messages=[
+                {'role': 'system', 'content': SYSTEM_PROMPT},
+                {'role': 'user', 'content': message}
+            ],
+            max_tokens=MAX_REPLY_TOKENS,
+            temperature=0.7,
+            timeout=timeout,
+            stream=True
+        )
+        try:
+            for chunk in response:
+                piece = chunk.choices[0].delta.content if chunk.choices else None
+                if piece:
+                    yield piece
+        finally:
+            response.close()
+
+
+# Marks the end of a streamed reply in the queue between backend and caller
+_STREAM_END = object()
+
+
+_BACKEND_FACTORIES = {
+    'openai': OpenAIBackend,
+    'stub': lambda: StubBackend(STUB_LATENCY_MS),
+}
+
+
+class GenerativeClient:
+    """
+    Runs backend calls with a concurrency cap and a hard deadline
+
+    A call that cannot get a slot is shed immediately. A call that misses its
+    deadline is abandoned by the caller but keeps its slot until the backend
+    returns, so a hung backend can never hold more than `concurrency` threads.
+    Replies found in the optional semantic cache skip the backend entirely.
+    Streamed replies (stream()) take a slot the same way, and each piece must
+    arrive within the deadline.
+    """
+
+    def __init__(self, backend, timeout=GENERATIVE_TIMEOUT, concurrency=GENERATIVE_CONCURRENCY, cache=None):
+        self.backend = backend
+        self.cache = cache
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+        self._stats = {'generated': 0, 'timed_out': 0, 'shed': 0, 'failed': 0}
+
+    def _get_executor(self):
+        """Create the worker pool on first use in this process (safe across fork)"""
+        if self._executor is None or self._executor_pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._executor_pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.concurrency,
+                        thread_name_prefix='amigo-generative'
+                    )
+                    self._executor_pid = os.getpid()
+                    self._slots = threading.BoundedSemaphore(self.concurrency)
+        return self._executor
+
+    def warm(self):
+        """Create the worker pool and the backend's API client ahead of the first call"""
+        self._get_executor()
+        backend_warm = getattr(self.backend, 'warm', None)
+        if backend_warm is not None:
+            backend_warm()
+
+    def _count(self, outcome):
+        with self._lock:
+            self._stats[outcome] += 1
+        GENERATIVE_CALLS.inc((self.backend.name, outcome))
+
+    def _submit(self, function, *args):
+        """
+        Start a backend call if a slot is free
+
+        Args:
+            function (callable): Runs the call on a worker thread
+            *args: Arguments for function
+
+        Returns:
+            Future: The pending call, or None when shed
+        """
+        executor = self._get_executor()
+        slots = self._slots
+        if not slots.acquire(blocking=False):
+            self._count('shed')
+            return None
+        try:
+            future = executor.submit(function, *args)
+        except RuntimeError:
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: slots.release())
+        return future
+
+    def _cached(self, message):
+        """Look a message up in the semantic cache, if there is one"""
+        if self.cache is None:
+            return None
+        return self.cache.get(message)
+
+    def _finish(self, message, text):
+        """Normalize a backend result, counting and caching it"""
+        text = (text or '').strip()
+        self._count('generated' if text else 'failed')
+        if text and self.cache is not None:
+            text = self.cache.put(message, text)
+        return text or None
+
+    def generate(self, message):
+        """
+        Get a reply, waiting at most the configured deadline
+
+        Args:
+            message (str): The user's message
+
+        Returns:
+            str: Reply text, or None to use the canned fallback
+        """
+        cached = self._cached(message)
+        if cached is not None:
+            return cached
+        future = self._submit(self.backend.complete, message, self.timeout)
+        if future is None:
+            return None
+        try:
+            return self._finish(message, future.result(timeout=self.timeout))
+        except FutureTimeoutError:
+            self._count('timed_out')
+            logging.warning(f"Generative backend '{self.backend.name}' missed its {self.timeout}s deadline")
+        except Exception as e:
+            self._count('failed')
+            logging.error(f"Generative backend '{self.backend.name}' failed: {str(e)}")
+        return None
+
+    async def generate_async(self, message):
+        """
+        Get a reply without blocking the event loop
+
+        Cache lookups and stores run on a worker thread: with the sqlite
+        shared cache they are file I/O, and a store can wait up to the
+        cache's busy timeout for another process's write.
+
+        Args:
+            message (str): The user's message
+
+        Returns:
+            str: Reply text, or None to use the canned fallback
+        """
+        if self.cache is not None:
+            cached = await asyncio.to_thread(self._cached, message)
+            if cached is not None:
+                return cached
+        future = self._submit(self.backend.complete, message, self.timeout)
+        if future is None:
+            return None
+        try:
+            text = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+            if self.cache is None:
+                return self._finish(message, text)
+            return await asyncio.to_thread(self._finish, message, text)
+        except asyncio.TimeoutError:
+            self._count('timed_out')
+            logging.warning(f"Generative backend '{self.backend.name}' missed its {self.timeout}s deadline")
+        except Exception as e:
+            self._count('failed')
+            logging.error(f"Generative backend '{self.backend.name}' failed: {str(e)}")
+        return None
+
+    def _pump(self, message, pieces, abandoned):
+        """Run a streaming backend call on a worker thread, queueing its pieces for the caller"""
+        try:
+            backend_stream = getattr(self.backend, 'stream', None)
+            if backend_stream is None:
+                pieces.put(self.backend.complete(message, self.timeout))
+            else:
+                for piece in backend_stream(message, self.timeout):
+                    if abandoned.is_set():
+                        # Closing the generator closes the backend's connection
+                        return
+                    pieces.put(piece)
+            pieces.put(_STREAM_END)
+        except Exception as e:
+            pieces.put(e)
+
+    def stream(self, message):
+        """
+        Get a reply in pieces as the backend produces them
+
+        A cached reply is yielded whole. Each piece must arrive within the
+        deadline; when one does not, or the backend fails, the stream ends
+        early. Only a complete reply is counted as generated and cached.
+
+        Args:
+            message (str): The user's message
+
+        Yields:
+            str: Reply pieces; none when the caller should use the canned
+                fallback, which is only the case if nothing was yielded
+        """
+        cached = self._cached(message)
+        if cached is not None:
+            yield cached
+            return
+        pieces = queue.Queue()
+        abandoned = threading.Event()
+        if self._submit(self._pump, message, pieces, abandoned) is None:
+            return
+        text = []
+        try:
+            while True:
+                piece = pieces.get(timeout=self.timeout)
+                if piece is _STREAM_END:
+                    break
+                if isinstance(piece, Exception):
+                    raise piece
+                text.append(piece)
+                yield piece
+        except queue.Empty:
+            self._count('timed_out')
+            logging.warning(f"Generative backend '{self.backend.name}' missed its {self.timeout}s deadline while streaming")
+            return
+        except Exception as e:
+            self._count('failed')
+            logging.error(f"Generative backend '{self.backend.name}' failed: {str(e)}")
+            return
+        finally:
+            # The caller may stop reading early (a client disconnect); let the worker stop too
+            abandoned.set()
+        self._finish(message, ''.join(text))
+
+    def get_stats(self):
+        """
+        Get outcome counts since startup
+
+        The outcomes are also exported as amigo_generative_calls_total.
+
+        Returns:
+            dict: generated, timed_out, shed and failed call counts, plus
+                the response cache statistics under 'cache' when enabled
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        if self.cache is not None:
+            stats['cache'] = self.cache.get_stats()
+        return stats
+
+
+def create_client(backend_name=GENERATIVE_BACKEND):
+    """
+    Build a client for a named backend
+
+    Args:
+        backend_name (str): 'openai', 'stub', or 'off'
+
+    Returns:
+        GenerativeClient: The client, or None when generation is disabled
+    """
+    factory = _BACKEND_FACTORIES.get(backend_name)
+    if factory is None:
+        if backend_name not in ('', 'off', 'none'):
+            logging.warning(f"Unknown generative backend '{backend_name}', generative fallback disabled")
+        return None
+
+    cache = None
+    if RESPONSE_CACHE_SIZE > 0:
+        # numpy is only needed once generation is enabled
+        from response_cache import SemanticResponseCache
+        from shared_cache import get_shared_cache
+        cache = SemanticResponseCache(
+            max_entries=RESPONSE_CACHE_SIZE,
+            ttl=RESPONSE_CACHE_TTL,
+            threshold=RESPONSE_CACHE_THRESHOLD,
+            shared=get_shared_cache()
+        )
+    return GenerativeClient(factory(), cache=cache)
+
+
+_client = create_client()
+
+
+def get_client():
+    """
+    Get the process-wide generative client
+
+    Returns:
+        GenerativeClient: The configured client, or None when disabled
+    """
+    return _client
+
+
+def set_client(client):
+    """
+    Replace the process-wide generative client (for benchmarks and tests)
+
+    Args:
+        client (GenerativeClient): New client, or None to disable generation
+    """
+    global _client
+    _client = client
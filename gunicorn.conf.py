@@ -0,0 +1,124 @@
+"""
+Production gunicorn profile for AMIGO
+
+gunicorn reads this file automatically from the working directory:
+
+    gunicorn main:app
+
+The app is imported and warmed up once in the master (preload_app), then the
+workers are forked from it, so the response catalog, detector trie and
+classifier weights are shared copy-on-write instead of built per worker.
+The master's heap is frozen out of the garbage collector before forking, so
+collections in the workers do not write to (and un-share) those pages.
+Configured through environment variables:
+
+    PORT                     listen port (default 5000)
+    WEB_CONCURRENCY          worker processes (default CPUs + 1)
+    AMIGO_WORKER_CLASS       gthread (default) or sync
+    AMIGO_WORKER_THREADS     threads per gthread worker (default 8)
+    AMIGO_MAX_REQUESTS       requests before a worker is recycled (default 5000, 0 disables)
+    AMIGO_WORKER_TIMEOUT     seconds a silent worker may take before it is killed (default 30)
+    AMIGO_GRACEFUL_TIMEOUT   seconds a worker gets to finish on restart or shutdown (default 30)
+    AMIGO_PRELOAD            on (default) or off, to compare memory without preloading
+
+Unless set otherwise, the workers share one SQLite cache file for chat
+contexts and generated replies (AMIGO_SHARED_CACHE=sqlite, see shared_cache.py),
+and the app refuses to start without a frontend build (AMIGO_REQUIRE_ASSETS=on,
+run python build_assets.py first).
+
+Measure memory per worker with benchmarks/worker_rss.py.
+"""
+
+import gc
+import logging
+import os
+import tempfile
+
+
+def _available_cpus():
+    """CPUs this process may run on (the container's share, where the platform pins it)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+reuse_port = True
+
+workers = int(os.environ.get("WEB_CONCURRENCY", _available_cpus() + 1))
+worker_class = os.environ.get("AMIGO_WORKER_CLASS", "gthread")
+threads = int(os.environ.get("AMIGO_WORKER_THREADS", "8"))
+
+# Import and warm the app once in the master; workers inherit it copy-on-write
+preload_app = os.environ.get("AMIGO_PRELOAD", "on").lower() not in ('off', '0', 'false')
+
+# Recycle workers to bound slow leaks; jitter keeps them from restarting together
+max_requests = int(os.environ.get("AMIGO_MAX_REQUESTS", "5000"))
+max_requests_jitter = max_requests // 10
+
+timeout = int(os.environ.get("AMIGO_WORKER_TIMEOUT", "30"))
+graceful_timeout = int(os.environ.get("AMIGO_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+
+# Every worker serves /metrics for all of them through this directory (see metrics.py)
+os.environ.setdefault(
+    "AMIGO_METRICS_DIR",
+    os.path.join(tempfile.gettempdir(), f"amigo-metrics-{bind.rsplit(':', 1)[-1]}")
+)
+
+# Workers see each other's chat contexts and cached replies through this file (see shared_cache.py)
+os.environ.setdefault("AMIGO_SHARED_CACHE", "sqlite")
+os.environ.setdefault(
+    "AMIGO_SHARED_CACHE_PATH",
+    os.path.join(tempfile.gettempdir(), f"amigo-shared-cache-{bind.rsplit(':', 1)[-1]}.sqlite3")
+)
+
+# Production pages must be served from the self-hosted build, never the CDN (see page_cache.py)
+os.environ.setdefault("AMIGO_REQUIRE_ASSETS", "on")
+
+
+def on_starting(server):
+    """Clear worker snapshots left by a previous run, so counters start from zero"""
+    metrics_dir = os.environ["AMIGO_METRICS_DIR"]
+    if os.path.isdir(metrics_dir):
+        for filename in os.listdir(metrics_dir):
+            if filename.startswith(('metrics-', '.metrics-')):
+                os.remove(os.path.join(metrics_dir, filename))
+
+
+def when_ready(server):
+    """After preloading and before the first fork: move everything allocated so far out of the collector"""
+    if not preload_app:
+        return
+    gc.collect()
+    gc.freeze()
+    server.log.info(f"Froze {gc.get_freeze_count()} preloaded objects out of garbage collection")
+
+
+def post_worker_init(worker):
+    """
+    Finish per-process setup once the worker has installed its signal handlers
+
+    Thread pools, database connections and log listeners cannot cross fork,
+    so they are created here rather than by the first request.
+    """
+    from profiler import install_signal_handler
+    from warmup import WARMUP
+
+    install_signal_handler()
+    WARMUP.warm_worker()
+
+
+def worker_exit(server, worker):
+    """Write queued session turns and transcripts and fold this worker's metrics into the retired totals"""
+    from metrics import REGISTRY
+    from session_store import flush_session_turns
+    from transcripts import flush_transcripts
+
+    flush_session_turns()
+    flush_transcripts()
+    try:
+        REGISTRY.retire_snapshot()
+    except OSError as e:
+        logging.error(f"Failed to retire metrics snapshot: {str(e)}")
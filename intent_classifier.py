@@ -0,0 +1,240 @@
+"""
+Statistical intent classifier, an alternative engine to the keyword rules
+Messages are embedded as TF-IDF weighted hashed n-gram vectors and scored by
+per-intent linear weights, so a single message or a whole batch is ranked
+with one matrix multiply. Results below a confidence threshold route
+to the fallback intent.
+"""
+
+import os
+import threading
+
+import numpy as np
+
+from intent_detection import INTENT_RULES
+from text_vectors import HashedNgramVectorizer, normalize_rows, stemmed_text
+
+# Score the best intent needs before it is trusted over the fallback
+MIN_CONFIDENCE = float(os.environ.get("AMIGO_CLASSIFIER_MIN_CONFIDENCE", "0.25"))
+
+# Ridge regularization strength used when fitting the intent weights
+RIDGE_PENALTY = 0.5
+
+# Example messages per intent, learned alongside every keyword rule phrase
+TRAINING_EXAMPLES = {
+    'positive_wellbeing': (
+        "i'm doing pretty well today", "things are going great", "i feel really happy right now",
+        "today was a good day", "i'm in a good mood", "i feel a lot better than yesterday",
+        "i'm feeling positive about things", "life is good at the moment", "i'm content and calm",
+        "i had a wonderful day", "i feel amazing", "i'm excited about this week",
+    ),
+    'breathing_exercise': (
+        "can you guide me through some breathing", "help me breathe slowly", "i need to calm my breathing",
+        "show me box breathing", "how do i do deep breaths", "teach me a breathing technique",
+        "my breathing is too fast", "i can't catch my breath", "let's do a breathing exercise together",
+        "i need to calm down", "walk me through breathing in and out",
+    ),
+    'grounding_technique': (
+        "i feel disconnected from everything", "help me stay in the present", "i feel like i'm not really here",
+        "can you ground me", "5 4 3 2 1 technique", "i need to feel grounded",
+        "everything feels unreal", "bring me back to the present moment", "my mind keeps drifting away",
+        "i feel detached from my body",
+    ),
+    'ask_coping_strategy': (
+        "what can i do to feel better", "how do i cope with this", "give me some coping strategies",
+        "what helps with stress", "any tips for dealing with this", "how can i handle these feelings",
+        "what should i do when i feel like this", "i need ways to cope", "suggest something that might help",
+        "how do people deal with this", "what are healthy coping mechanisms",
+    ),
+    'positive_affirmation': (
+        "tell me something positive", "i need some encouragement", "say something nice to me",
+        "give me an affirmation", "i need motivation", "remind me that i'm worth it",
+        "can you cheer me up", "i need a confidence boost", "tell me i can do this",
+        "i need positive thoughts", "motivate me",
+    ),
+    'express_sadness': (
+        "i feel so sad", "i've been crying all day", "i feel empty inside", "i'm really down lately",
+        "nothing makes me happy anymore", "i feel hopeless", "i miss my mom so much", "i'm heartbroken",
+        "i feel depressed", "everything feels heavy", "i feel lonely", "my dog died and i'm devastated",
+        "i'm grieving", "i feel like crying",
+    ),
+    'express_anxiety': (
+        "i'm so anxious", "i'm worried about everything", "i'm having a panic attack", "i feel nervous",
+        "my heart is racing", "i can't stop overthinking", "i'm stressed about exams", "i'm overwhelmed with work",
+        "i'm scared something bad will happen", "i feel on edge", "i have so much anxiety",
+        "i keep worrying", "i'm freaking out",
+    ),
+    'express_anger': (
+        "i'm so angry", "i'm furious at my boss", "this makes me mad", "i'm frustrated with everything",
+        "i'm so annoyed", "i want to scream", "people keep irritating me", "i'm pissed off",
+        "i hate how they treated me", "i'm fed up", "i'm livid", "i feel so much rage",
+    ),
+    'check_in': (
+        "how are you", "how are you doing", "how's it going", "how have you been", "just checking in",
+        "how is your day", "are you doing okay", "what's up with you", "how do you feel today",
+    ),
+    'greeting': (
+        "hello", "hi", "hey", "hi there", "hey there", "good morning", "good afternoon",
+        "good evening", "hello amigo", "hey amigo", "hiya", "greetings",
+    ),
+    'goodbye': (
+        "bye", "goodbye", "see you later", "talk to you later", "i have to go now", "take care",
+        "thanks, bye", "good night", "catch you later", "i'm leaving now", "see you tomorrow",
+    ),
+}
+
+
+def build_training_set(rules=INTENT_RULES, examples=None):
+    """
+    Collect (intent, text) training pairs from the keyword rules and examples
+
+    Args:
+        rules (tuple): Keyword detection rules; every trigger phrase is a sample
+        examples (dict): Intent name mapped to example messages
+
+    Returns:
+        list: (intent, text) pairs
+    """
+    pairs = []
+    for intent, triggers, _ in rules:
+        pairs.extend((intent, phrase) for phrase in triggers)
+    for intent, texts in (TRAINING_EXAMPLES if examples is None else examples).items():
+        pairs.extend((intent, text) for text in texts)
+    return pairs
+
+
+class IntentClassifier:
+    """
+    Linear classifier over TF-IDF weighted hashed n-gram vectors
+
+    Weights are fit by one-vs-rest ridge regression, so each intent's score
+    approaches 1 for messages like its training samples and 0 otherwise. The
+    IDF weights and the (intents x dimensions) weight matrix are computed once
+    at construction and never change afterwards.
+    """
+
+    def __init__(self, training_pairs, min_confidence=MIN_CONFIDENCE, vectorizer=None, penalty=RIDGE_PENALTY):
+        self.min_confidence = min_confidence
+        self.vectorizer = vectorizer or HashedNgramVectorizer(dimensions=4096)
+
+        intents = sorted({intent for intent, _ in training_pairs})
+        self.intents = tuple(intents)
+        labels = np.array([intents.index(intent) for intent, _ in training_pairs], dtype=np.intp)
+
+        counts = self.vectorizer.count_matrix([stemmed_text(text) for _, text in training_pairs])
+        document_frequency = np.count_nonzero(counts, axis=0)
+        self._idf = (np.log((1 + len(training_pairs)) / (1 + document_frequency)) + 1).astype(np.float32)
+
+        samples = normalize_rows(np.log1p(counts) * self._idf)
+        targets = np.zeros((len(training_pairs), len(intents)), dtype=np.float32)
+        targets[np.arange(len(training_pairs)), labels] = 1.0
+
+        # Ridge solution in its dual form: a (samples x samples) solve instead
+        # of a (dimensions x dimensions) one, since samples << dimensions
+        gram = samples @ samples.T + penalty * np.eye(len(training_pairs), dtype=np.float32)
+        self._weights = np.ascontiguousarray((samples.T @ np.linalg.solve(gram, targets)).T)
+
+    def vectorize(self, messages):
+        """
+        Embed messages into the classifier's TF-IDF space
+
+        Args:
+            messages (list): Raw user messages
+
+        Returns:
+            numpy.ndarray: Unit-length rows, one per message
+        """
+        counts = self.vectorizer.count_matrix([stemmed_text(message) for message in messages])
+        return normalize_rows(np.log1p(counts) * self._idf)
+
+    def score_batch(self, messages):
+        """
+        Score every intent for many messages with one matrix multiply
+
+        Args:
+            messages (list): Raw user messages
+
+        Returns:
+            numpy.ndarray: Scores of shape (len(messages), len(intents))
+        """
+        return self.vectorize(messages) @ self._weights.T
+
+    def top_k_batch(self, messages, k=3):
+        """
+        Rank the best intents for many messages
+
+        Args:
+            messages (list): Raw user messages
+            k (int): Number of intents to return per message
+
+        Returns:
+            list: Per message, a list of (intent, confidence) best first
+        """
+        scores = self.score_batch(messages)
+        k = min(k, len(self.intents))
+        best = np.argsort(-scores, axis=1)[:, :k]
+        return [
+            [(self.intents[column], float(row_scores[column])) for column in row_best]
+            for row_scores, row_best in zip(scores, best)
+        ]
+
+    def top_k(self, message, k=3):
+        """
+        Rank the best intents for one message
+
+        Args:
+            message (str): Raw user message
+            k (int): Number of intents to return
+
+        Returns:
+            list: (intent, confidence) pairs, best first
+        """
+        return self.top_k_batch([message], k)[0]
+
+    def predict_batch(self, messages):
+        """
+        Classify many messages, routing low-confidence results to fallback
+
+        Args:
+            messages (list): Raw user messages
+
+        Returns:
+            list: Intent names in input order
+        """
+        if not messages:
+            return []
+        scores = self.score_batch(messages)
+        best = np.argmax(scores, axis=1)
+        confident = scores[np.arange(len(messages)), best] >= self.min_confidence
+        return [self.intents[column] if ok else 'fallback' for column, ok in zip(best, confident)]
+
+    def predict(self, message):
+        """
+        Classify one message
+
+        Args:
+            message (str): Raw user message
+
+        Returns:
+            str: Intent name, or 'fallback' below the confidence threshold
+        """
+        return self.predict_batch([message])[0]
+
+
+_default_classifier = None
+_default_lock = threading.Lock()
+
+
+def get_default_classifier():
+    """
+    Get the process-wide classifier, training it on first use
+
+    Returns:
+        IntentClassifier: Classifier trained on build_training_set()
+    """
+    global _default_classifier
+    if _default_classifier is None:
+        with _default_lock:
+            if _default_classifier is None:
+                _default_classifier = IntentClassifier(build_training_set())
+    return _default_classifier
@@ -0,0 +1,554 @@
+"""
+Keyword-based intent detection for the AMIGO live chat interface
+The keyword vocabulary is compiled once at import into a token trie, so each
+message is tokenized and scanned a single time regardless of vocabulary size.
+Misspelled keywords ("anxous", "depresed") are corrected first through a
+symmetric-delete index over the vocabulary (see fuzzy_index.py).
+Detection can instead be routed through the statistical classifier in
+intent_classifier.py by setting AMIGO_INTENT_ENGINE (see INTENT_ENGINES).
+"""
+
+import logging
+import os
+import re
+from functools import lru_cache
+
+from fuzzy_index import SymmetricDeleteIndex
+
+try:
+    from spellchecker import SpellChecker
+except ImportError:  # pyspellchecker is optional; typo correction is then turned off
+    SpellChecker = None
+
+# Tokens are runs of letters/digits, keeping inner apostrophes ("i'm", "how's")
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z0-9]+)*")
+
+# Trie key marking the end of a phrase (never collides with a string token)
+_PHRASE_END = None
+
+# Inflectional suffixes, longest first, with what replaces them ("worries" -> "worry")
+_INFLECTION_SUFFIXES = (
+    ('ingly', ''), ('edly', ''), ('ness', ''), ('ings', ''), ('ing', ''), ('ies', 'y'), ('ied', 'y'),
+    ('ily', 'y'), ('ed', ''), ('ly', ''), ('es', ''), ('s', ''),
+)
+
+# Shortest stem left after removing a suffix ("sadly" -> "sad", but not "being" -> "be")
+_MIN_STEM_LENGTH = 3
+
+# Detection rules in priority order: (intent, trigger phrases, blocking phrases).
+# The first rule with a trigger hit and no blocking hit wins. Phrases match on
+# whole words; single-word phrases also match their regular inflections
+# ("sadly", "worrying"), other forms are listed explicitly.
+INTENT_RULES = (
+    # Positive emotions and wellbeing (check early to celebrate good moments)
+    ('positive_wellbeing', (
+        'i am good', "i'm good", 'feeling good', 'doing well', "i'm great", 'i am great',
+        'feeling better', 'much better', 'doing better', "i'm fine", 'i am fine', 'feeling fine',
+        "i'm okay", 'i am okay', 'feeling happy', 'feeling positive'
+    ), ()),
+
+    # Breathing exercise patterns (most specific)
+    ('breathing_exercise', (
+        'breathing exercise', 'breathing exercises', 'breathing technique', 'breathing techniques',
+        'need a breathing', 'breathing help'
+    ), ()),
+
+    # Grounding technique patterns
+    ('grounding_technique', (
+        'grounding', 'ground me', 'present moment', 'grounding technique'
+    ), ()),
+
+    # Coping strategy patterns
+    ('ask_coping_strategy', (
+        'coping strategy', 'coping strategies', 'coping mechanism', 'coping mechanisms',
+        'help me cope', 'need coping help', 'what can i do', 'how do i'
+    ), ()),
+
+    # Positive affirmation patterns
+    ('positive_affirmation', (
+        'affirmation', 'affirmations', 'positive thoughts', 'encourage me', 'motivation',
+        'motivational', 'need encouragement'
+    ), ()),
+
+    # Sadness patterns
+    ('express_sadness', (
+        'sad', 'sadness', 'depressed', 'down', 'upset', 'upsetting', 'cry', 'crying',
+        'heartbroken', 'grief', 'grieve', 'feel sad'
+    ), ()),
+
+    # Anxiety patterns
+    ('express_anxiety', (
+        'anxious', 'anxiety', 'worried', 'nervous', 'panic', 'panicking', 'panicked', 'stress',
+        'stressed', 'stressful', 'overwhelmed', 'feel anxious'
+    ), ()),
+
+    # Anger patterns
+    ('express_anger', (
+        'angry', 'mad', 'furious', 'frustrated', 'annoyed', 'irritated', 'feel angry'
+    ), ()),
+
+    # Check-in patterns
+    ('check_in', (
+        'how are you', 'checking in', 'check in'
+    ), ()),
+
+    # Greeting patterns, unless the user is already asking for something
+    ('greeting', (
+        'hello', 'hi there', 'hey', 'good morning', 'good afternoon', 'good evening'
+    ), (
+        'need', 'needs', 'needed', 'help', 'helps', 'helping', 'helpful', 'feel', 'feels',
+        'feeling', 'want', 'wants', 'wanted'
+    )),
+
+    # Goodbye patterns
+    ('goodbye', (
+        'bye', 'goodbye', 'see you', 'talk later', 'take care'
+    ), ()),
+
+    # Breathing related (less specific patterns)
+    ('breathing_exercise', (
+        'breathe', 'calm down'
+    ), ()),
+)
+
+# Detection engines: the keyword rules, the statistical classifier, or the
+# keyword rules with the classifier consulted for messages they do not match
+INTENT_ENGINES = ('keyword', 'classifier', 'hybrid')
+INTENT_ENGINE = os.environ.get("AMIGO_INTENT_ENGINE", "keyword").lower()
+if INTENT_ENGINE not in INTENT_ENGINES:
+    # Checked here rather than on first detection, where it would fail every request
+    logging.warning(f"Unknown intent engine '{INTENT_ENGINE}', using the keyword engine")
+    INTENT_ENGINE = 'keyword'
+
+# Typo correction of keywords before matching: on (default) or off
+FUZZY_MATCHING = os.environ.get("AMIGO_FUZZY_MATCHING", "on").lower() not in ('off', '0', 'false')
+
+# Words in multi-word phrases at least this long are typo-corrected too; shorter
+# ones ("doing", "there", "later") are too close to everyday words
+FUZZY_PHRASE_WORD_LENGTH = 7
+
+# Shortest tokens allowed one, two and three edits: a typo in a long word
+# ("overwhlemed") leaves it far more recognizable than one in a short word
+FUZZY_EDIT_LENGTHS = (5, 8, 14)
+
+# Single-word messages that are a greeting on their own ("hi" is too short to
+# be a trigger phrase inside longer messages)
+GREETING_ONLY_WORDS = frozenset(['hi', 'hello', 'hey'])
+
+
+def tokenize(text):
+    """
+    Split lowercased text into word tokens
+
+    Args:
+        text (str): Lowercased text
+
+    Returns:
+        list: Word tokens in order of appearance
+    """
+    return _TOKEN_PATTERN.findall(text)
+
+
+def normalize_message(message):
+    """
+    Lowercase a message and fold typographic apostrophes to ASCII
+
+    Args:
+        message (str): Raw user message
+
+    Returns:
+        str: Normalized message text
+    """
+    return message.lower().replace('\u2019', "'")
+
+
+def inflection_stem(word):
+    """
+    Reduce a word to the stem its regular inflections share
+
+    "worried", "worries" and "worrying" become "worry", "sadly" and "sadness"
+    "sad", "upsetting" "upset". A final "e" is dropped, so "grieve" and
+    "grieving" meet at "griev". This is a light suffix stripper, not a full
+    stemmer: irregular forms are not related.
+
+    Args:
+        word (str): Lowercase word token
+
+    Returns:
+        tuple: (stem, whether an inflectional suffix was removed)
+    """
+    stem, inflected = word, False
+    for suffix, replacement in _INFLECTION_SUFFIXES:
+        if not word.endswith(suffix) or len(word) - len(suffix) + len(replacement) < _MIN_STEM_LENGTH:
+            continue
+        if suffix == 's' and word.endswith(('ss', 'us', 'is')):
+            break
+        stem, inflected = word[:-len(suffix)] + replacement, True
+        # Undo a doubled final consonant ("upsetting" -> "upsett" -> "upset")
+        if len(stem) > _MIN_STEM_LENGTH and stem[-1] == stem[-2] and stem[-1] not in 'aeioulsz':
+            stem = stem[:-1]
+        break
+    if len(stem) > _MIN_STEM_LENGTH and stem.endswith('e'):
+        stem = stem[:-1]
+    return stem, inflected
+
+
+class KeywordMatcher:
+    """
+    Token trie over a phrase vocabulary
+
+    Every phrase carries an integer bitmask; scanning a token list returns the
+    OR of the masks of every phrase found, including overlapping phrases.
+    Inflected forms of single-word phrases ("worrying" for "worried") are
+    matched too: a token outside the vocabulary is reduced to its stem, and
+    counts as the phrase sharing that stem. Only tokens that lost a suffix
+    are reduced, so "by" never becomes "bye". Reductions are memoized.
+    """
+
+    def __init__(self, cache_size=65536):
+        self._root = {}
+        self._words = set()
+        self._stems = {}  # stem -> first single-word phrase with that stem
+        self.phrase_count = 0
+        self.inflection = lru_cache(maxsize=cache_size)(self._inflection)
+
+    def add(self, phrase, mask):
+        """
+        Register a phrase with the bits it sets when found
+
+        Args:
+            phrase (str): Lowercase keyword or multi-word phrase
+            mask (int): Bits to set when the phrase occurs
+        """
+        tokens = tokenize(phrase)
+        node = self._root
+        for token in tokens:
+            node = node.setdefault(token, {})
+        if _PHRASE_END not in node:
+            self.phrase_count += 1
+        node[_PHRASE_END] = node.get(_PHRASE_END, 0) | mask
+        self._words.update(tokens)
+        if len(tokens) == 1:
+            self._stems.setdefault(inflection_stem(tokens[0])[0], tokens[0])
+
+    def _inflection(self, token):
+        """
+        Find the single-word phrase a token is an inflection of
+
+        Args:
+            token (str): Word token not in the vocabulary
+
+        Returns:
+            str: The phrase, or None when the token is not an inflection of one
+        """
+        stem, inflected = inflection_stem(token)
+        return self._stems.get(stem) if inflected else None
+
+    def match_inflections(self, tokens):
+        """
+        Replace inflected forms of single-word phrases with the phrases
+
+        Args:
+            tokens (list): Tokens produced by tokenize()
+
+        Returns:
+            list: The tokens, with inflections replaced (the same list when
+                nothing changed)
+        """
+        words = self._words
+        replaced = None
+        for position, token in enumerate(tokens):
+            if token in words:
+                continue
+            phrase = self.inflection(token)
+            if phrase is not None:
+                if replaced is None:
+                    replaced = list(tokens)
+                replaced[position] = phrase
+        return replaced if replaced is not None else tokens
+
+    def scan(self, tokens):
+        """
+        Find every registered phrase in a token list
+
+        Args:
+            tokens (list): Tokens produced by tokenize()
+
+        Returns:
+            int: OR of the masks of all phrases found
+        """
+        tokens = self.match_inflections(tokens)
+        root = self._root
+        token_count = len(tokens)
+        hits = 0
+        for start in range(token_count):
+            node = root.get(tokens[start])
+            position = start + 1
+            while node is not None:
+                hits |= node.get(_PHRASE_END, 0)
+                if position == token_count:
+                    break
+                node = node.get(tokens[position])
+                position += 1
+        return hits
+
+
+def build_rule_matcher(rules):
+    """
+    Compile ordered detection rules into a matcher and per-rule bitmasks
+
+    Rule i owns trigger bit i and blocking bit (i + len(rules)).
+
+    Args:
+        rules (tuple): (intent, trigger phrases, blocking phrases) entries
+
+    Returns:
+        tuple: (KeywordMatcher, tuple of (intent, trigger_bit, block_bit))
+    """
+    matcher = KeywordMatcher()
+    rule_bits = []
+    for index, (intent, triggers, blockers) in enumerate(rules):
+        trigger_bit = 1 << index
+        block_bit = 1 << (index + len(rules))
+        for phrase in triggers:
+            matcher.add(phrase, trigger_bit)
+        for phrase in blockers:
+            matcher.add(phrase, block_bit)
+        rule_bits.append((intent, trigger_bit, block_bit if blockers else 0))
+    return matcher, tuple(rule_bits)
+
+
+def fuzzy_vocabulary(rules):
+    """
+    List the keywords typos are corrected to, in rule priority order
+
+    Single-word triggers are included whatever their length; words of
+    multi-word phrases only from FUZZY_PHRASE_WORD_LENGTH letters. Blocking
+    phrases are left out, so a typo never suppresses an intent.
+
+    Args:
+        rules (tuple): (intent, trigger phrases, blocking phrases) entries
+
+    Returns:
+        list: Vocabulary words
+    """
+    words = []
+    for _, triggers, _ in rules:
+        for phrase in triggers:
+            tokens = tokenize(phrase)
+            words.extend(
+                token for token in tokens
+                if len(tokens) == 1 or len(token) >= FUZZY_PHRASE_WORD_LENGTH
+            )
+    return words
+
+
+def load_dictionary_words(vocabulary, max_edits=len(FUZZY_EDIT_LENGTHS)):
+    """
+    Load the English words a typo correction could reach, which are never typos
+
+    "imitated" is two edits from "irritated" and "encouraged" one from
+    "encourage", but both are real words and must be left alone. The words
+    come from pyspellchecker's English word-frequency list (words seen at
+    least 50 times in its corpus); only those sharing a first letter with a
+    vocabulary word and within max_edits letters of its length are kept.
+
+    Args:
+        vocabulary (list): Vocabulary words
+        max_edits (int): Most edits any correction allows
+
+    Returns:
+        frozenset: Dictionary words that are not vocabulary words, or None
+            when pyspellchecker is not installed
+    """
+    if SpellChecker is None:
+        return None
+    reachable = {
+        (word[0], length) for word in vocabulary
+        for length in range(len(word) - max_edits, len(word) + max_edits + 1)
+    }
+    words = SpellChecker(language='en', distance=1).word_frequency.keys()
+    return frozenset(word for word in words if (word[:1], len(word)) in reachable) - frozenset(vocabulary)
+
+
+def build_fuzzy_index(rules, cache_size=65536):
+    """
+    Build the typo-correction index for a set of keyword rules
+
+    Args:
+        rules (tuple): (intent, trigger phrases, blocking phrases) entries
+        cache_size (int): Memoized corrections (0 disables memoization)
+
+    Returns:
+        SymmetricDeleteIndex: Index over fuzzy_vocabulary(rules)
+    """
+    vocabulary = fuzzy_vocabulary(rules)
+    return SymmetricDeleteIndex(
+        vocabulary,
+        edit_lengths=FUZZY_EDIT_LENGTHS,
+        protected=load_dictionary_words(vocabulary) or (),
+        cache_size=cache_size
+    )
+
+
+if FUZZY_MATCHING and SpellChecker is None:
+    # Without a dictionary, real words near a keyword would be "corrected" to it
+    logging.warning("pyspellchecker is not installed; typo correction is off")
+    FUZZY_MATCHING = False
+
+_MATCHER, _RULE_BITS = build_rule_matcher(INTENT_RULES)
+_FUZZY_INDEX = build_fuzzy_index(INTENT_RULES) if FUZZY_MATCHING else None
+
+
+def detect_intent_from_tokens(tokens):
+    """
+    Resolve the highest-priority intent for an already tokenized message
+
+    Args:
+        tokens (list): Tokens produced by tokenize()
+
+    Returns:
+        str: Detected intent name, or 'fallback'
+    """
+    if len(tokens) == 1 and tokens[0] in GREETING_ONLY_WORDS:
+        return 'greeting'
+
+    hits = _MATCHER.scan(tokens)
+    if hits:
+        for intent, trigger_bit, block_bit in _RULE_BITS:
+            if hits & trigger_bit and not hits & block_bit:
+                return intent
+
+    # Default fallback for unrecognized patterns
+    return 'fallback'
+
+
+def detect_intent_exact(message):
+    """
+    Detect an intent with the ordered keyword rules, without typo correction
+
+    Args:
+        message (str): Raw user message
+
+    Returns:
+        str: Detected intent name, or 'fallback'
+    """
+    return detect_intent_from_tokens(tokenize(normalize_message(message)))
+
+
+def detect_intent_keyword(message):
+    """
+    Detect an intent with the ordered keyword rules
+
+    Misspelled keywords are corrected first when AMIGO_FUZZY_MATCHING is on.
+
+    Args:
+        message (str): Raw user message
+
+    Returns:
+        str: Detected intent name, or 'fallback'
+    """
+    tokens = tokenize(normalize_message(message))
+    if _FUZZY_INDEX is not None:
+        tokens = _FUZZY_INDEX.correct_tokens(tokens)
+    return detect_intent_from_tokens(tokens)
+
+
+def detect_intents_keyword(messages):
+    """
+    Detect intents for many messages with the ordered keyword rules
+
+    Args:
+        messages (list): Raw user messages
+
+    Returns:
+        list: Intent names in input order
+    """
+    return [detect_intent_keyword(message) for message in messages]
+
+
+def load_intent_engine(name):
+    """
+    Build the detection functions for a named engine
+
+    The classifier (and numpy) is only imported for the engines that use it.
+
+    Args:
+        name (str): One of INTENT_ENGINES
+
+    Returns:
+        tuple: (detect one message, detect a list of messages) functions
+    """
+    if name == 'keyword':
+        return detect_intent_keyword, detect_intents_keyword
+    if name not in INTENT_ENGINES:
+        raise ValueError(f"Unknown intent engine '{name}', expected one of {', '.join(INTENT_ENGINES)}")
+
+    from intent_classifier import get_default_classifier
+    classifier = get_default_classifier()
+    if name == 'classifier':
+        return classifier.predict, classifier.predict_batch
+
+    def detect_hybrid(message):
+        intent = detect_intent_keyword(message)
+        return classifier.predict(message) if intent == 'fallback' else intent
+
+    def detect_batch_hybrid(messages):
+        intents = detect_intents_keyword(messages)
+        missed = [index for index, intent in enumerate(intents) if intent == 'fallback']
+        if missed:
+            for index, intent in zip(missed, classifier.predict_batch([messages[index] for index in missed])):
+                intents[index] = intent
+        return intents
+
+    return detect_hybrid, detect_batch_hybrid
+
+
+_active_engine = None
+
+
+def set_intent_engine(name):
+    """
+    Switch the engine used by detect_intent_from_message
+
+    Args:
+        name (str): One of INTENT_ENGINES
+
+    Returns:
+        tuple: The engine's (detect one, detect many) functions
+    """
+    global _active_engine
+    _active_engine = load_intent_engine(name)
+    return _active_engine
+
+
+def detect_intent_from_message(message):
+    """
+    Simple intent detection based on keywords and patterns
+
+    Routed through the configured engine (AMIGO_INTENT_ENGINE, 'keyword' by default).
+
+    Args:
+        message (str): Raw user message
+
+    Returns:
+        str: Detected intent name, or 'fallback'
+    """
+    detect, _ = _active_engine or set_intent_engine(INTENT_ENGINE)
+    return detect(message)
+
+
+def detect_intents_from_messages(messages):
+    """
+    Detect intents for many messages through the configured engine
+
+    The classifier engines score the whole list with one matrix multiply.
+
+    Args:
+        messages (list): Raw user messages
+
+    Returns:
+        list: Intent names in input order
+    """
+    _, detect_batch = _active_engine or set_intent_engine(INTENT_ENGINE)
+    return detect_batch(messages)
@@ -1,53 +1,207 @@
+import asyncio
+import contextvars
+import inspect
 import logging
 import random
-from responses import get_response_variants, get_coping_strategies, get_validation_responses
+import threading
+import time
+from types import MappingProxyType
+from responses import CATALOG, choose_response_variant
+import generative
+from metrics import HANDLER_LATENCY, INTENT_REQUESTS
 
-def handle_intent(intent_name, parameters, query_text, session_id, input_contexts):
+# Phrases that mean the user is asking how AMIGO itself is doing
+SELF_CHECK_IN_PHRASES = ('how are you', 'how you doing', 'how you been', 'how\'s it going')
+
+# Handlers registered by intent name, filled in by @register_intent
+_HANDLER_REGISTRY = {}
+
+# Read-only dispatch table, rebuilt from the registry by freeze_dispatch_table()
+_DISPATCH_TABLE = MappingProxyType({})
+_dispatch_frozen = False
+
+# Whether handle_fallback may call the generative backend for the intent being handled;
+# set by handle_intent, so bulk callers can keep to the canned replies
+_GENERATIVE_FALLBACK = contextvars.ContextVar('generative_fallback', default=True)
+
+# Whether the caller streams the reply, so handle_fallback may return a
+# generated reply as it is produced (under 'text_stream'); set by handle_intent
+_STREAM_REPLY = contextvars.ContextVar('stream_reply', default=False)
+
+# Per-handler [call count, cumulative seconds]
+_HANDLER_STATS = {}
+_stats_lock = threading.Lock()
+
+def register_intent(*intent_names):
+    """
+    Decorator registering a handler function under one or more intent names
+    
+    Handlers may be plain functions or coroutine functions (async def) with
+    the same signature; see handle_intent_async. Handlers registered after
+    the dispatch table has been frozen (for example from a separate plugin
+    module) trigger a rebuild of the frozen table.
+    
+    Args:
+        *intent_names (str): Intent display names and aliases to route to the handler
+    
+    Returns:
+        function: Decorator that registers and returns the handler unchanged
+    """
+    def decorator(handler):
+        for intent_name in intent_names:
+            _HANDLER_REGISTRY[intent_name] = handler
+        _HANDLER_STATS.setdefault(handler.__name__, [0, 0.0])
+        if _dispatch_frozen:
+            freeze_dispatch_table()
+        return handler
+    return decorator
+
+def freeze_dispatch_table():
+    """
+    Snapshot the handler registry into the read-only dispatch table
+    
+    Returns:
+        mapping: Read-only mapping of intent name to handler function
+    """
+    global _DISPATCH_TABLE, _dispatch_frozen
+    _DISPATCH_TABLE = MappingProxyType(dict(_HANDLER_REGISTRY))
+    _dispatch_frozen = True
+    return _DISPATCH_TABLE
+
+def get_dispatch_table():
+    """
+    Get the current read-only dispatch table
+    
+    Returns:
+        mapping: Read-only mapping of intent name to handler function
+    """
+    return _DISPATCH_TABLE
+
+def get_handler_stats():
+    """
+    Get per-handler call counts and latency since startup or the last reset
+    
+    Returns:
+        dict: Handler name mapped to calls, total_ms and mean_ms
+    """
+    with _stats_lock:
+        snapshot = {name: tuple(values) for name, values in _HANDLER_STATS.items()}
+    
+    return {
+        name: {
+            'calls': calls,
+            'total_ms': total * 1000,
+            'mean_ms': (total * 1000 / calls) if calls else 0.0
+        }
+        for name, (calls, total) in snapshot.items()
+    }
+
+def reset_handler_stats():
+    """Reset all per-handler call counts and latency totals to zero"""
+    with _stats_lock:
+        for values in _HANDLER_STATS.values():
+            values[0] = 0
+            values[1] = 0.0
+
+def _record_handler_call(handler, elapsed):
+    """Add one call and its latency to a handler's statistics"""
+    with _stats_lock:
+        stats = _HANDLER_STATS.get(handler.__name__)
+        if stats is None:
+            stats = _HANDLER_STATS[handler.__name__] = [0, 0.0]
+        stats[0] += 1
+        stats[1] += elapsed
+    HANDLER_LATENCY.observe((handler.__name__,), elapsed)
+
+def _count_intent(intent_name):
+    """Count a routed intent; unregistered names share one label to bound cardinality"""
+    INTENT_REQUESTS.inc((intent_name if intent_name in _DISPATCH_TABLE else 'unregistered',))
+
+def handle_intent(intent_name, parameters, query_text, session_id, input_contexts, generative_fallback=True,
+                  stream=False):
     """
     Main intent router that dispatches to appropriate handler functions
     
+    Coroutine handlers are run to completion on a private event loop, so
+    sync servers can still serve intents whose handlers are async.
+    
     Args:
         intent_name (str): The display name of the triggered intent
         parameters (dict): Extracted parameters from user input
         query_text (str): Original user query
         session_id (str): Unique session identifier
         input_contexts (list): Current conversation contexts
+        generative_fallback (bool): Allow the fallback handler to call the
+            generative backend; batch and replay callers pass False so they
+            get the canned reply instead of one paid, rate-limited call each
+        stream (bool): The caller streams the reply (/chat/stream), so a
+            generated reply may be returned as 'text_stream' instead of 'text'
     
     Returns:
         dict: Response data including text and optional contexts
     """
     
-    logging.info(f"Handling intent: {intent_name}")
-    
-    # Intent mapping to handler functions
-    intent_handlers = {
-        'Default Welcome Intent': handle_greeting,
-        'greeting': handle_greeting,
-        'positive_wellbeing': handle_positive_wellbeing,
-        'express_sadness': handle_express_sadness,
-        'express_anxiety': handle_express_anxiety,
-        'express_anger': handle_express_anger,
-        'ask_coping_strategy': handle_ask_coping_strategy,
-        'breathing_exercise': handle_breathing_exercise,
-        'grounding_technique': handle_grounding_technique,
-        'positive_affirmation': handle_positive_affirmation,
-        'check_in': handle_check_in,
-        'goodbye': handle_goodbye,
-        'Default Fallback Intent': handle_fallback,
-        'fallback': handle_fallback
-    }
+    logging.debug("Handling intent: %s", intent_name)
+    _count_intent(intent_name)
     
     # Get handler function or use fallback
-    handler = intent_handlers.get(intent_name, handle_fallback)
+    handler = _DISPATCH_TABLE.get(intent_name, handle_fallback)
+    
+    # Call the appropriate handler, recording its latency
+    started = time.perf_counter()
+    token = _GENERATIVE_FALLBACK.set(generative_fallback)
+    stream_token = _STREAM_REPLY.set(stream)
+    try:
+        response_data = handler(parameters, query_text, session_id, input_contexts)
+        if inspect.isawaitable(response_data):
+            response_data = asyncio.run(response_data)
+        return response_data
+    finally:
+        _STREAM_REPLY.reset(stream_token)
+        _GENERATIVE_FALLBACK.reset(token)
+        _record_handler_call(handler, time.perf_counter() - started)
+
+async def handle_intent_async(intent_name, parameters, query_text, session_id, input_contexts, stream=False):
+    """
+    Async intent router used by the ASGI serving mode
     
-    # Call the appropriate handler
-    return handler(parameters, query_text, session_id, input_contexts)
+    Handlers may be plain functions or coroutine functions; coroutine
+    handlers are awaited on the running event loop, so slow backends do not
+    block other conversations.
+    
+    Args:
+        intent_name (str): The display name of the triggered intent
+        parameters (dict): Extracted parameters from user input
+        query_text (str): Original user query
+        session_id (str): Unique session identifier
+        input_contexts (list): Current conversation contexts
+        stream (bool): The caller streams the reply (see handle_intent)
+    
+    Returns:
+        dict: Response data including text and optional contexts
+    """
+    
+    logging.debug("Handling intent: %s", intent_name)
+    _count_intent(intent_name)
+    
+    handler = _DISPATCH_TABLE.get(intent_name, handle_fallback)
+    
+    started = time.perf_counter()
+    stream_token = _STREAM_REPLY.set(stream)
+    try:
+        response_data = handler(parameters, query_text, session_id, input_contexts)
+        if inspect.isawaitable(response_data):
+            response_data = await response_data
+        return response_data
+    finally:
+        _STREAM_REPLY.reset(stream_token)
+        _record_handler_call(handler, time.perf_counter() - started)
 
+@register_intent('Default Welcome Intent', 'greeting')
 def handle_greeting(parameters, query_text, session_id, input_contexts):
     """Handle greeting intents with warm, welcoming responses"""
     
-    responses = get_response_variants('greeting')
-    response_text = random.choice(responses)
+    response_text = choose_response_variant('greeting')
     
     # Set context for ongoing conversation
     output_contexts = [{
@@ -63,29 +217,15 @@ def handle_greeting(parameters, query_text, session_id, input_contexts):
         'output_contexts': output_contexts
     }
 
+@register_intent('positive_wellbeing')
 def handle_positive_wellbeing(parameters, query_text, session_id, input_contexts):
     """Handle positive emotional expressions with celebratory and supportive responses"""
     
-    positive_responses = [
-        "That's wonderful to hear! I'm so glad you're feeling good today. It's important to celebrate these positive moments. Is there anything that's particularly contributing to your good mood?",
-        "I'm really happy to hear you're doing well! These positive feelings are precious. What's been going well for you lately?",
-        "That's fantastic! It's great that you're feeling good. Sometimes sharing our positive moments can make them even brighter. What's bringing you joy today?",
-        "I love hearing that you're feeling good! It's wonderful when we can recognize and appreciate these positive emotions. Is there anything specific that's making today good for you?",
-        "That's so great to hear! Your positive energy comes through even in text. It's beautiful when we can acknowledge our good moments. What would you like to talk about while you're feeling this way?"
-    ]
-    
-    follow_up_questions = [
-        "Would you like to share what's been going well?",
-        "Is there anything you'd like to celebrate or talk about?",
-        "I'm here if you want to share more about your good day!",
-        "What's been the highlight of your day so far?"
-    ]
-    
-    response = random.choice(positive_responses)
+    response = choose_response_variant('positive_wellbeing')
     
     # Sometimes add a follow-up question
-    if random.choice([True, False]):
-        follow_up = random.choice(follow_up_questions)
+    if random.random() < 0.5:
+        follow_up = choose_response_variant('positive_wellbeing_followup')
         response += f" {follow_up}"
     
     return {
@@ -93,19 +233,11 @@ def handle_positive_wellbeing(parameters, query_text, session_id, input_contexts
         'output_contexts': []
     }
 
+@register_intent('express_sadness')
 def handle_express_sadness(parameters, query_text, session_id, input_contexts):
     """Handle expressions of sadness with empathetic validation"""
     
-    # More human, conversational sadness responses
-    human_sadness_responses = [
-        "Oh, I'm really sorry you're feeling sad right now. That sounds really tough. You know, it takes a lot of courage to share that with me. What's been weighing on your heart?",
-        "I can hear the sadness in your words, and I just want you to know that what you're feeling is so valid. Sometimes life just hits us hard, doesn't it? Want to tell me what's been going on?",
-        "Aw, I'm sorry you're going through this. Sadness can feel so heavy sometimes. I'm really glad you reached out though - that shows strength. What's been making things difficult lately?",
-        "I feel for you, I really do. It sounds like you're carrying something heavy right now. You don't have to carry it alone though. What's been on your mind?",
-        "That sounds really hard. I can sense you're hurting, and I want you to know I'm here with you in this moment. Sometimes it just helps to have someone listen, you know? What's been making you feel this way?"
-    ]
-    
-    response_text = random.choice(human_sadness_responses)
+    response_text = choose_response_variant('express_sadness')
     
     # Set emotional context
     output_contexts = [{
@@ -122,19 +254,11 @@ def handle_express_sadness(parameters, query_text, session_id, input_contexts):
         'output_contexts': output_contexts
     }
 
+@register_intent('express_anxiety')
 def handle_express_anxiety(parameters, query_text, session_id, input_contexts):
     """Handle expressions of anxiety with calming validation"""
     
-    # More natural, human anxiety responses
-    human_anxiety_responses = [
-        "Oh no, anxiety can be so overwhelming. I totally get that - it's like your mind just won't stop racing, right? You're not alone in this feeling. What's been making you feel anxious today?",
-        "Ugh, anxiety is the worst. It can make everything feel so much bigger and scarier than it actually is. I'm really glad you're talking about it though. What's been on your mind that's got you feeling worried?",
-        "I hear you on the anxiety - it can be such a tough feeling to sit with. Sometimes it feels like it just takes over everything, doesn't it? I'm here to help you work through this. What's been triggering these feelings?",
-        "Anxiety can be so exhausting, both mentally and physically. I really feel for you right now. You know what though? Reaching out like this is actually a really healthy way to handle it. What's been causing these anxious feelings?",
-        "Oh, I'm sorry you're dealing with anxiety. It can make even simple things feel impossible sometimes. But hey, you're here talking about it, which is honestly really brave. What's been making you feel this way?"
-    ]
-    
-    response_text = random.choice(human_anxiety_responses)
+    response_text = choose_response_variant('express_anxiety')
     
     output_contexts = [{
         "name": f"projects/your-project/agent/sessions/{session_id}/contexts/emotional-state",
@@ -150,20 +274,13 @@ def handle_express_anxiety(parameters, query_text, session_id, input_contexts):
         'output_contexts': output_contexts
     }
 
+@register_intent('express_anger')
 def handle_express_anger(parameters, query_text, session_id, input_contexts):
     """Handle expressions of anger with understanding validation"""
     
-    validation_responses = get_validation_responses('anger')
-    validation = random.choice(validation_responses)
-    
-    followup_questions = [
-        "What happened that made you feel this way?",
-        "It sounds like something really frustrated you. Would you like to share what happened?",
-        "Anger often comes from feeling hurt or misunderstood. What's behind these feelings?",
-        "I can hear that you're upset. What would help you feel better right now?"
-    ]
+    validation = CATALOG.pick('validation', 'anger')
     
-    followup = random.choice(followup_questions)
+    followup = choose_response_variant('express_anger_followup')
     response_text = f"{validation} {followup}"
     
     output_contexts = [{
@@ -180,20 +297,13 @@ def handle_express_anger(parameters, query_text, session_id, input_contexts):
         'output_contexts': output_contexts
     }
 
+@register_intent('ask_coping_strategy')
 def handle_ask_coping_strategy(parameters, query_text, session_id, input_contexts):
     """Provide coping strategies based on context and user needs"""
     
-    strategies = get_coping_strategies()
-    strategy = random.choice(strategies)
-    
-    intro_phrases = [
-        "Here's something that might help:",
-        "Let's try this together:",
-        "This technique has helped many people:",
-        "I'd like to suggest something that might be helpful:"
-    ]
+    strategy = CATALOG.pick('general', 'coping_strategies')
     
-    intro = random.choice(intro_phrases)
+    intro = choose_response_variant('coping_intro')
     response_text = f"{intro} {strategy}"
     
     output_contexts = [{
@@ -210,17 +320,11 @@ def handle_ask_coping_strategy(parameters, query_text, session_id, input_context
         'output_contexts': output_contexts
     }
 
+@register_intent('breathing_exercise')
 def handle_breathing_exercise(parameters, query_text, session_id, input_contexts):
     """Guide user through breathing exercises"""
     
-    # More conversational breathing exercises
-    conversational_breathing = [
-        "Absolutely! Breathing exercises are amazing - they're like a reset button for your nervous system. Let's do the 4-7-8 technique together. It might feel a bit weird at first, but trust me on this one. Ready? Breathe in through your nose for 4... hold it for 7... and out through your mouth for 8. You're doing great! Want to try that a couple more times?",
-        "Great idea! I love box breathing - it's so simple but really effective. Think of it like drawing a square with your breath. Breathe in for 4 counts, hold for 4, out for 4, hold for 4. Let's do it together: In... 2... 3... 4... Hold... 2... 3... 4... Out... 2... 3... 4... Hold... 2... 3... 4. How does that feel?",
-        "Perfect choice! Here's one of my favorites - belly breathing. It's super simple but really powerful. Put one hand on your chest, one on your belly. When you breathe in through your nose, try to make only your belly hand move, not the chest one. Then breathe out slowly through your mouth. It tells your body 'hey, everything's okay' and activates that natural relaxation response. Give it a try!"
-    ]
-    
-    response_text = random.choice(conversational_breathing)
+    response_text = choose_response_variant('breathing_exercise')
     
     output_contexts = [{
         "name": f"projects/your-project/agent/sessions/{session_id}/contexts/coping-strategy",
@@ -236,16 +340,11 @@ def handle_breathing_exercise(parameters, query_text, session_id, input_contexts
         'output_contexts': output_contexts
     }
 
+@register_intent('grounding_technique')
 def handle_grounding_technique(parameters, query_text, session_id, input_contexts):
     """Provide grounding techniques for anxiety and overwhelm"""
     
-    grounding_techniques = [
-        "Let's try the 5-4-3-2-1 grounding technique. Look around and name: 5 things you can see, 4 things you can touch, 3 things you can hear, 2 things you can smell, and 1 thing you can taste. This helps bring you back to the present moment.",
-        "Here's a grounding exercise: Put your feet flat on the floor and really feel them touching the ground. Take three deep breaths. Now notice the temperature of the air on your skin. You're safe here in this moment.",
-        "Try this grounding technique: Hold an object near you - your phone, a cup, anything. Focus on how it feels - its weight, texture, temperature. Describe it to yourself in detail. This helps anchor you to the present."
-    ]
-    
-    response_text = random.choice(grounding_techniques)
+    response_text = choose_response_variant('grounding_technique')
     
     output_contexts = [{
         "name": f"projects/your-project/agent/sessions/{session_id}/contexts/coping-strategy",
@@ -261,83 +360,59 @@ def handle_grounding_technique(parameters, query_text, session_id, input_context
         'output_contexts': output_contexts
     }
 
+@register_intent('positive_affirmation')
 def handle_positive_affirmation(parameters, query_text, session_id, input_contexts):
     """Provide positive affirmations and self-compassion exercises"""
     
-    affirmations = [
-        "Remember: You are worthy of love and kindness, especially from yourself. Your feelings are valid, and it's okay to have difficult moments. You're doing the best you can with what you have right now.",
-        "Here's a gentle reminder: You have survived 100% of your difficult days so far. You are stronger than you know, and this feeling will pass. Be patient and gentle with yourself.",
-        "Let's practice some self-compassion: Place your hand on your heart and say to yourself, 'May I be kind to myself. May I give myself the compassion I need. May I be strong and patient.' You deserve the same kindness you'd give a good friend."
-    ]
-    
-    response_text = random.choice(affirmations)
+    response_text = choose_response_variant('positive_affirmation')
     
     return {
         'text': response_text,
         'output_contexts': []
     }
 
+@register_intent('check_in')
 def handle_check_in(parameters, query_text, session_id, input_contexts):
     """Handle check-ins in a more human, conversational way"""
     
     # Detect if user is asking about AMIGO's wellbeing
-    if any(phrase in query_text.lower() for phrase in ['how are you', 'how you doing', 'how you been', 'how\'s it going']):
+    query_lower = query_text.lower()
+    if any(phrase in query_lower for phrase in SELF_CHECK_IN_PHRASES):
         # Respond like a human would, then redirect caringly to user
-        human_responses = [
-            "I'm doing well, thank you for asking! I feel fulfilled when I can be here for people like you. Speaking of which, how are you doing today? Is there anything on your mind?",
-            "I'm good! I genuinely enjoy our conversations and being able to support people. It means a lot to me. How about you - how are you feeling today?",
-            "I'm doing great, thanks! I feel energized when I can help and listen. I appreciate you asking! Now, how are you doing? What's been on your heart lately?",
-            "I'm well! I find purpose in these conversations and being present for people. Thanks for checking in on me! How are you feeling today? Is there anything you'd like to talk about?",
-            "I'm doing really good! There's something special about connecting with people and being able to offer support. I appreciate you asking! How about you - what's going on in your world today?"
-        ]
-        
-        response_text = random.choice(human_responses)
+        response_text = choose_response_variant('check_in_reply')
     else:
         # User isn't asking about AMIGO specifically, so check in on them
-        checkin_responses = [
-            "How are you feeling right now? I'm here to listen and support you through whatever you're experiencing.",
-            "What's been on your mind lately? Remember, there's no pressure to share more than you're comfortable with.",
-            "How has your day been treating you? I'm here if you need someone to talk to or just want to share how you're doing.",
-            "I'm curious about how you're doing. What would be most helpful for you right now - talking through something, learning a coping technique, or just having someone listen?"
-        ]
-        
-        response_text = random.choice(checkin_responses)
+        response_text = choose_response_variant('check_in')
     
     return {
         'text': response_text,
         'output_contexts': []
     }
 
+@register_intent('goodbye')
 def handle_goodbye(parameters, query_text, session_id, input_contexts):
     """Handle farewell with supportive closing"""
     
-    goodbye_responses = [
-        "Take care of yourself, and remember that I'm here whenever you need support. You're stronger than you know. Until we talk again! 💙",
-        "It was good talking with you today. Remember to be gentle with yourself, and don't hesitate to reach out whenever you need someone to listen. Take care! 💙",
-        "Thank you for sharing with me today. You're doing great work by taking care of your mental health. I'm here whenever you need me. Be well! 💙",
-        "Goodbye for now. Remember: you matter, your feelings are valid, and you deserve kindness - especially from yourself. I'll be here when you're ready to talk again. 💙"
-    ]
-    
-    response_text = random.choice(goodbye_responses)
+    response_text = choose_response_variant('goodbye')
     
     return {
         'text': response_text,
         'output_contexts': []
     }
 
+@register_intent('Default Fallback Intent', 'fallback')
 def handle_fallback(parameters, query_text, session_id, input_contexts):
-    """Handle unrecognized intents with graceful responses"""
-    
-    # More human, humble fallback responses
-    human_fallback_responses = [
-        "You know what? I'm not entirely sure I caught what you meant there, but I definitely want to understand. Could you help me out and tell me a bit more about what you're feeling or what's on your mind?",
-        "Hmm, I think I might have missed something there. I'm still learning how to pick up on all the nuances of what people share with me. Can you help me understand what you're going through right now?",
-        "I'm going to be honest - I'm not quite sure how to respond to that, but I can tell you might need someone to talk to. What would be most helpful for you right now? I'm here to listen.",
-        "You know, sometimes I don't catch everything perfectly, but I really want to be here for you. Could you tell me more about what's on your heart or what kind of support you're looking for today?",
-        "I feel like I might have missed the mark there. I'm still figuring out how to be the best listener I can be. Would you mind sharing a bit more about what you're experiencing right now?"
-    ]
-    
-    response_text = random.choice(human_fallback_responses)
+    """
+    Handle unrecognized intents with graceful responses
+    
+    When a generative backend is configured, the reply is generated within
+    its deadline and the canned reply is used if it is missed. Under a running
+    event loop (the ASGI mode) a coroutine is returned instead of blocking,
+    which handle_intent_async awaits. For a streamed reply (/chat/stream) the
+    generated text is returned as 'text_stream', pieces yielded as the
+    backend produces them. Callers of handle_intent that pass
+    generative_fallback=False always get the canned reply.
+    """
     
     output_contexts = [{
         "name": f"projects/your-project/agent/sessions/{session_id}/contexts/clarification-needed",
@@ -348,7 +423,48 @@ def handle_fallback(parameters, query_text, session_id, input_contexts):
         }
     }]
     
+    client = generative.get_client() if _GENERATIVE_FALLBACK.get() else None
+    if client is None or not query_text:
+        return {
+            'text': choose_response_variant('fallback'),
+            'output_contexts': output_contexts
+        }
+    
+    if _STREAM_REPLY.get():
+        # Consumed by the response body, after this handler has returned
+        return {
+            'text_stream': _stream_fallback(client, query_text),
+            'output_contexts': output_contexts
+        }
+    
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        response_text = client.generate(query_text)
+    else:
+        return _generate_fallback_async(client, query_text, output_contexts)
+    
     return {
-        'text': response_text,
+        'text': response_text or choose_response_variant('fallback'),
         'output_contexts': output_contexts
     }
+
+def _stream_fallback(client, query_text):
+    """Yield a generated fallback reply as it streams, or the canned reply if none arrives"""
+    streamed = False
+    for piece in client.stream(query_text):
+        streamed = True
+        yield piece
+    if not streamed:
+        yield choose_response_variant('fallback')
+
+async def _generate_fallback_async(client, query_text, output_contexts):
+    """Await a generative fallback reply, using the canned reply if none arrives"""
+    response_text = await client.generate_async(query_text)
+    return {
+        'text': response_text or choose_response_variant('fallback'),
+        'output_contexts': output_contexts
+    }
+
+# Freeze the dispatch table once every built-in handler is registered
+freeze_dispatch_table()
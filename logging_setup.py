@@ -0,0 +1,196 @@
+"""
+Non-blocking, structured logging for the request hot path
+Request threads only put log records on a bounded in-memory queue; a
+background listener thread formats them (as JSON lines by default) and
+writes them out. Configured through environment variables:
+
+    AMIGO_LOG_LEVEL          root level (default INFO)
+    AMIGO_LOG_FORMAT         json (default) or text
+    AMIGO_LOG_SAMPLE_DEBUG   fraction of DEBUG records kept (default 0.01)
+    AMIGO_LOG_SAMPLE_INFO    fraction of INFO records kept (default 1.0)
+    AMIGO_LOG_MESSAGE_BODIES include user messages and replies in records (default off)
+    AMIGO_LOG_QUEUE_SIZE     records buffered before new ones are dropped (default 10000)
+
+Structured fields are passed with extra={'fields': {...}}. Message text and
+other user content goes in extra={'payload': {...}}, which is only written
+when AMIGO_LOG_MESSAGE_BODIES is on.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+
+LOG_LEVEL = os.environ.get("AMIGO_LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.environ.get("AMIGO_LOG_FORMAT", "json").lower()
+LOG_SAMPLE_RATES = {
+    logging.DEBUG: float(os.environ.get("AMIGO_LOG_SAMPLE_DEBUG", "0.01")),
+    logging.INFO: float(os.environ.get("AMIGO_LOG_SAMPLE_INFO", "1.0")),
+}
+LOG_MESSAGE_BODIES = os.environ.get("AMIGO_LOG_MESSAGE_BODIES", "off").lower() in ('on', '1', 'true')
+LOG_QUEUE_SIZE = int(os.environ.get("AMIGO_LOG_QUEUE_SIZE", "10000"))
+
+
+def payload_logging_enabled(level=logging.DEBUG):
+    """
+    Check whether a payload record would be written at all
+
+    Lets callers skip building payload dicts entirely on the hot path.
+
+    Args:
+        level (int): Level the payload would be logged at
+
+    Returns:
+        bool: True when message bodies are on and the level is enabled
+    """
+    return LOG_MESSAGE_BODIES and logging.getLogger().isEnabledFor(level)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a configured fraction of records at each sampled level"""
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = dict(rates)
+
+    def filter(self, record):
+        rate = self.rates.get(record.levelno, 1.0)
+        return rate >= 1.0 or random.random() < rate
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats each record as one JSON object per line"""
+
+    def __init__(self, include_payload=False):
+        super().__init__()
+        self.include_payload = include_payload
+
+    def format(self, record):
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'pid': record.process,
+        }
+        fields = getattr(record, 'fields', None)
+        if fields:
+            entry.update(fields)
+        payload = getattr(record, 'payload', None)
+        if payload and self.include_payload:
+            entry['payload'] = payload
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Plain text lines with structured fields (and payloads when enabled) appended"""
+
+    def __init__(self, include_payload=False):
+        super().__init__('%(asctime)s %(levelname)s %(name)s: %(message)s')
+        self.include_payload = include_payload
+
+    def format(self, record):
+        line = super().format(record)
+        extra = dict(getattr(record, 'fields', None) or {})
+        payload = getattr(record, 'payload', None)
+        if payload and self.include_payload:
+            extra.update(payload)
+        if extra:
+            line += ' ' + ' '.join(f"{key}={value!r}" for key, value in extra.items())
+        return line
+
+
+class BackgroundQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that defers all formatting to the listener thread
+
+    The stock QueueHandler formats every record in the calling thread before
+    queueing it; here records are queued untouched and formatted later. The
+    listener is (re)started on first use in each process, so it survives
+    forking servers, and records are dropped and counted when the queue is full.
+    """
+
+    def __init__(self, target, queue_size=LOG_QUEUE_SIZE):
+        super().__init__(queue.Queue(maxsize=queue_size))
+        self.target = target
+        self.queue_size = queue_size
+        self.dropped = 0
+        self._listener = None
+        self._listener_pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_listener(self):
+        if self._listener_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._listener_pid != os.getpid():
+                if self._listener is not None:
+                    # Inherited across fork: the parent's listener thread does not exist here
+                    self.queue = queue.Queue(maxsize=self.queue_size)
+                self._listener = logging.handlers.QueueListener(self.queue, self.target, respect_handler_level=True)
+                self._listener.start()
+                self._listener_pid = os.getpid()
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def emit(self, record):
+        self._ensure_listener()
+        super().emit(record)
+
+    def stop(self):
+        """Write every queued record and stop the listener thread"""
+        if self._listener is not None and self._listener_pid == os.getpid():
+            self._listener.stop()
+            self._listener = None
+            self._listener_pid = None
+
+
+def configure_logging(level=LOG_LEVEL, log_format=LOG_FORMAT, sample_rates=None, include_payload=LOG_MESSAGE_BODIES,
+                      stream=None):
+    """
+    Route all logging through a background queue with structured output
+
+    Replaces any handlers already on the root logger.
+
+    Args:
+        level (str): Root logger level name
+        log_format (str): 'json' or 'text'
+        sample_rates (dict): Level number mapped to the fraction of records kept
+        include_payload (bool): Write user message bodies attached as payloads
+        stream: Output stream, stderr by default
+
+    Returns:
+        BackgroundQueueHandler: The handler installed on the root logger
+    """
+    target = logging.StreamHandler(stream or sys.stderr)
+    formatter_class = JsonFormatter if log_format == 'json' else TextFormatter
+    target.setFormatter(formatter_class(include_payload=include_payload))
+
+    handler = BackgroundQueueHandler(target)
+    handler.addFilter(SamplingFilter(LOG_SAMPLE_RATES if sample_rates is None else sample_rates))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+        if isinstance(existing, BackgroundQueueHandler):
+            existing.stop()
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    atexit.register(handler.stop)
+    return handler
@@ -0,0 +1,349 @@
+"""
+In-process metrics registry exposed in the Prometheus text format
+Counters and histograms are plain Python lists updated under one lock, so
+recording costs about a microsecond. With AMIGO_METRICS_DIR set, every
+worker process periodically writes a snapshot there and /metrics sums the
+snapshots of all workers, so any worker can answer a scrape.
+
+    AMIGO_METRICS_DIR            shared directory for per-worker snapshots (unset: this process only)
+    AMIGO_METRICS_FLUSH_SECONDS  how often each worker writes its snapshot (default 5)
+"""
+
+import bisect
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+METRICS_DIR = os.environ.get("AMIGO_METRICS_DIR", "")
+METRICS_FLUSH_SECONDS = float(os.environ.get("AMIGO_METRICS_FLUSH_SECONDS", "5"))
+
+# Latency bucket upper bounds in seconds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Snapshot holding the totals of workers that have exited
+RETIRED_SNAPSHOT = 'metrics-retired.json'
+
+_lock = threading.Lock()
+
+
+def _escape(value):
+    """Escape a label value for the text exposition format"""
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=''):
+    """Render a {name="value",...} label set"""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_number(value):
+    """Render a sample value, dropping the fraction from whole numbers"""
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """Monotonic counter with a fixed set of label names"""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+
+    def inc(self, labels=(), amount=1):
+        """
+        Add to the counter for one label combination
+
+        Args:
+            labels (tuple): Label values, in labelnames order
+            amount (float): Increment
+        """
+        with _lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def snapshot(self):
+        """Copy the current values as JSON-friendly data"""
+        with _lock:
+            return [[list(labels), value] for labels, value in self._values.items()]
+
+    @staticmethod
+    def merge(total, samples):
+        """Add one snapshot's samples into a running total"""
+        for labels, value in samples:
+            key = tuple(labels)
+            total[key] = total.get(key, 0) + value
+
+    def render(self, merged):
+        """Render merged samples in the text exposition format"""
+        lines = []
+        for labels, value in sorted(merged.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_number(value)}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with a fixed set of label names"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}  # labels -> [per-bucket counts..., +Inf count, sum]
+
+    def observe(self, labels, value):
+        """
+        Record one observation
+
+        Args:
+            labels (tuple): Label values, in labelnames order
+            value (float): Observed value (seconds, for latencies)
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        with _lock:
+            counts = self._values.get(labels)
+            if counts is None:
+                counts = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    def snapshot(self):
+        """Copy the current values as JSON-friendly data"""
+        with _lock:
+            return [[list(labels), list(counts)] for labels, counts in self._values.items()]
+
+    @staticmethod
+    def merge(total, samples):
+        """Add one snapshot's samples into a running total"""
+        for labels, counts in samples:
+            key = tuple(labels)
+            current = total.get(key)
+            if current is None or len(current) != len(counts):
+                total[key] = list(counts)
+            else:
+                total[key] = [a + b for a, b in zip(current, counts)]
+
+    def render(self, merged):
+        """Render merged samples in the text exposition format"""
+        lines = []
+        for labels, counts in sorted(merged.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == '+Inf' else f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_number(counts[-1])}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Named collection of metrics that renders and aggregates them"""
+
+    def __init__(self, directory=METRICS_DIR, flush_seconds=METRICS_FLUSH_SECONDS):
+        self.directory = directory
+        self.flush_seconds = flush_seconds
+        self._metrics = {}
+        self._flusher_pid = None
+        self._flusher_lock = threading.Lock()
+        self._retired = False
+
+    def counter(self, name, documentation, labelnames=()):
+        """Create and register a Counter"""
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """Create and register a Histogram"""
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def reset(self):
+        """Clear every metric's values in this process"""
+        with _lock:
+            for metric in self._metrics.values():
+                metric._values.clear()
+
+    def snapshot(self):
+        """
+        Copy every metric's current values
+
+        Returns:
+            dict: Metric name mapped to its samples
+        """
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+    def _snapshot_path(self, pid):
+        return os.path.join(self.directory, f"metrics-{pid}.json")
+
+    def _write_json(self, data, path):
+        """Atomically replace a file in the shared directory with JSON data"""
+        handle, temporary = tempfile.mkstemp(dir=self.directory, prefix='.metrics-', suffix='.tmp')
+        with os.fdopen(handle, 'w') as snapshot_file:
+            json.dump(data, snapshot_file, separators=(',', ':'))
+        os.replace(temporary, path)
+
+    def write_snapshot(self):
+        """Atomically write this process's snapshot to the shared directory"""
+        if not self.directory or self._retired:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._write_json(self.snapshot(), self._snapshot_path(os.getpid()))
+
+    def retire_snapshot(self):
+        """
+        Fold this process's values into the retired totals and remove its snapshot
+
+        Called as a worker exits, so recycled workers do not leave one file
+        each behind while their counts stay in the sums.
+        """
+        if not self.directory or self._retired:
+            return
+        self._retired = True
+        os.makedirs(self.directory, exist_ok=True)
+        retired_path = os.path.join(self.directory, RETIRED_SNAPSHOT)
+        with open(os.path.join(self.directory, '.metrics-retired.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                with open(retired_path) as retired_file:
+                    retired = json.load(retired_file)
+            except (OSError, ValueError):
+                retired = {}
+            combined = {}
+            for name, metric in self._metrics.items():
+                totals = {}
+                metric.merge(totals, retired.get(name, []))
+                metric.merge(totals, metric.snapshot())
+                combined[name] = [[list(labels), value] for labels, value in totals.items()]
+            self._write_json(combined, retired_path)
+            try:
+                os.remove(self._snapshot_path(os.getpid()))
+            except FileNotFoundError:
+                pass
+
+    def ensure_flusher(self):
+        """Start the periodic snapshot writer in this process, if aggregation is configured"""
+        if not self.directory or self._flusher_pid == os.getpid():
+            return
+        with self._flusher_lock:
+            if self._flusher_pid != os.getpid():
+                if self._flusher_pid is not None:
+                    # Forked from a process that already recorded: its counts are in its own snapshot
+                    self.reset()
+                threading.Thread(target=self._flush_loop, name='amigo-metrics', daemon=True).start()
+                self._flusher_pid = os.getpid()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            try:
+                self.write_snapshot()
+            except OSError as e:
+                logging.error(f"Failed to write metrics snapshot: {str(e)}")
+
+    def collect(self):
+        """
+        Gather samples from every worker (or just this process)
+
+        Returns:
+            dict: Metric name mapped to merged {labels: value} samples
+        """
+        snapshots = []
+        if self.directory and not self._retired:
+            self.write_snapshot()
+            for filename in os.listdir(self.directory):
+                if not (filename.startswith('metrics-') and filename.endswith('.json')):
+                    continue
+                try:
+                    with open(os.path.join(self.directory, filename)) as snapshot_file:
+                        snapshots.append(json.load(snapshot_file))
+                except (OSError, ValueError):
+                    continue
+        else:
+            snapshots.append(self.snapshot())
+
+        merged = {name: {} for name in self._metrics}
+        for snapshot in snapshots:
+            for name, samples in snapshot.items():
+                metric = self._metrics.get(name)
+                if metric is not None:
+                    metric.merge(merged[name], samples)
+        return merged
+
+    def render(self):
+        """
+        Render every metric in the Prometheus text exposition format
+
+        Returns:
+            str: Exposition text
+        """
+        merged = self.collect()
+        lines = []
+        for name, metric in self._metrics.items():
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric.render(merged[name]))
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.counter(
+    'amigo_http_requests_total', 'HTTP requests by route, method and status code', ('route', 'method', 'status')
+)
+HTTP_LATENCY = REGISTRY.histogram(
+    'amigo_http_request_duration_seconds', 'HTTP request latency by route', ('route', 'method')
+)
+INTENT_REQUESTS = REGISTRY.counter(
+    'amigo_intent_requests_total', 'Turns routed to each intent', ('intent',)
+)
+HANDLER_LATENCY = REGISTRY.histogram(
+    'amigo_intent_handler_duration_seconds', 'Intent handler latency by handler', ('handler',)
+)
+REQUEST_ERRORS = REGISTRY.counter(
+    'amigo_request_errors_total', 'Exceptions caught by request handlers', ('endpoint', 'exception')
+)
+
+
+def record_request(route, method, status, elapsed):
+    """
+    Record one finished HTTP request
+
+    Args:
+        route (str): URL rule (not the raw path, to bound label cardinality)
+        method (str): HTTP method
+        status (int): Response status code
+        elapsed (float): Seconds spent serving the request
+    """
+    REGISTRY.ensure_flusher()
+    HTTP_REQUESTS.inc((route, method, str(status)))
+    HTTP_LATENCY.observe((route, method), elapsed)
+
+
+def record_error(endpoint, error):
+    """
+    Count an exception caught by a request handler
+
+    Args:
+        endpoint (str): Endpoint name
+        error (Exception): The caught exception
+    """
+    REQUEST_ERRORS.inc((endpoint, type(error).__name__))
@@ -0,0 +1,255 @@
+"""
+Precompressed, cacheable delivery of the static HTML pages and built assets
+Each page is rendered and compressed once at startup, then served with strong
+ETags, conditional 304 responses and Cache-Control headers
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+from flask import Response
+from jinja2 import Environment, FileSystemLoader
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; pages are still served gzip/identity
+    brotli = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TEMPLATE_DIR = os.path.join(BASE_DIR, 'templates')
+STATIC_DIR = os.path.join(BASE_DIR, 'static')
+
+# Output of build_assets.py: content-hashed bundles plus manifest.json
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+
+# Third-party stylesheets; vendored by build_assets.py, linked directly only in development
+VENDOR_STYLESHEETS = (
+    "https://cdn.replit.com/agent/bootstrap-agent-dark-theme.min.css",
+    "https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.0/font/bootstrap-icons.css",
+)
+
+# Refuse to start without a build instead of linking the CDN stylesheets (on in gunicorn.conf.py)
+REQUIRE_BUILT_ASSETS = os.environ.get("AMIGO_REQUIRE_ASSETS", "off").lower() in ('on', '1', 'true')
+
+# How long browsers and shared caches may reuse a page without revalidating
+PAGE_MAX_AGE = int(os.environ.get("PAGE_CACHE_MAX_AGE", "600"))
+
+# Hashed asset names change whenever their content does, so they never need revalidation
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_TEMPLATE_ENV = Environment(loader=FileSystemLoader(TEMPLATE_DIR), autoescape=True)
+
+# Encodings in server preference order
+_PREFERRED_ENCODINGS = ('br', 'gzip', 'identity')
+
+
+def _parse_accept_encoding(header):
+    """
+    Parse an Accept-Encoding header into encoding -> quality
+
+    Args:
+        header (str): Raw Accept-Encoding header value
+
+    Returns:
+        dict: Lowercase encoding names mapped to their q-values
+    """
+    accepted = {}
+    for item in header.split(','):
+        name, _, params = item.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name] = quality
+    return accepted
+
+
+class CachedPage:
+    """
+    A static document held in every supported content encoding
+
+    Each encoding gets its own strong ETag, since the bytes on the wire differ.
+    """
+
+    def __init__(self, content, mimetype='text/html', cache_control=None, compress=True):
+        body = content.encode('utf-8') if isinstance(content, str) else content
+        digest = hashlib.sha256(body).hexdigest()[:20]
+
+        self.mimetype = mimetype
+        self.variants = {'identity': (body, f'"{digest}"')}
+        if compress:
+            self.variants['gzip'] = (gzip.compress(body, compresslevel=9, mtime=0), f'"{digest}-gz"')
+            if brotli is not None:
+                self.variants['br'] = (brotli.compress(body, quality=11), f'"{digest}-br"')
+
+        self._etags = frozenset(etag for _, etag in self.variants.values())
+        self._cache_control = cache_control or f"public, max-age={PAGE_MAX_AGE}"
+
+    @classmethod
+    def from_template(cls, filename, max_age=PAGE_MAX_AGE, **context):
+        """
+        Render and precompress a page from the templates directory
+
+        Args:
+            filename (str): File name inside templates/
+            max_age (int): Cache-Control max-age in seconds
+            **context: Template variables
+
+        Returns:
+            CachedPage: The rendered page
+        """
+        html = _TEMPLATE_ENV.get_template(filename).render(**context)
+        return cls(html, cache_control=f"public, max-age={max_age}")
+
+    def select_encoding(self, accept_encoding):
+        """
+        Choose the best available encoding the client accepts
+
+        Args:
+            accept_encoding (str): Raw Accept-Encoding header value
+
+        Returns:
+            str: 'br', 'gzip' or 'identity'
+        """
+        if not accept_encoding:
+            return 'identity'
+        accepted = _parse_accept_encoding(accept_encoding)
+        wildcard = accepted.get('*')
+        for encoding in _PREFERRED_ENCODINGS:
+            if encoding not in self.variants:
+                continue
+            quality = accepted.get(encoding, wildcard)
+            if encoding == 'identity' and quality is None:
+                return encoding
+            if quality:
+                return encoding
+        return 'identity'
+
+    def is_not_modified(self, if_none_match):
+        """
+        Check an If-None-Match header against this page's ETags
+
+        Args:
+            if_none_match (str): Raw If-None-Match header value
+
+        Returns:
+            bool: True when the client's cached copy is current
+        """
+        if not if_none_match:
+            return False
+        for tag in if_none_match.split(','):
+            tag = tag.strip()
+            if tag == '*':
+                return True
+            if tag.startswith('W/'):
+                tag = tag[2:]
+            if tag in self._etags:
+                return True
+        return False
+
+    def to_response(self, request):
+        """
+        Build the response for a request, honoring conditional and encoding headers
+
+        Args:
+            request: The current Flask request
+
+        Returns:
+            Response: 304 Not Modified or the page in the negotiated encoding
+        """
+        encoding = self.select_encoding(request.headers.get('Accept-Encoding', ''))
+        body, etag = self.variants[encoding]
+
+        if self.is_not_modified(request.headers.get('If-None-Match')):
+            response = Response(status=304)
+        else:
+            response = Response(body, mimetype=self.mimetype)
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
+            response.headers['Content-Length'] = str(len(body))
+
+        response.headers['ETag'] = etag
+        response.headers['Cache-Control'] = self._cache_control
+        response.headers['Vary'] = 'Accept-Encoding'
+        return response
+
+
+def load_asset_manifest():
+    """
+    Read the manifest written by build_assets.py
+
+    Returns:
+        dict: The manifest, or None when the assets have not been built
+    """
+    try:
+        with open(os.path.join(DIST_DIR, 'manifest.json'), encoding='utf-8') as manifest:
+            return json.load(manifest)
+    except (OSError, ValueError):
+        return None
+
+
+def page_asset_urls(manifest, static_url_path='/static'):
+    """
+    Get the stylesheet and script URLs every page links to
+
+    Built bundles are preferred. Without a build, development pages fall back
+    to the CDN stylesheets and the unminified sources in static/, with a
+    warning; when REQUIRE_BUILT_ASSETS is set the missing build is an error.
+
+    Args:
+        manifest (dict): Result of load_asset_manifest(), or None
+        static_url_path (str): URL prefix the static folder is served under
+
+    Returns:
+        dict: 'stylesheets' and 'scripts' URL lists for the page templates
+
+    Raises:
+        RuntimeError: No build exists and REQUIRE_BUILT_ASSETS is set
+    """
+    if manifest:
+        return {
+            'stylesheets': [f"{static_url_path}/dist/{name}" for name in manifest['stylesheets']],
+            'scripts': [f"{static_url_path}/dist/{name}" for name in manifest['scripts']]
+        }
+    if REQUIRE_BUILT_ASSETS:
+        raise RuntimeError(f"No frontend build in {DIST_DIR}; run python build_assets.py "
+                           f"(or set AMIGO_REQUIRE_ASSETS=off to link the CDN stylesheets)")
+    logging.warning(f"No frontend build in {DIST_DIR}; pages link the CDN stylesheets "
+                    f"(run python build_assets.py to self-host them)")
+    return {
+        'stylesheets': list(VENDOR_STYLESHEETS) + [f"{static_url_path}/chat.css"],
+        'scripts': [f"{static_url_path}/chat.js"]
+    }
+
+
+def load_dist_assets(manifest):
+    """
+    Load every built asset into memory, precompressed, with immutable caching
+
+    Args:
+        manifest (dict): Result of load_asset_manifest(), or None
+
+    Returns:
+        dict: Hashed file name mapped to its CachedPage
+    """
+    assets = {}
+    for filename in (manifest or {}).get('files', []):
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        with open(os.path.join(DIST_DIR, filename), 'rb') as asset:
+            content = asset.read()
+        assets[filename] = CachedPage(
+            content,
+            mimetype=mimetype,
+            cache_control=IMMUTABLE_CACHE_CONTROL,
+            compress=mimetype.startswith('text/') or mimetype.endswith('javascript')
+        )
+    return assets
@@ -0,0 +1,268 @@
+"""
+On-demand sampling profiler for live requests
+While a profiling session is running, a background thread samples the call
+stacks of the threads serving selected requests (one in every N, or all of
+them) and counts identical stacks. The result is written in the collapsed
+stack format read by flamegraph.pl, speedscope and similar tools:
+
+    app.py:chat;intent_handlers.py:handle_intent;responses.py:pick 42
+
+Sessions are started and stopped through the admin endpoints in app.py or by
+sending AMIGO_PROFILE_SIGNAL to a worker process. When no session is running
+a request costs one attribute check. Configured through environment variables:
+
+    AMIGO_PROFILE_INTERVAL_MS  milliseconds between stack samples (default 2)
+    AMIGO_PROFILE_SECONDS      length of a session started by the signal (default 30)
+    AMIGO_PROFILE_DIR          where finished sessions are written (default: system temp dir)
+    AMIGO_PROFILE_SIGNAL       signal toggling a session (default SIGUSR2; 'off' disables)
+"""
+
+import logging
+import os
+import signal
+import sys
+import tempfile
+import threading
+import time
+
+PROFILE_INTERVAL = float(os.environ.get("AMIGO_PROFILE_INTERVAL_MS", "2")) / 1000
+PROFILE_SECONDS = float(os.environ.get("AMIGO_PROFILE_SECONDS", "30"))
+PROFILE_DIR = os.environ.get("AMIGO_PROFILE_DIR", "") or tempfile.gettempdir()
+PROFILE_SIGNAL = os.environ.get("AMIGO_PROFILE_SIGNAL", "SIGUSR2")
+
+# Deepest stack recorded per sample; deeper frames (nearest the thread's entry point) are cut
+MAX_STACK_DEPTH = 128
+
+
+def frame_label(frame):
+    """
+    Name a stack frame as file:function, with characters flamegraph tools split on removed
+
+    Args:
+        frame: Python frame object
+
+    Returns:
+        str: Label such as 'intent_handlers.py:handle_intent'
+    """
+    code = frame.f_code
+    name = getattr(code, 'co_qualname', code.co_name)
+    return f"{os.path.basename(code.co_filename)}:{name}".replace(';', ':').replace(' ', '_')
+
+
+def collapse_stack(frame):
+    """
+    Turn a thread's current frame into a root-first tuple of frame labels
+
+    Args:
+        frame: Innermost frame of the sampled thread
+
+    Returns:
+        tuple: Frame labels from the outermost call to the innermost
+    """
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return tuple(labels)
+
+
+class SamplingProfiler:
+    """
+    Stack sampler for the threads serving selected requests
+
+    enter() and exit() bracket each request. They return at once while no
+    session is running; during a session, the selected requests register their
+    thread so the sampler thread includes it in every sample.
+    """
+
+    def __init__(self, interval=PROFILE_INTERVAL, output_dir=PROFILE_DIR):
+        self.interval = interval
+        self.output_dir = output_dir
+        self.active = False
+        self._every = 1
+        self._deadline = None
+        self._request_count = 0
+        self._profiled_requests = 0
+        self._threads = {}  # thread ident -> requests in progress on it
+        self._stacks = {}  # collapsed stack tuple -> sample count
+        self._samples = 0
+        self._started_at = None
+        self._last_output = None
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def start(self, every=1, seconds=None):
+        """
+        Start a profiling session, discarding the previous session's stacks
+
+        Args:
+            every (int): Profile one in every this many requests
+            seconds (float): Stop automatically after this long (None: until stop())
+
+        Returns:
+            dict: The new session's status
+        """
+        with self._lock:
+            self._every = max(1, int(every))
+            self._deadline = time.monotonic() + seconds if seconds else None
+            self._request_count = 0
+            self._profiled_requests = 0
+            self._threads = {}
+            self._stacks = {}
+            self._samples = 0
+            self._started_at = time.time()
+            if not self.active:
+                self.active = True
+                self._generation += 1
+                threading.Thread(target=self._sample_loop, args=(self._generation,), name='amigo-profiler',
+                                 daemon=True).start()
+        logging.info("Profiling started", extra={'fields': {'every': self._every, 'seconds': seconds}})
+        return self.status()
+
+    def stop(self, write=True):
+        """
+        End the running session
+
+        Args:
+            write (bool): Also write the collapsed stacks to output_dir
+
+        Returns:
+            str: Path of the written file, or None
+        """
+        with self._lock:
+            if not self.active:
+                return None
+            self.active = False
+        path = self.write() if write else None
+        logging.info("Profiling stopped", extra={'fields': {'samples': self._samples, 'output': path}})
+        return path
+
+    def enter(self):
+        """
+        Mark the start of a request; called for every request
+
+        Returns:
+            int: Token for exit(), or None when this request is not profiled
+        """
+        if not self.active:
+            return None
+        with self._lock:
+            self._request_count += 1
+            if not self.active or self._request_count % self._every:
+                return None
+            ident = threading.get_ident()
+            self._threads[ident] = self._threads.get(ident, 0) + 1
+            self._profiled_requests += 1
+            return ident
+
+    def exit(self, token):
+        """
+        Mark the end of a request
+
+        Args:
+            token (int): Value returned by enter()
+        """
+        if token is None:
+            return
+        with self._lock:
+            remaining = self._threads.get(token, 0) - 1
+            if remaining > 0:
+                self._threads[token] = remaining
+            else:
+                self._threads.pop(token, None)
+
+    def _sample_loop(self, generation):
+        """Sampler thread: record the stacks of every registered thread until its session ends"""
+        while self.active and generation == self._generation:
+            time.sleep(self.interval)
+            if self._deadline is not None and time.monotonic() >= self._deadline:
+                self.stop()
+                return
+            with self._lock:
+                idents = list(self._threads)
+            if not idents:
+                continue
+            frames = sys._current_frames()
+            stacks = [collapse_stack(frames[ident]) for ident in idents if ident in frames]
+            with self._lock:
+                for stack in stacks:
+                    self._stacks[stack] = self._stacks.get(stack, 0) + 1
+                self._samples += len(stacks)
+
+    def collapsed(self):
+        """
+        Render the aggregated stacks in the collapsed format
+
+        Returns:
+            str: One 'frame;frame;frame count' line per distinct stack, busiest first
+        """
+        with self._lock:
+            stacks = sorted(self._stacks.items(), key=lambda item: -item[1])
+        return ''.join(f"{';'.join(stack)} {count}\n" for stack, count in stacks)
+
+    def write(self):
+        """
+        Write the aggregated stacks to a new file in output_dir
+
+        Returns:
+            str: Path of the file
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(self._started_at or time.time()))
+        path = os.path.join(self.output_dir, f"amigo-profile-{os.getpid()}-{stamp}.folded")
+        with open(path, 'w') as output:
+            output.write(self.collapsed())
+        self._last_output = path
+        return path
+
+    def status(self):
+        """
+        Describe the current or last session
+
+        Returns:
+            dict: Whether a session is running, its settings, and what it has collected
+        """
+        with self._lock:
+            return {
+                'active': self.active,
+                'pid': os.getpid(),
+                'every': self._every,
+                'seconds_left': max(0.0, round(self._deadline - time.monotonic(), 1)) if self.active and self._deadline else None,
+                'requests_seen': self._request_count,
+                'requests_profiled': self._profiled_requests,
+                'samples': self._samples,
+                'distinct_stacks': len(self._stacks),
+                'last_output': self._last_output,
+            }
+
+
+PROFILER = SamplingProfiler()
+
+
+def _toggle_from_signal(signum, frame):
+    """Signal handler: start a timed session, or stop and write the running one"""
+    if PROFILER.active:
+        threading.Thread(target=PROFILER.stop, daemon=True).start()
+    else:
+        threading.Thread(target=PROFILER.start, kwargs={'seconds': PROFILE_SECONDS}, daemon=True).start()
+
+
+def install_signal_handler(signal_name=PROFILE_SIGNAL):
+    """
+    Let a signal toggle profiling in this process
+
+    Must run in the main thread, after the server has set up its own signal
+    handling (gunicorn resets signal handlers when a worker starts).
+
+    Args:
+        signal_name (str): Signal name such as 'SIGUSR2', or 'off'
+
+    Returns:
+        bool: True when the handler was installed
+    """
+    signum = getattr(signal, signal_name.upper(), None) if signal_name.lower() != 'off' else None
+    if signum is None or threading.current_thread() is not threading.main_thread():
+        return False
+    signal.signal(signum, _toggle_from_signal)
+    return True
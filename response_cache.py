@@ -0,0 +1,293 @@
+"""
+Semantic cache for generated replies
+Messages are normalized and embedded with a cheap hashed n-gram vectorizer;
+a new message reuses a cached reply when its cosine similarity to an earlier
+message clears a threshold, so near-identical check-ins cost one generation.
+With a shared cache (see shared_cache.py), replies are also stored there by
+exact normalized message, so a reply generated by one worker serves the
+same message on every other worker.
+
+Similarity alone cannot tell "i want to hurt myself" from "i don't want to
+hurt myself", so the negation words of a message are a hard part of the
+match: a reply is only reused between messages with the same negations.
+Messages mentioning self-harm or suicide are never answered from the cache
+and never stored in it.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from intent_detection import normalize_message, tokenize
+from metrics import REGISTRY
+from text_vectors import HashedNgramVectorizer, stem
+
+# Words that carry little meaning for reply reuse ("i feel so anxious" ~ "feeling anxious").
+# Never add a negation word here: they decide what a message means (see NEGATION_WORDS)
+FILLER_WORDS = frozenset([
+    'a', 'an', 'the', 'i', "i'm", 'im', 'am', 'is', 'are', 'was', 'be', 'been', 'me', 'my',
+    'so', 'really', 'very', 'just', 'quite', 'pretty', 'kind', 'of', 'bit', 'little',
+    'feel', 'feeling', 'feels', 'felt', 'like', 'um', 'uh', 'well', 'today', 'right', 'now'
+])
+
+# Words that negate or reverse a message; two messages share a reply only when their
+# sets of these (apostrophes dropped, so "don't" and "dont" agree) are equal
+NEGATION_WORDS = frozenset([
+    'not', 'no', 'never', 'nothing', 'nobody', 'none', 'nowhere', 'neither', 'nor', 'cannot', 'without',
+    'anymore', 'longer', 'stop', 'stopped', 'quit',
+    'dont', 'doesnt', 'didnt', 'cant', 'couldnt', 'wont', 'wouldnt', 'shouldnt', 'isnt', 'arent',
+    'wasnt', 'werent', 'havent', 'hasnt', 'hadnt', 'aint', 'mustnt', 'neednt'
+])
+
+# Tokens and phrases marking a possible crisis; such messages bypass the cache entirely,
+# so every one gets a reply generated for exactly what was said
+CRISIS_WORDS = frozenset([
+    'suicide', 'suicidal', 'kill', 'killing', 'kms', 'die', 'dying', 'dead', 'death', 'hurt', 'hurting',
+    'harm', 'harming', 'cut', 'cutting', 'overdose', 'overdosing', 'hang', 'hanging', 'unalive', 'kys'
+])
+CRISIS_PHRASES = (
+    'end it all', 'end my life', 'ending my life', 'take my life', 'taking my life', 'end things',
+    'reason to live', 'worth living', 'better off without me', 'disappear forever'
+)
+
+RESPONSE_CACHE_EVENTS = REGISTRY.counter(
+    'amigo_response_cache_events_total', 'Generated-reply cache lookups by result, and entries dropped', ('event',)
+)
+
+
+def cache_tokens(message):
+    """
+    Split a message into the tokens the cache keys are built from
+
+    Args:
+        message (str): Raw user message
+
+    Returns:
+        list: Word tokens, or None when the message must bypass the cache
+    """
+    tokens = tokenize(normalize_message(message))
+    if not CRISIS_WORDS.isdisjoint(tokens):
+        return None
+    text = f" {' '.join(tokens)} "
+    if any(f" {phrase} " in text for phrase in CRISIS_PHRASES):
+        return None
+    return tokens
+
+
+def negation_key(tokens):
+    """
+    Get the set of negation words in a message, as a canonical string
+
+    Args:
+        tokens (list): Result of cache_tokens()
+
+    Returns:
+        str: Sorted, space-separated negation words ('' when there are none)
+    """
+    return ' '.join(sorted({
+        word for word in (token.replace("'", '') for token in tokens) if word in NEGATION_WORDS
+    }))
+
+
+def normalize_for_cache(message):
+    """
+    Reduce a message to its meaningful, stemmed words
+
+    Args:
+        message (str): Raw user message
+
+    Returns:
+        str: Space-separated stems; used as the exact-match cache key
+            ('' for messages that bypass the cache)
+    """
+    tokens = cache_tokens(message)
+    if tokens is None:
+        return ''
+    return _stemmed_key(tokens)
+
+
+def _stemmed_key(tokens):
+    """Space-separated stems of the meaningful tokens"""
+    return ' '.join(stem(token) for token in tokens if token not in FILLER_WORDS)
+
+
+def _negation_id(key):
+    """Fixed-width id of a negation key, so the similarity search can compare them vectorized"""
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'big', signed=True)
+
+
+def shared_cache_key(key):
+    """Bounded shared-cache key for a normalized message"""
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class SemanticResponseCache:
+    """
+    Fixed-size LRU + TTL cache of replies, searchable by message similarity
+
+    Vectors live in one preallocated matrix, so a lookup is a single
+    matrix-vector product over the occupied rows; rows whose negation words
+    differ from the message's are excluded. With a shared cache, an
+    exact miss here is looked up there before the similarity search, and
+    shared hits are copied into this process's cache.
+    """
+
+    def __init__(self, max_entries=1024, ttl=3600, threshold=0.8, vectorizer=None, shared=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.vectorizer = vectorizer or HashedNgramVectorizer()
+        self.shared = shared
+
+        self._vectors = np.zeros((max_entries, self.vectorizer.dimensions), dtype=np.float32)
+        self._expires = np.zeros(max_entries, dtype=np.float64)
+        self._negations = np.zeros(max_entries, dtype=np.int64)
+        self._replies = [None] * max_entries
+        self._keys = [None] * max_entries
+        self._free_rows = list(range(max_entries - 1, -1, -1))
+        self._slots = OrderedDict()  # normalized key -> row, least recently used first
+        self._lock = threading.Lock()
+        self._stats = {'exact_hits': 0, 'shared_hits': 0, 'similar_hits': 0, 'misses': 0, 'evictions': 0,
+                       'expired': 0, 'bypassed': 0}
+
+    def _count(self, event):
+        """Count a lookup result or dropped entry (caller holds the lock)"""
+        self._stats[event] += 1
+        RESPONSE_CACHE_EVENTS.inc((event,))
+
+    def get(self, message):
+        """
+        Find a cached reply for a message or a sufficiently similar one
+
+        Args:
+            message (str): Raw user message
+
+        Returns:
+            str: Cached reply, or None on a miss
+        """
+        tokens = cache_tokens(message)
+        if tokens is None:
+            with self._lock:
+                self._count('bypassed')
+            return None
+        key = _stemmed_key(tokens)
+        if not key:
+            return None
+        now = time.monotonic()
+
+        with self._lock:
+            row = self._slots.get(key)
+            if row is not None:
+                if self._expires[row] > now:
+                    self._slots.move_to_end(key)
+                    self._count('exact_hits')
+                    return self._replies[row]
+                self._evict(key, 'expired')
+
+        if self.shared is not None:
+            reply = self.shared.get('replies', shared_cache_key(key))
+            if reply is not None:
+                self._store(key, reply, negation_key(tokens))
+                with self._lock:
+                    self._count('shared_hits')
+                return reply
+
+        vector = self.vectorizer.embed(key)
+        negation_id = _negation_id(negation_key(tokens))
+
+        with self._lock:
+            if self._slots:
+                rows = np.fromiter(self._slots.values(), dtype=np.intp, count=len(self._slots))
+                scores = self._vectors[rows] @ vector
+                scores[self._expires[rows] <= now] = -1.0
+                scores[self._negations[rows] != negation_id] = -1.0
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    row = rows[best]
+                    self._slots.move_to_end(self._keys[row])
+                    self._count('similar_hits')
+                    return self._replies[row]
+            self._count('misses')
+        return None
+
+    def put(self, message, reply):
+        """
+        Cache the reply generated for a message
+
+        When another worker already stored a reply for the same message in
+        the shared cache, that reply is kept and returned instead, so every
+        worker answers the message the same way.
+
+        Args:
+            message (str): Raw user message
+            reply (str): Generated reply
+
+        Returns:
+            str: The reply now cached for the message (the reply itself,
+                uncached, for messages that bypass the cache)
+        """
+        tokens = cache_tokens(message)
+        if tokens is None or not reply:
+            return reply
+        key = _stemmed_key(tokens)
+        if not key:
+            return reply
+        if self.shared is not None:
+            reply = self.shared.add('replies', shared_cache_key(key), reply, self.ttl)
+        self._store(key, reply, negation_key(tokens))
+        return reply
+
+    def _store(self, key, reply, negations):
+        """Store a reply in this process under its normalized key and negation key"""
+        vector = self.vectorizer.embed(key)
+        negation_id = _negation_id(negations)
+
+        with self._lock:
+            row = self._slots.get(key)
+            if row is None:
+                if len(self._slots) >= self.max_entries:
+                    self._evict(next(iter(self._slots)), 'evictions')
+                row = self._free_rows.pop()
+                self._slots[key] = row
+            else:
+                self._slots.move_to_end(key)
+            self._vectors[row] = vector
+            self._negations[row] = negation_id
+            self._expires[row] = time.monotonic() + self.ttl
+            self._replies[row] = reply
+            self._keys[row] = key
+
+    def _evict(self, key, reason):
+        """Drop an entry (caller holds the lock)"""
+        row = self._slots.pop(key)
+        self._keys[row] = None
+        self._replies[row] = None
+        self._free_rows.append(row)
+        self._count(reason)
+
+    def clear(self):
+        """Remove every entry, keeping the statistics"""
+        with self._lock:
+            for key in list(self._slots):
+                self._evict(key, 'evictions')
+
+    def get_stats(self):
+        """
+        Get hit-rate statistics since startup
+
+        The counts are also exported as amigo_response_cache_events_total.
+
+        Returns:
+            dict: Hit/miss/eviction counts, lookups that bypassed the cache,
+                current size and hit_rate
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._slots)
+        hits = stats['exact_hits'] + stats['shared_hits'] + stats['similar_hits']
+        lookups = hits + stats['misses']
+        stats['hit_rate'] = hits / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,426 @@
+"""
+Server-side chat session state shared by every worker and host
+State lives in the chat_sessions table behind an in-process read-through
+cache: the active contexts of the conversation (read and written by
+context_store.py on every turn) and the turn count, last intent and
+timestamps. Writes use optimistic versioning, so a worker holding a stale
+cached copy reloads and retries instead of overwriting another worker's turn.
+Turn counts are recorded write-behind: requests only queue the turn, and a
+background thread applies queued turns, one update per session per batch.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import Column, Float, Integer, String, Table, Text, bindparam, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+import database
+from metrics import REGISTRY
+
+# Sessions kept in the per-process cache, and how long a cached copy is trusted
+SESSION_CACHE_SIZE = int(os.environ.get("AMIGO_SESSION_CACHE_SIZE", "10000"))
+SESSION_CACHE_TTL = float(os.environ.get("AMIGO_SESSION_CACHE_TTL", "30"))
+
+# Chat turns waiting to be recorded, and the most applied in one pass
+SESSION_QUEUE_SIZE = int(os.environ.get("AMIGO_SESSION_QUEUE_SIZE", "10000"))
+SESSION_BATCH_SIZE = 500
+
+# Attempts to apply an update when other workers keep winning the race
+MAX_UPDATE_ATTEMPTS = 3
+
+SESSIONS_TABLE = Table(
+    'chat_sessions',
+    database.METADATA,
+    Column('session_id', String(64), primary_key=True),
+    Column('state', Text, nullable=False),
+    Column('version', Integer, nullable=False),
+    Column('updated_at', Float, nullable=False),
+)
+
+# Statements are built once and reused, so SQLAlchemy compiles each a single time
+_SELECT_STATE = select(SESSIONS_TABLE.c.state, SESSIONS_TABLE.c.version).where(
+    SESSIONS_TABLE.c.session_id == bindparam('session_id')
+)
+_INSERT_STATE = insert(SESSIONS_TABLE)
+_UPDATE_STATE = update(SESSIONS_TABLE).where(
+    SESSIONS_TABLE.c.session_id == bindparam('match_session_id'),
+    SESSIONS_TABLE.c.version == bindparam('expected_version')
+)
+
+SESSION_EVENTS = REGISTRY.counter(
+    'amigo_session_store_events_total', 'Session state cache lookups, writes and version conflicts', ('event',)
+)
+SESSION_TURNS = REGISTRY.counter(
+    'amigo_session_turns_total', 'Chat turns queued, recorded, dropped and failed by the session writer', ('outcome',)
+)
+
+
+class StaleSessionError(Exception):
+    """Raised when a session changed in the database since it was read"""
+
+
+class SessionStore:
+    """
+    Versioned session state in the database with an LRU + TTL read cache
+
+    Reads are answered from the cache while the copy is fresh. Every write
+    goes to the database and refreshes the cache. Without an explicit engine
+    the process's shared engine from database.get_engine() is used.
+    """
+
+    def __init__(self, engine=None, cache_size=SESSION_CACHE_SIZE, cache_ttl=SESSION_CACHE_TTL):
+        self.engine = engine
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self._cache = OrderedDict()  # session_id -> (expires, version, state json)
+        self._lock = threading.Lock()
+        self._stats = {'cache_hits': 0, 'cache_misses': 0, 'writes': 0, 'conflicts': 0}
+
+    def _get_engine(self):
+        return self.engine or database.get_engine()
+
+    def _count(self, event):
+        """Count a cache lookup, write or conflict (caller holds the lock)"""
+        self._stats[event] += 1
+        SESSION_EVENTS.inc((event,))
+
+    def _cache_get(self, session_id):
+        with self._lock:
+            entry = self._cache.get(session_id)
+            if entry is not None and entry[0] > time.monotonic():
+                self._cache.move_to_end(session_id)
+                self._count('cache_hits')
+                return entry
+            self._count('cache_misses')
+            return None
+
+    def _cache_put(self, session_id, version, encoded):
+        with self._lock:
+            self._cache[session_id] = (time.monotonic() + self.cache_ttl, version, encoded)
+            self._cache.move_to_end(session_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _cache_drop(self, session_id):
+        with self._lock:
+            self._cache.pop(session_id, None)
+
+    def load(self, session_id, use_cache=True):
+        """
+        Read a session's state
+
+        Args:
+            session_id (str): Chat session identifier
+            use_cache (bool): False to bypass the in-process cache
+
+        Returns:
+            tuple: (state dict, version); ({}, 0) for an unknown session
+        """
+        entry = self._cache_get(session_id) if use_cache else None
+        if entry is None:
+            with self._get_engine().connect() as connection:
+                row = connection.execute(_SELECT_STATE, {'session_id': session_id}).first()
+            if row is None:
+                return {}, 0
+            entry = (None, row.version, row.state)
+            self._cache_put(session_id, row.version, row.state)
+        return json.loads(entry[2]), entry[1]
+
+    def save(self, session_id, state, version):
+        """
+        Write a session's state if nobody else changed it since it was read
+
+        Args:
+            session_id (str): Chat session identifier
+            state (dict): JSON-serializable state
+            version (int): Version returned by load()
+
+        Returns:
+            int: The new version
+
+        Raises:
+            StaleSessionError: The stored version no longer matches
+        """
+        encoded = json.dumps(state, separators=(',', ':'))
+        values = {'state': encoded, 'version': version + 1, 'updated_at': time.time()}
+        try:
+            with self._get_engine().begin() as connection:
+                if version == 0:
+                    connection.execute(_INSERT_STATE, dict(values, session_id=session_id))
+                    written = 1
+                else:
+                    written = connection.execute(
+                        _UPDATE_STATE,
+                        dict(values, match_session_id=session_id, expected_version=version)
+                    ).rowcount
+        except IntegrityError:
+            written = 0
+
+        if not written:
+            self._cache_drop(session_id)
+            with self._lock:
+                self._count('conflicts')
+            raise StaleSessionError(session_id)
+
+        self._cache_put(session_id, version + 1, encoded)
+        with self._lock:
+            self._count('writes')
+        return version + 1
+
+    def update(self, session_id, change):
+        """
+        Apply a change to a session's state, retrying on concurrent writes
+
+        Args:
+            session_id (str): Chat session identifier
+            change: Function taking the current state dict and modifying it in place
+
+        Returns:
+            dict: The state as written
+        """
+        use_cache = True
+        for _ in range(MAX_UPDATE_ATTEMPTS):
+            state, version = self.load(session_id, use_cache=use_cache)
+            change(state)
+            try:
+                self.save(session_id, state, version)
+                return state
+            except StaleSessionError:
+                use_cache = False
+        raise StaleSessionError(session_id)
+
+    def get_stats(self):
+        """
+        Get cache and write statistics since startup
+
+        The counts are also exported as amigo_session_store_events_total.
+
+        Returns:
+            dict: Cache hits and misses, writes, version conflicts and cache size
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['cached_sessions'] = len(self._cache)
+        return stats
+
+
+def _apply_turns(intent, turns, first_at, last_at):
+    """Build a state change recording one or more conversation turns"""
+    def change(state):
+        state.setdefault('created_at', first_at)
+        state['turns'] = state.get('turns', 0) + turns
+        state['last_intent'] = intent
+        state['last_active'] = last_at
+    return change
+
+
+_STOP = object()
+
+
+class SessionTurnWriter:
+    """
+    Bounded write-behind queue recording chat turns in the session store
+
+    append() never blocks: when the queue is full the turn is dropped and
+    counted, so a slow database cannot slow down replies. The background
+    thread drains up to SESSION_BATCH_SIZE turns at a time and merges the
+    turns of each session into a single versioned update.
+    """
+
+    def __init__(self, store, queue_size=SESSION_QUEUE_SIZE, batch_size=SESSION_BATCH_SIZE):
+        self.store = store
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._thread_pid = None
+        self._lock = threading.Lock()
+        self._stats = {'queued': 0, 'recorded': 0, 'dropped': 0, 'failed': 0}
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+        SESSION_TURNS.inc((name,), amount)
+
+    def _ensure_started(self):
+        """Start the writer on first use in this process (threads do not survive fork)"""
+        if self._thread_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread_pid != os.getpid():
+                if self._thread is not None:
+                    # Inherited from the parent: its queue and thread belong to another process
+                    self._queue = queue.Queue(maxsize=self.queue_size)
+                self._thread = threading.Thread(target=self._run, name='amigo-sessions', daemon=True)
+                self._thread.start()
+                self._thread_pid = os.getpid()
+
+    def append(self, session_id, intent):
+        """
+        Queue one chat turn for recording
+
+        Args:
+            session_id (str): Chat session identifier
+            intent (str): Intent detected for the turn
+
+        Returns:
+            bool: False when the turn was dropped because the queue was full
+        """
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((session_id, intent, time.time()))
+        except queue.Full:
+            self._count('dropped')
+            return False
+        self._count('queued')
+        return True
+
+    def _run(self):
+        """Writer loop: wait for a turn, take whatever else is queued, apply them per session"""
+        while True:
+            item = self._queue.get()
+            batch = []
+            while item is not _STOP:
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                self._write(batch)
+            if item is _STOP:
+                return
+
+    def _write(self, batch):
+        """Apply a batch of turns, one update per session"""
+        sessions = {}  # session_id -> [intent, turns, first_at, last_at], in queue order
+        for session_id, intent, recorded_at in batch:
+            merged = sessions.get(session_id)
+            if merged is None:
+                sessions[session_id] = [intent, 1, recorded_at, recorded_at]
+            else:
+                merged[0] = intent
+                merged[1] += 1
+                merged[3] = recorded_at
+        for session_id, (intent, turns, first_at, last_at) in sessions.items():
+            try:
+                self.store.update(session_id, _apply_turns(intent, turns, first_at, last_at))
+                self._count('recorded', turns)
+            except Exception as e:
+                logging.error(f"Failed to save session state for {session_id}: {str(e)}")
+                self._count('failed', turns)
+
+    def close(self, timeout=5.0):
+        """
+        Record every queued turn and stop the writer
+
+        Args:
+            timeout (float): Seconds to wait for the final writes
+        """
+        thread = self._thread
+        if thread is None or self._thread_pid != os.getpid() or not thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logging.error("Session turn queue still full at shutdown; unrecorded turns are lost")
+            return
+        thread.join(timeout)
+        self._thread = None
+        self._thread_pid = None
+
+    def get_stats(self):
+        """
+        Get queue and write statistics since startup
+
+        The counts are also exported as amigo_session_turns_total.
+
+        Returns:
+            dict: Turns queued, recorded, dropped and failed, and current backlog
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats['backlog'] = self._queue.qsize()
+        return stats
+
+
+_store = None
+_writer = None
+_store_lock = threading.Lock()
+
+
+def get_session_store():
+    """
+    Get the process-wide session store
+
+    Returns:
+        SessionStore: Store on the configured database, or None when
+            DATABASE_URL is not set
+    """
+    global _store
+    if _store is None and database.is_configured():
+        with _store_lock:
+            if _store is None:
+                _store = SessionStore()
+    return _store
+
+
+def get_session_writer():
+    """
+    Get the process-wide chat turn writer
+
+    Returns:
+        SessionTurnWriter: Writer for the session store, or None when
+            DATABASE_URL is not set
+    """
+    global _writer
+    if _writer is None:
+        store = get_session_store()
+        if store is None:
+            return None
+        with _store_lock:
+            if _writer is None:
+                _writer = SessionTurnWriter(store)
+                atexit.register(_writer.close)
+    return _writer
+
+
+def record_chat_turn(session_id, intent):
+    """
+    Queue a chat turn for recording in the session's server-side state
+
+    The update runs on the writer thread, off the request path; failures
+    there are logged and counted, since session state must never break a reply.
+
+    Args:
+        session_id (str): Chat session identifier
+        intent (str): Intent detected for the turn
+
+    Returns:
+        bool: True when the turn was queued; False when no store is
+            configured or the queue was full
+    """
+    writer = get_session_writer()
+    if writer is None:
+        return False
+    return writer.append(session_id, intent)
+
+
+def flush_session_turns(timeout=5.0):
+    """
+    Record all queued chat turns and stop the writer; called on server shutdown
+
+    Args:
+        timeout (float): Seconds to wait for the final writes
+    """
+    if _writer is not None:
+        _writer.close(timeout)
@@ -0,0 +1,426 @@
+"""
+Cache shared by every worker process on a host
+Each gunicorn worker is a separate process, so a cache kept in process memory
+is duplicated per worker and misses whenever the next turn of a conversation
+lands on another worker. The sqlite backend keeps entries in one SQLite file
+in WAL mode, memory-mapped by every worker: reads never wait for writers, and
+a read is a B-tree lookup in shared page cache rather than a network call.
+Entries expire after a per-entry TTL and are purged periodically. Configured
+through environment variables:
+
+    AMIGO_SHARED_CACHE              off (default), memory or sqlite
+    AMIGO_SHARED_CACHE_PATH         SQLite file (default <tmp>/amigo-shared-cache.sqlite3)
+    AMIGO_SHARED_CACHE_MMAP_MB      megabytes of the file each process maps (default 64)
+    AMIGO_SHARED_CACHE_MAX_ENTRIES  entries kept; the soonest to expire go first (default 200000)
+
+The memory backend has the same interface for single-process servers.
+Values must be JSON-serializable; every get returns a fresh copy.
+"""
+
+import abc
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+SHARED_CACHE_BACKEND = os.environ.get("AMIGO_SHARED_CACHE", "off").lower()
+SHARED_CACHE_PATH = os.environ.get(
+    "AMIGO_SHARED_CACHE_PATH", os.path.join(tempfile.gettempdir(), 'amigo-shared-cache.sqlite3')
+)
+SHARED_CACHE_MMAP_MB = int(os.environ.get("AMIGO_SHARED_CACHE_MMAP_MB", "64"))
+SHARED_CACHE_MAX_ENTRIES = int(os.environ.get("AMIGO_SHARED_CACHE_MAX_ENTRIES", "200000"))
+
+# Seconds a connection waits for another process's write before giving up
+BUSY_TIMEOUT = 1.0
+
+# Seconds between expiry sweeps, per process
+PURGE_INTERVAL = 60.0
+
+_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS shared_cache ('
+    ' namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, expires REAL NOT NULL,'
+    ' PRIMARY KEY (namespace, key)) WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS shared_cache_expires ON shared_cache (expires)',
+)
+_SELECT = 'SELECT value FROM shared_cache WHERE namespace = ? AND key = ? AND expires > ?'
+_SELECT_ANY = 'SELECT value FROM shared_cache WHERE namespace = ? AND key = ?'
+_UPSERT = (
+    'INSERT INTO shared_cache (namespace, key, value, expires) VALUES (?, ?, ?, ?) '
+    'ON CONFLICT (namespace, key) DO UPDATE SET value = excluded.value, expires = excluded.expires'
+)
+# Replaces an existing entry only once it has expired
+_INSERT_IF_ABSENT = _UPSERT + ' WHERE shared_cache.expires <= ?'
+_DELETE = 'DELETE FROM shared_cache WHERE namespace = ? AND key = ?'
+_DELETE_EXPIRED = 'DELETE FROM shared_cache WHERE expires <= ?'
+_DELETE_SOONEST = (
+    'DELETE FROM shared_cache WHERE (namespace, key) IN '
+    '(SELECT namespace, key FROM shared_cache ORDER BY expires LIMIT ?)'
+)
+
+
+def _encode(value):
+    return json.dumps(value, separators=(',', ':'))
+
+
+class SharedCache(abc.ABC):
+    """
+    Interface of the cache backends: namespaced keys, JSON values, per-entry TTL
+
+    None is never cached: get() returns None for a miss, and get_or_set()
+    does not store a None result.
+    """
+
+    name = 'none'
+
+    @abc.abstractmethod
+    def get(self, namespace, key):
+        """
+        Read an entry
+
+        Args:
+            namespace (str): Kind of entry ('contexts', 'replies', ...)
+            key (str): Key within the namespace
+
+        Returns:
+            The stored value, or None when missing or expired
+        """
+
+    @abc.abstractmethod
+    def set(self, namespace, key, value, ttl):
+        """
+        Write an entry, replacing any existing one
+
+        Args:
+            namespace (str): Kind of entry
+            key (str): Key within the namespace
+            value: JSON-serializable value
+            ttl (float): Seconds until the entry expires
+        """
+
+    @abc.abstractmethod
+    def add(self, namespace, key, value, ttl):
+        """
+        Write an entry unless a live one exists, atomically across processes
+
+        Args:
+            namespace (str): Kind of entry
+            key (str): Key within the namespace
+            value: JSON-serializable value
+            ttl (float): Seconds until the entry expires
+
+        Returns:
+            The value now stored: this one, or the one another caller wrote first
+        """
+
+    @abc.abstractmethod
+    def delete(self, namespace, key):
+        """
+        Remove an entry
+
+        Args:
+            namespace (str): Kind of entry
+            key (str): Key within the namespace
+        """
+
+    def get_or_set(self, namespace, key, compute, ttl):
+        """
+        Read an entry, computing and storing it on a miss
+
+        compute() runs outside any lock, so two workers missing at once may
+        both call it; add() then keeps the first result and both callers
+        return that same value.
+
+        Args:
+            namespace (str): Kind of entry
+            key (str): Key within the namespace
+            compute: Function of no arguments returning the value, or None to store nothing
+            ttl (float): Seconds until the entry expires
+
+        Returns:
+            The cached or computed value
+        """
+        value = self.get(namespace, key)
+        if value is not None:
+            return value
+        value = compute()
+        if value is None:
+            return None
+        return self.add(namespace, key, value, ttl)
+
+
+class MemoryCache(SharedCache):
+    """
+    In-process LRU + TTL backend, for single-process servers and development
+
+    Values are stored encoded, so callers get copies just as from SQLite.
+    """
+
+    name = 'memory'
+
+    def __init__(self, max_entries=SHARED_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # (namespace, key) -> (expires, encoded value)
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'writes': 0, 'errors': 0, 'purged': 0}
+
+    def _live(self, slot, now):
+        """Get a live entry, dropping it if expired (lock held)"""
+        entry = self._entries.get(slot)
+        if entry is None:
+            return None
+        if entry[0] <= now:
+            del self._entries[slot]
+            self._stats['purged'] += 1
+            return None
+        return entry
+
+    def _store(self, slot, encoded, ttl):
+        """Write an entry and enforce the size bound (lock held)"""
+        self._entries[slot] = (time.time() + ttl, encoded)
+        self._entries.move_to_end(slot)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats['purged'] += 1
+        self._stats['writes'] += 1
+
+    def get(self, namespace, key):
+        with self._lock:
+            entry = self._live((namespace, key), time.time())
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end((namespace, key))
+            self._stats['hits'] += 1
+        return json.loads(entry[1])
+
+    def set(self, namespace, key, value, ttl):
+        encoded = _encode(value)
+        with self._lock:
+            self._store((namespace, key), encoded, ttl)
+
+    def add(self, namespace, key, value, ttl):
+        encoded = _encode(value)
+        with self._lock:
+            entry = self._live((namespace, key), time.time())
+            if entry is not None:
+                return json.loads(entry[1])
+            self._store((namespace, key), encoded, ttl)
+        return value
+
+    def delete(self, namespace, key):
+        with self._lock:
+            self._entries.pop((namespace, key), None)
+
+    def clear(self):
+        """Remove every entry, keeping the statistics"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        """
+        Get hit-rate statistics since startup
+
+        Returns:
+            dict: Hits, misses, writes, errors, purged entries, size and hit_rate
+        """
+        with self._lock:
+            stats = dict(self._stats, backend=self.name, entries=len(self._entries))
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+
+class SqliteCache(SharedCache):
+    """
+    Backend on a memory-mapped SQLite file in WAL mode, shared by every process
+
+    Each thread of each process opens its own connection on first use (a
+    connection inherited across fork is left open and never used). SQLite
+    errors, such as a write waiting longer than BUSY_TIMEOUT, are logged and
+    counted and behave as a miss: the cache never fails a request.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path=SHARED_CACHE_PATH, mmap_mb=SHARED_CACHE_MMAP_MB, max_entries=SHARED_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.mmap_bytes = mmap_mb * 1024 * 1024
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._inherited = []
+        self._lock = threading.Lock()
+        self._next_purge = 0.0
+        self._stats = {'hits': 0, 'misses': 0, 'writes': 0, 'errors': 0, 'purged': 0}
+
+    def _connect(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(
+            self.path, timeout=BUSY_TIMEOUT, isolation_level=None, check_same_thread=False
+        )
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.execute(f'PRAGMA mmap_size={self.mmap_bytes}')
+        for statement in _SCHEMA:
+            connection.execute(statement)
+        return connection
+
+    def _connection(self):
+        """Get this thread's connection, opening a new one after fork"""
+        local = self._local
+        connection = getattr(local, 'connection', None)
+        if connection is None or local.pid != os.getpid():
+            if connection is not None:
+                # SQLite connections must not cross fork; keep the parent's open and unused
+                self._inherited.append(connection)
+            connection = self._connect()
+            local.connection, local.pid = connection, os.getpid()
+        return connection
+
+    def _count(self, outcome):
+        with self._lock:
+            self._stats[outcome] += 1
+
+    def _error(self, operation, error):
+        self._count('errors')
+        logging.warning(f"Shared cache {operation} failed: {str(error)}")
+
+    def _maybe_purge(self, now):
+        """Sweep expired entries at most once per PURGE_INTERVAL in this process"""
+        if now < self._next_purge:
+            return
+        with self._lock:
+            if now < self._next_purge:
+                return
+            self._next_purge = now + PURGE_INTERVAL
+        self.purge_expired()
+
+    def get(self, namespace, key):
+        try:
+            row = self._connection().execute(_SELECT, (namespace, key, time.time())).fetchone()
+        except sqlite3.Error as e:
+            self._error('get', e)
+            return None
+        self._count('hits' if row else 'misses')
+        return json.loads(row[0]) if row else None
+
+    def set(self, namespace, key, value, ttl):
+        now = time.time()
+        try:
+            self._connection().execute(_UPSERT, (namespace, key, _encode(value), now + ttl))
+        except sqlite3.Error as e:
+            self._error('set', e)
+            return
+        self._count('writes')
+        self._maybe_purge(now)
+
+    def add(self, namespace, key, value, ttl):
+        now = time.time()
+        connection = self._connection()
+        try:
+            with connection:
+                # Take the write lock first, so the insert and the read see the same entry
+                connection.execute('BEGIN IMMEDIATE')
+                connection.execute(_INSERT_IF_ABSENT, (namespace, key, _encode(value), now + ttl, now))
+                stored = connection.execute(_SELECT_ANY, (namespace, key)).fetchone()[0]
+        except sqlite3.Error as e:
+            self._error('add', e)
+            return value
+        self._count('writes')
+        self._maybe_purge(now)
+        return json.loads(stored)
+
+    def delete(self, namespace, key):
+        try:
+            self._connection().execute(_DELETE, (namespace, key))
+        except sqlite3.Error as e:
+            self._error('delete', e)
+
+    def purge_expired(self):
+        """
+        Delete expired entries, then the soonest to expire beyond max_entries
+
+        Returns:
+            int: Entries deleted
+        """
+        connection = self._connection()
+        try:
+            with connection:
+                connection.execute('BEGIN IMMEDIATE')
+                purged = connection.execute(_DELETE_EXPIRED, (time.time(),)).rowcount
+                excess = connection.execute('SELECT COUNT(*) FROM shared_cache').fetchone()[0] - self.max_entries
+                if excess > 0:
+                    purged += connection.execute(_DELETE_SOONEST, (excess,)).rowcount
+        except sqlite3.Error as e:
+            self._error('purge', e)
+            return 0
+        with self._lock:
+            self._stats['purged'] += purged
+        return purged
+
+    def clear(self):
+        """Remove every entry, for all processes"""
+        try:
+            self._connection().execute('DELETE FROM shared_cache')
+        except sqlite3.Error as e:
+            self._error('clear', e)
+
+    def get_stats(self):
+        """
+        Get this process's hit-rate statistics and the shared entry count
+
+        Returns:
+            dict: Hits, misses, writes, errors, purged entries, size and hit_rate
+        """
+        with self._lock:
+            stats = dict(self._stats, backend=self.name, path=self.path)
+        try:
+            stats['entries'] = self._connection().execute('SELECT COUNT(*) FROM shared_cache').fetchone()[0]
+        except sqlite3.Error as e:
+            self._error('count', e)
+            stats['entries'] = None
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+
+_BACKEND_FACTORIES = {
+    'memory': MemoryCache,
+    'sqlite': SqliteCache,
+}
+
+
+def create_shared_cache(backend_name=SHARED_CACHE_BACKEND):
+    """
+    Build a cache for a named backend
+
+    Args:
+        backend_name (str): 'sqlite', 'memory', or 'off'
+
+    Returns:
+        SharedCache: The cache, or None when disabled
+    """
+    factory = _BACKEND_FACTORIES.get(backend_name)
+    if factory is None:
+        if backend_name not in ('', 'off', 'none'):
+            logging.warning(f"Unknown shared cache backend '{backend_name}', shared cache disabled")
+        return None
+    return factory()
+
+
+_cache = create_shared_cache()
+
+
+def get_shared_cache():
+    """
+    Get the process-wide shared cache
+
+    Returns:
+        SharedCache: The configured cache, or None when disabled
+    """
+    return _cache
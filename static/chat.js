@@ -0,0 +1,153 @@
+// Hide loading screen when page is fully loaded
+window.addEventListener('load', function() {
+    setTimeout(function() {
+        const loadingScreen = document.getElementById('loadingScreen');
+        loadingScreen.classList.add('hidden');
+
+        // Remove from DOM after animation completes
+        setTimeout(function() {
+            loadingScreen.style.display = 'none';
+        }, 500);
+    }, 1000); // Show loading for at least 1 second for better UX
+});
+
+function handleKeyPress(event) {
+    if (event.key === 'Enter') {
+        sendMessage();
+    }
+}
+
+function sendQuickMessage(message) {
+    document.getElementById('messageInput').value = message;
+    sendMessage();
+}
+
+async function sendMessage() {
+    const input = document.getElementById('messageInput');
+    const message = input.value.trim();
+
+    if (!message) return;
+
+    // Add user message to chat
+    addMessage(message, 'user');
+    input.value = '';
+
+    // Show typing indicator
+    showTyping(true);
+
+    try {
+        await streamReply(message);
+    } catch (error) {
+        showTyping(false);
+        addMessage("I'm having trouble connecting right now. Please try again in a moment.", 'bot');
+    }
+}
+
+async function streamReply(message) {
+    const response = await fetch('/chat/stream', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'Accept': 'text/event-stream',
+        },
+        body: JSON.stringify({ message: message })
+    });
+
+    // Errors come back as a plain JSON reply, as do browsers without streaming fetch
+    if (!response.ok || !response.body || !response.body.getReader) {
+        const data = await response.json();
+        showTyping(false);
+        addMessage(data.response, 'bot');
+        return;
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    const chatContainer = document.getElementById('chatContainer');
+    let buffer = '';
+    let content = null;
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+
+        buffer += decoder.decode(value, { stream: true });
+
+        // Events are separated by a blank line
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const event = parseServerSentEvent(buffer.slice(0, boundary));
+            buffer = buffer.slice(boundary + 2);
+
+            if (event.type === 'chunk') {
+                // Replace the typing indicator with the reply on the first chunk
+                if (!content) {
+                    showTyping(false);
+                    content = addMessage('', 'bot').querySelector('.message-content');
+                }
+                content.appendChild(document.createTextNode(event.data.text));
+                chatContainer.scrollTop = chatContainer.scrollHeight;
+            }
+        }
+    }
+
+    if (!content) {
+        throw new Error('Stream ended without a reply');
+    }
+}
+
+function parseServerSentEvent(block) {
+    let type = 'message';
+    let data = '';
+
+    block.split('\n').forEach(function(line) {
+        if (line.startsWith('event:')) {
+            type = line.slice(6).trim();
+        } else if (line.startsWith('data:')) {
+            data += line.slice(5).trim();
+        }
+    });
+
+    return { type: type, data: data ? JSON.parse(data) : {} };
+}
+
+function addMessage(text, sender) {
+    const chatContainer = document.getElementById('chatContainer');
+    const messageDiv = document.createElement('div');
+    messageDiv.className = `message ${sender}`;
+
+    const avatar = sender === 'user' ? 
+        '<div class="message-avatar"><i class="bi bi-person-circle"></i></div>' :
+        '<div class="message-avatar"><i class="bi bi-robot"></i></div>';
+
+    const senderName = sender === 'user' ? 'You' : 'AMIGO';
+
+    messageDiv.innerHTML = `
+        ${avatar}
+        <div class="message-content">
+            <strong>${senderName}</strong><br>
+            ${text}
+        </div>
+    `;
+
+    chatContainer.appendChild(messageDiv);
+    chatContainer.scrollTop = chatContainer.scrollHeight;
+
+    return messageDiv;
+}
+
+function showTyping(show) {
+    const typingIndicator = document.getElementById('typingIndicator');
+    if (show) {
+        typingIndicator.classList.add('show');
+        typingIndicator.style.display = 'flex';
+    } else {
+        typingIndicator.classList.remove('show');
+        typingIndicator.style.display = 'none';
+    }
+
+    if (show) {
+        const chatContainer = document.getElementById('chatContainer');
+        chatContainer.scrollTop = chatContainer.scrollHeight;
+    }
+}
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Quiet, fast, unthrottled app imports for the tests
+os.environ.setdefault('AMIGO_LOG_LEVEL', 'WARNING')
+os.environ.setdefault('AMIGO_WARMUP', 'off')
+os.environ.setdefault('AMIGO_ADMISSION', 'off')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,104 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+import generative
+from context_store import CONTEXT_STORE
+from response_cache import SemanticResponseCache
+
+asgi = pytest.importorskip('asgi')
+
+
+async def post(path, payload):
+    messages = []
+    body = json.dumps(payload).encode('utf-8')
+    received = [{'type': 'http.request', 'body': body, 'more_body': False}]
+
+    async def receive():
+        return received.pop(0) if received else {'type': 'http.disconnect'}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {'type': 'http', 'method': 'POST', 'path': path, 'headers': [], 'client': ('127.0.0.1', 1)}
+    await asgi.app(scope, receive, send)
+    return messages
+
+
+def test_chat_reads_contexts_off_the_event_loop(monkeypatch):
+    threads = []
+    original = CONTEXT_STORE.get
+
+    def recording_get(session_id):
+        threads.append(threading.current_thread())
+        return original(session_id)
+
+    monkeypatch.setattr(CONTEXT_STORE, 'get', recording_get)
+
+    async def run():
+        return threading.current_thread(), await post('/chat', {'message': 'i feel sad'})
+
+    loop_thread, messages = asyncio.run(run())
+    assert messages[0]['status'] == 200
+    assert json.loads(messages[-1]['body'])['intent'] == 'express_sadness'
+    assert threads and all(thread is not loop_thread for thread in threads)
+
+
+class ThreadRecordingCache(SemanticResponseCache):
+    """Reply cache remembering the thread of every lookup and store"""
+
+    def __init__(self):
+        super().__init__()
+        self.threads = []
+
+    def get(self, message):
+        self.threads.append(threading.current_thread())
+        return super().get(message)
+
+    def put(self, message, reply):
+        self.threads.append(threading.current_thread())
+        return super().put(message, reply)
+
+
+def test_reply_cache_is_used_off_the_event_loop():
+    cache = ThreadRecordingCache()
+    previous = generative.get_client()
+    generative.set_client(generative.GenerativeClient(generative.StubBackend(), cache=cache))
+
+    async def run():
+        loop_thread = threading.current_thread()
+        for _ in range(2):  # generated and stored, then answered from the cache
+            messages = await post('/chat', {'message': 'purple elephants on mars'})
+            assert messages[0]['status'] == 200
+        return loop_thread
+
+    try:
+        loop_thread = asyncio.run(run())
+    finally:
+        generative.set_client(previous)
+    assert cache.get_stats()['exact_hits'] == 1
+    assert len(cache.threads) == 3
+    assert all(thread is not loop_thread for thread in cache.threads)
+
+
+def test_stream_sends_generated_reply_in_pieces_off_the_event_loop():
+    cache = ThreadRecordingCache()
+    previous = generative.get_client()
+    generative.set_client(generative.GenerativeClient(generative.StubBackend(), cache=cache))
+
+    async def run():
+        return threading.current_thread(), await post('/chat/stream', {'message': 'purple elephants on mars'})
+
+    try:
+        loop_thread, messages = asyncio.run(run())
+    finally:
+        generative.set_client(previous)
+    assert messages[0]['status'] == 200
+    events = [message['body'].decode('utf-8') for message in messages[1:] if message['body']]
+    chunks = [json.loads(event.split('data: ', 1)[1])['text'] for event in events if event.startswith('event: chunk')]
+    assert len(chunks) > 3
+    assert ''.join(chunks) in generative.StubBackend.REPLIES
+    assert len(cache.threads) == 2
+    assert all(thread is not loop_thread for thread in cache.threads)
@@ -0,0 +1,104 @@
+import hashlib
+import io
+import json
+import os
+
+import pytest
+
+import build_assets
+
+fontTools = pytest.importorskip('fontTools')
+from fontTools.fontBuilder import FontBuilder  # noqa: E402
+from fontTools.pens.ttGlyphPen import TTGlyphPen  # noqa: E402
+from fontTools.ttLib import TTFont  # noqa: E402
+
+THEME_URL = 'https://cdn.example.com/theme.css'
+ICONS_URL = 'https://cdn.example.com/icons/font/bootstrap-icons.css'
+FONT_URL = 'https://cdn.example.com/icons/font/fonts/bootstrap-icons.woff'
+
+ICONS_CSS = (
+    '@font-face{font-family:"bootstrap-icons";src:url("./fonts/bootstrap-icons.woff?abc") format("woff")}'
+    '.bi::before{font-family:bootstrap-icons!important}'
+    '.bi-used::before{content:"\\f101"}'
+    '.bi-unused::before{content:"\\f102"}'
+)
+
+
+def make_icon_font(codepoints):
+    """A woff font with one square glyph per code point"""
+    names = ['.notdef'] + [f"icon{codepoint:x}" for codepoint in codepoints]
+    builder = FontBuilder(1000, isTTF=True)
+    builder.setupGlyphOrder(names)
+    builder.setupCharacterMap({codepoint: name for codepoint, name in zip(codepoints, names[1:])})
+    glyphs = {}
+    for name in names:
+        pen = TTGlyphPen(None)
+        pen.moveTo((0, 0))
+        pen.lineTo((0, 500))
+        pen.lineTo((500, 500))
+        pen.closePath()
+        glyphs[name] = pen.glyph()
+    builder.setupGlyf(glyphs)
+    builder.setupHorizontalMetrics({name: (500, 0) for name in names})
+    builder.setupHorizontalHeader(ascent=800, descent=-200)
+    builder.setupNameTable({'familyName': 'bootstrap-icons', 'styleName': 'Regular'})
+    builder.setupOS2()
+    builder.setupPost()
+    builder.font.flavor = 'woff'
+    output = io.BytesIO()
+    builder.font.save(output)
+    return output.getvalue()
+
+
+@pytest.fixture
+def vendor(tmp_path, monkeypatch):
+    vendor_dir = tmp_path / 'vendor'
+    templates = tmp_path / 'templates'
+    templates.mkdir()
+    (templates / 'index.html').write_text('<i class="bi bi-used"></i>')
+    monkeypatch.setattr(build_assets, 'VENDOR_DIR', str(vendor_dir))
+    monkeypatch.setattr(build_assets, 'VENDOR_CHECKSUMS', str(vendor_dir / 'checksums.json'))
+    monkeypatch.setattr(build_assets, 'VENDOR_STYLESHEETS', (THEME_URL, ICONS_URL))
+    monkeypatch.setattr(build_assets, 'TEMPLATE_DIR', str(templates))
+    monkeypatch.setattr(build_assets, 'DIST_DIR', str(tmp_path / 'dist'))
+
+    files = {
+        THEME_URL: b'body{color:#fff}',
+        ICONS_URL: ICONS_CSS.encode('utf-8'),
+        FONT_URL: make_icon_font([0xf101, 0xf102, 0xf103]),
+    }
+    for url, content in files.items():
+        path = build_assets.vendor_path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as vendored:
+            vendored.write(content)
+    checksums = {url: hashlib.sha256(content).hexdigest() for url, content in files.items()}
+    build_assets.save_checksums(checksums, build_assets.VENDOR_CHECKSUMS)
+    return tmp_path
+
+
+def test_build_uses_pinned_files_and_subsets_icon_fonts(vendor):
+    manifest = build_assets.build()
+    css = (vendor / 'dist' / manifest['stylesheets'][0]).read_text()
+    assert 'bi-unused' not in css
+    font_name = next(name for name in manifest['files'] if name.endswith('.woff'))
+    assert f'url("{font_name}")' in css
+    font = TTFont(str(vendor / 'dist' / font_name))
+    assert set(font.getBestCmap()) == {0xf101}
+
+
+def test_build_refuses_a_changed_vendor_file(vendor):
+    with open(build_assets.vendor_path(THEME_URL), 'ab') as vendored:
+        vendored.write(b'body{color:red}')
+    with pytest.raises(ValueError, match='pinned checksum'):
+        build_assets.build()
+
+
+def test_build_refuses_an_unpinned_vendor_file(vendor):
+    checksums = json.loads((vendor / 'vendor' / 'checksums.json').read_text())
+    del checksums[FONT_URL]
+    build_assets.save_checksums(checksums, build_assets.VENDOR_CHECKSUMS)
+    with pytest.raises(ValueError, match='not pinned'):
+        build_assets.build()
+    build_assets.build(update_checksums=True)
+    assert FONT_URL in build_assets.load_checksums(build_assets.VENDOR_CHECKSUMS)
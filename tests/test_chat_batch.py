@@ -0,0 +1,44 @@
+import time
+
+import pytest
+
+import app as app_module
+from app import app
+
+
+@pytest.fixture
+def client():
+    return app.test_client()
+
+
+@pytest.mark.parametrize('body', ['["i feel sad"]', '"i feel sad"', '42', 'null'])
+def test_non_object_body_is_rejected(client, body):
+    response = client.post('/chat/batch', data=body, content_type='application/json')
+    assert response.status_code == 400
+    assert set(response.get_json()) == {'error'}
+
+
+def test_missing_messages_is_rejected(client):
+    response = client.post('/chat/batch', json={'session_id': 'x'})
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_batch_classifies_in_order(client):
+    response = client.post('/chat/batch', json={'messages': ['i feel sad', 'hello', '']})
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert [result.get('intent') for result in results] == ['express_sadness', 'greeting', None]
+    assert 'error' in results[2]
+
+
+def test_item_timings_include_a_share_of_batch_detection(monkeypatch):
+    detect = app_module.detect_intents_from_messages
+
+    def slow_detect(messages):
+        time.sleep(0.04)
+        return detect(messages)
+
+    monkeypatch.setattr(app_module, 'detect_intents_from_messages', slow_detect)
+    results = app_module.classify_messages(['i feel sad', 'hello'])
+    assert all(result['elapsed_ms'] >= 20 for result in results)
@@ -0,0 +1,72 @@
+import database
+from context_store import CONTEXT_EVENTS, ContextStore
+from session_store import SessionStore
+
+CONTEXT = {'name': 'projects/p/agent/sessions/s/contexts/followup', 'lifespanCount': 2}
+
+
+def counts():
+    return {labels[0]: value for labels, value in CONTEXT_EVENTS.snapshot()}
+
+
+def test_contexts_carry_over_and_expire_by_lifespan():
+    store = ContextStore(max_sessions=4)
+    store.advance('s', [], [CONTEXT])
+    assert store.get('s') == [CONTEXT]
+    store.advance('s', [CONTEXT], [])
+    assert store.get('s') == [dict(CONTEXT, lifespanCount=1)]
+    store.advance('s', [dict(CONTEXT, lifespanCount=1)], [])
+    assert store.get('s') == []
+
+
+def test_events_are_exported_as_metrics():
+    before = counts()
+    store = ContextStore(max_sessions=1)
+    store.get('a')
+    store.advance('a', [], [CONTEXT])
+    store.get('a')
+    store.advance('b', [], [CONTEXT])
+    after = counts()
+    for event in ('misses', 'hits', 'evictions'):
+        assert after[event] == before.get(event, 0) + 1
+    assert store.get_stats()['evictions'] == 1
+
+
+def make_host(engine):
+    """A context store backed by its own session store, as on a separate host"""
+    return ContextStore(sessions=SessionStore(engine=engine))
+
+
+def test_session_store_shares_contexts_between_hosts(tmp_path):
+    engine = database.create_database_engine(f"sqlite:///{tmp_path / 'sessions.db'}")
+    database.METADATA.create_all(engine)
+    host_a, host_b = make_host(engine), make_host(engine)
+
+    assert host_a.get('s') == []
+    host_a.advance('s', [], [CONTEXT])
+    assert host_b.get('s') == [CONTEXT]
+
+
+def test_stale_cached_contexts_do_not_overwrite_another_host(tmp_path):
+    engine = database.create_database_engine(f"sqlite:///{tmp_path / 'sessions.db'}")
+    database.METADATA.create_all(engine)
+    host_a, host_b = make_host(engine), make_host(engine)
+    other = {'name': 'projects/p/agent/sessions/s/contexts/other', 'lifespanCount': 3}
+
+    host_a.advance('s', [], [CONTEXT])
+    assert host_a.get('s') == [CONTEXT]  # host_a now holds a cached copy
+    host_b.advance('s', host_b.get('s'), [other])
+    host_a.advance('s', [CONTEXT], [])  # applied on top of host_b's turn, not host_a's cached copy
+
+    assert host_b.sessions.load('s', use_cache=False)[0]['contexts'] == [
+        dict(other, lifespanCount=2)
+    ]
+    assert host_a.sessions.get_stats()['conflicts'] == 1
+
+
+def test_expired_contexts_are_not_returned(tmp_path):
+    engine = database.create_database_engine(f"sqlite:///{tmp_path / 'sessions.db'}")
+    database.METADATA.create_all(engine)
+    store = ContextStore(ttl=-1, sessions=SessionStore(engine=engine))
+    store.advance('s', [], [CONTEXT])
+    assert store.get('s') == []
@@ -0,0 +1,80 @@
+import pytest
+
+from fuzzy_index import SymmetricDeleteIndex
+from intent_detection import INTENT_RULES, build_fuzzy_index, fuzzy_vocabulary, load_dictionary_words
+
+pytest.importorskip('spellchecker')
+
+# Real words one or two edits from a keyword, which must be left alone
+REAL_WORDS = [
+    'imitated',    # irritated
+    'position',    # positive
+    'encouraged',  # encourage
+    'encourages',
+    'mourning',    # morning
+    'prevent',     # present
+    'president',
+    'feeding',     # feeling
+]
+
+# Misspellings and the keywords they were meant to be
+TYPOS = [
+    ('anxous', 'anxious'),
+    ('anxiuos', 'anxious'),
+    ('depresed', 'depressed'),
+    ('stresed', 'stressed'),
+    ('breathign', 'breathing'),
+    ('poistive', 'positive'),
+    ('afteronon', 'afternoon'),
+    ('paniced', 'panicked'),
+]
+
+# Misspellings of long keywords, which may need two or three edits
+LONG_TYPOS = [
+    ('heartbroekn', 'heartbroken'),
+    ('overwhelmd', 'overwhelmed'),
+    ('overwhlemed', 'overwhelmed'),
+    ('motivatoinal', 'motivational'),
+    ('afirmations', 'affirmations'),
+    ('affirmatoins', 'affirmations'),
+    ('encouragemnet', 'encouragement'),
+]
+
+
+@pytest.fixture(scope='module')
+def index():
+    return build_fuzzy_index(INTENT_RULES, cache_size=0)
+
+
+@pytest.mark.parametrize('word', REAL_WORDS)
+def test_real_words_are_not_corrected(index, word):
+    assert index.correct(word) is None
+    assert index.correct_tokens([word]) == [word]
+
+
+@pytest.mark.parametrize('typo, word', TYPOS)
+def test_typos_are_corrected(index, typo, word):
+    assert index.correct(typo) == word
+
+
+@pytest.mark.parametrize('typo, word', LONG_TYPOS)
+def test_long_keyword_typos_are_corrected(index, typo, word):
+    assert index.correct(typo) == word
+
+
+def test_dictionary_keeps_only_reachable_words():
+    vocabulary = fuzzy_vocabulary(INTENT_RULES)
+    words = load_dictionary_words(vocabulary)
+    assert {'imitated', 'mourning', 'encouraged'} <= words
+    assert not set(vocabulary) & words
+    assert 'zebra' not in words
+    assert not {typo for typo, _ in TYPOS + LONG_TYPOS} & words
+
+
+def test_edit_distance_scales_with_length():
+    index = SymmetricDeleteIndex(['anxious'], edit_lengths=(5, 8, 14))
+    assert [index.max_edits(length) for length in (4, 5, 7, 8, 13, 14)] == [0, 1, 1, 2, 2, 3]
+    assert index.max_length == len('anxious') + 3
+    assert index.correct('anxiuos') == 'anxious'
+    assert index.correct('anxoius') == 'anxious'
+    assert index.correct('anxiuso') is None
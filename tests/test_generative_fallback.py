@@ -0,0 +1,130 @@
+import json
+import threading
+
+import pytest
+
+import generative
+from app import app, classify_messages
+from intent_handlers import handle_intent
+from responses import CATALOG
+
+
+class RecordingBackend(generative.StubBackend):
+    """Stub backend remembering every message it was asked to complete"""
+
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def complete(self, message, timeout):
+        self.messages.append(message)
+        return super().complete(message, timeout)
+
+    def stream(self, message, timeout):
+        self.messages.append(message)
+        return super().stream(message, timeout)
+
+
+class GatedBackend(generative.StubBackend):
+    """Stub backend that streams its first word, then waits for the gate before the rest"""
+
+    def __init__(self):
+        super().__init__()
+        self.gate = threading.Event()
+
+    def stream(self, message, timeout):
+        pieces = super().stream(message, timeout)
+        yield next(pieces)
+        self.gate.wait(5)
+        yield from pieces
+
+
+@pytest.fixture
+def backend():
+    recording = RecordingBackend()
+    previous = generative.get_client()
+    generative.set_client(generative.GenerativeClient(recording))
+    yield recording
+    generative.set_client(previous)
+
+
+def test_fallback_generates_by_default(backend):
+    response = handle_intent('Default Fallback Intent', {}, 'purple elephants on mars', 'test', [])
+    assert backend.messages == ['purple elephants on mars']
+    assert response['text'] in generative.StubBackend.REPLIES
+
+
+def test_batch_uses_canned_fallback(backend):
+    results = classify_messages(['purple elephants on mars', 'zebra crossings everywhere'])
+    assert backend.messages == []
+    assert all(result['response'] in CATALOG.lookup('variants', 'fallback') for result in results)
+
+
+def test_bulk_replay_uses_canned_fallback(backend):
+    payload = {
+        'session': 'projects/p/agent/sessions/bulk',
+        'queryResult': {'queryText': 'purple elephants on mars', 'intent': {'displayName': 'Default Fallback Intent'}},
+    }
+    response = app.test_client().post('/webhook/bulk', data=json.dumps(payload) + '\n')
+    assert response.status_code == 200
+    assert backend.messages == []
+    fulfillment = json.loads(response.get_data(as_text=True).splitlines()[0])
+    assert fulfillment['fulfillmentText'] in CATALOG.lookup('variants', 'fallback')
+
+
+def test_outcomes_are_exported_as_metrics(backend):
+    def generated():
+        return dict((tuple(labels), value) for labels, value in generative.GENERATIVE_CALLS.snapshot()).get(
+            ('stub', 'generated'), 0)
+
+    before = generated()
+    handle_intent('Default Fallback Intent', {}, 'purple elephants on mars', 'test', [])
+    assert generated() == before + 1
+    assert 'amigo_generative_calls_total{backend="stub",outcome="generated"}' in generative.REGISTRY.render()
+
+
+def read_events(response):
+    events = []
+    for block in response.get_data(as_text=True).strip().split('\n\n'):
+        event, data = block.split('\n')
+        events.append((event[len('event: '):], json.loads(data[len('data: '):])))
+    return events
+
+
+def test_stream_sends_generated_reply_as_it_is_produced(backend):
+    response = app.test_client().post('/chat/stream', json={'message': 'purple elephants on mars'})
+    events = read_events(response)
+    chunks = [data['text'] for event, data in events if event == 'chunk']
+    assert backend.messages == ['purple elephants on mars']
+    assert len(chunks) > 3
+    assert ''.join(chunks) in generative.StubBackend.REPLIES
+    assert events[-1] == ('done', {'response': ''.join(chunks), 'intent': 'fallback'})
+
+
+def test_stream_yields_pieces_before_the_backend_finishes():
+    backend = GatedBackend()
+    client = generative.GenerativeClient(backend, timeout=5)
+    pieces = client.stream('purple elephants on mars')
+    first = next(pieces)
+    assert not backend.gate.is_set()
+    backend.gate.set()
+    reply = first + ''.join(pieces)
+    assert reply in generative.StubBackend.REPLIES
+    assert client.get_stats()['generated'] == 1
+
+
+def test_stream_uses_canned_reply_when_the_deadline_is_missed():
+    backend = GatedBackend()
+    previous = generative.get_client()
+    generative.set_client(generative.GenerativeClient(backend, timeout=0.05))
+    try:
+        # The first word arrives, the rest misses the deadline: the partial reply stands
+        partial = handle_intent('fallback', {}, 'purple elephants on mars', 'test', [], stream=True)
+        assert len(list(partial['text_stream'])) == 1
+
+        backend.gate.set()
+        generative.set_client(generative.GenerativeClient(generative.StubBackend(latency_ms=200), timeout=0.01))
+        canned = handle_intent('fallback', {}, 'purple elephants on mars', 'test', [], stream=True)
+        assert list(canned['text_stream'])[0] in CATALOG.lookup('variants', 'fallback')
+    finally:
+        generative.set_client(previous)
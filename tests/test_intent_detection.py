@@ -0,0 +1,89 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from intent_detection import detect_intent_keyword, inflection_stem, normalize_message, tokenize
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_unknown_engine_falls_back_to_keyword_at_import():
+    script = (
+        "import intent_detection as d; "
+        "print(d.INTENT_ENGINE, d.detect_intent_from_message('i feel sad'))"
+    )
+    env = dict(os.environ, AMIGO_INTENT_ENGINE='bogus')
+    result = subprocess.run([sys.executable, '-c', script], cwd=ROOT, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split() == ['keyword', 'express_sadness']
+    assert "Unknown intent engine 'bogus'" in result.stderr
+
+
+# Keywords the original substring detector found inside an unrelated word
+# ("hey" in "they"); whole-word matching drops these on purpose
+EMBEDDED_KEYWORD_WORDS = frozenset(['they'])
+
+# Inflected keywords the substring detector matched through a shorter keyword
+# ("sad" in "sadly")
+INFLECTED_WORDS = [
+    'sadly', 'sadness', 'upsetting', 'crying', 'panicking', 'stressing', 'stresses', 'madly',
+    'affirmations', 'motivational', 'breathes',
+]
+
+
+def legacy_detector():
+    sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+    from legacy_detectors import detect_intent_substring_cascade
+    return detect_intent_substring_cascade
+
+
+def load_messages(name):
+    with open(os.path.join(ROOT, 'benchmarks', 'data', name), encoding='utf-8') as source:
+        return [json.loads(line)['message'] for line in source if line.strip()]
+
+
+@pytest.mark.parametrize('word', INFLECTED_WORDS)
+def test_inflections_match_like_the_substring_detector(word):
+    message = f'lately i keep {word} about everything'
+    assert detect_intent_keyword(message) == legacy_detector()(message) != 'fallback'
+
+
+@pytest.mark.parametrize('message, intent', [
+    ('this week was depressing', 'express_sadness'),
+    ('i keep worrying', 'express_anxiety'),
+    ('work is overwhelming', 'express_anxiety'),
+    ('she worries a lot and so do i', 'express_anxiety'),
+    ('i am grieving my dad', 'express_sadness'),
+    ('it was angrily said', 'express_anger'),
+    ('i cried all night', 'express_sadness'),
+])
+def test_inflections_of_single_keywords_match(message, intent):
+    assert detect_intent_keyword(message) == intent
+
+
+@pytest.mark.parametrize('message', ['i made dinner', 'stand by me', 'being here', 'they said hi'])
+def test_uninflected_lookalikes_do_not_match(message):
+    assert detect_intent_keyword(message) == 'fallback'
+
+
+def test_substring_detector_hits_are_kept():
+    legacy = legacy_detector()
+    messages = load_messages('intent_corpus.jsonl') + load_messages('intent_samples.jsonl')
+    lost = [
+        message for message in messages
+        if legacy(message) != 'fallback' and detect_intent_keyword(message) != legacy(message)
+        and not EMBEDDED_KEYWORD_WORDS & set(tokenize(normalize_message(message)))
+    ]
+    assert lost == []
+
+
+def test_inflection_stem():
+    assert inflection_stem('worrying') == inflection_stem('worried') == ('worry', True)
+    assert inflection_stem('upsetting') == ('upset', True)
+    assert inflection_stem('grieve') == ('griev', False)
+    assert inflection_stem('stress') == ('stress', False)
+    assert inflection_stem('anxious') == ('anxious', False)
+    assert inflection_stem('being') == ('being', False)
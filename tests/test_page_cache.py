@@ -0,0 +1,20 @@
+import pytest
+
+import page_cache
+
+
+def test_built_assets_are_linked_from_dist():
+    urls = page_cache.page_asset_urls({'stylesheets': ['amigo.1.css'], 'scripts': ['amigo.2.js']})
+    assert urls == {'stylesheets': ['/static/dist/amigo.1.css'], 'scripts': ['/static/dist/amigo.2.js']}
+
+
+def test_missing_build_falls_back_to_cdn_in_development(monkeypatch):
+    monkeypatch.setattr(page_cache, 'REQUIRE_BUILT_ASSETS', False)
+    urls = page_cache.page_asset_urls(None)
+    assert urls['stylesheets'][:-1] == list(page_cache.VENDOR_STYLESHEETS)
+
+
+def test_missing_build_fails_when_required(monkeypatch):
+    monkeypatch.setattr(page_cache, 'REQUIRE_BUILT_ASSETS', True)
+    with pytest.raises(RuntimeError, match='build_assets.py'):
+        page_cache.page_asset_urls(None)
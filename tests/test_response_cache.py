@@ -0,0 +1,97 @@
+import pytest
+
+from response_cache import (
+    FILLER_WORDS, NEGATION_WORDS, RESPONSE_CACHE_EVENTS, SemanticResponseCache, cache_tokens, negation_key
+)
+
+REPLY = "cached reply"
+
+# (stored message, later message) pairs that must never share a reply
+NEGATED_PAIRS = [
+    ("i'm not feeling hopeless anymore", "feeling hopeless anymore"),
+    ("feeling hopeless anymore", "i'm not feeling hopeless anymore"),
+    ("i'm not feeling anxious", "i'm feeling anxious"),
+    ("i'm feeling anxious", "i'm not feeling anxious"),
+    ("i never sleep well", "i sleep well"),
+]
+
+# Messages about self-harm or suicide, including the negated forms
+CRISIS_MESSAGES = [
+    "i don't want to hurt myself anymore",
+    "i want to hurt myself anymore",
+    "I want to kill myself",
+    "i dont want to kill myself",
+    "i just want to end it all",
+    "i have no reason to live",
+]
+
+
+def test_negations_are_not_filler():
+    assert not FILLER_WORDS & NEGATION_WORDS
+    assert not FILLER_WORDS & {"not", "don't", "no", "never", "anymore"}
+
+
+def test_negation_key_ignores_apostrophes():
+    assert negation_key(cache_tokens("i don't care")) == negation_key(cache_tokens("i dont care")) == 'dont'
+    assert negation_key(cache_tokens("i care")) == ''
+
+
+@pytest.mark.parametrize('stored, asked', NEGATED_PAIRS)
+def test_reply_is_not_reused_across_negations(stored, asked):
+    cache = SemanticResponseCache(max_entries=8, threshold=0.5)
+    cache.put(stored, REPLY)
+    assert cache.get(stored) == REPLY
+    assert cache.get(asked) is None
+
+
+def test_reply_is_reused_with_the_same_negations():
+    cache = SemanticResponseCache(max_entries=8)
+    cache.put("i'm not feeling hopeless anymore", REPLY)
+    assert cache.get("i'm really not feeling so hopeless anymore") == REPLY
+
+
+@pytest.mark.parametrize('message', CRISIS_MESSAGES)
+def test_crisis_messages_are_never_stored(message):
+    cache = SemanticResponseCache(max_entries=8)
+    assert cache.put(message, REPLY) == REPLY
+    assert cache.get_stats()['size'] == 0
+    assert cache.get(message) is None
+
+
+@pytest.mark.parametrize('stored, asked', [
+    ("i don't want to hurt myself anymore", "i want to hurt myself anymore"),
+    ("i want to hurt myself anymore", "i don't want to hurt myself anymore"),
+    ("I want to kill myself", "i dont want to kill myself"),
+    ("i dont want to kill myself", "I want to kill myself"),
+])
+def test_crisis_pairs_never_share_a_reply(stored, asked):
+    cache = SemanticResponseCache(max_entries=8, threshold=0.0)
+    cache.put(stored, REPLY)
+    assert cache.get(asked) is None
+    assert cache.get_stats()['bypassed'] == 1
+
+
+def test_crisis_messages_bypass_the_shared_cache():
+    from shared_cache import MemoryCache
+
+    shared = MemoryCache()
+    cache = SemanticResponseCache(max_entries=8, shared=shared)
+    cache.put("I want to kill myself", REPLY)
+    cache.put("feeling hopeless", REPLY)
+    assert SemanticResponseCache(max_entries=8, shared=shared).get("I want to kill myself") is None
+    assert SemanticResponseCache(max_entries=8, shared=shared).get("feeling hopeless") == REPLY
+
+
+def test_lookups_are_exported_as_metrics():
+    def counts():
+        return {labels[0]: value for labels, value in RESPONSE_CACHE_EVENTS.snapshot()}
+
+    before = counts()
+    cache = SemanticResponseCache(max_entries=8)
+    cache.get("feeling hopeless")
+    cache.put("feeling hopeless", REPLY)
+    cache.get("feeling hopeless")
+    cache.get("I want to kill myself")
+    after = counts()
+    for event in ('misses', 'exact_hits', 'bypassed'):
+        assert after[event] == before.get(event, 0) + 1
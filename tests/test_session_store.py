@@ -0,0 +1,45 @@
+import os
+
+import database
+from session_store import SESSION_EVENTS, SESSION_TURNS, SessionStore, SessionTurnWriter
+
+
+def make_store(tmp_path):
+    engine = database.create_database_engine(f"sqlite:///{tmp_path / 'sessions.db'}")
+    database.METADATA.create_all(engine)
+    return SessionStore(engine=engine)
+
+
+def test_queued_turns_are_recorded_on_close(tmp_path):
+    store = make_store(tmp_path)
+    writer = SessionTurnWriter(store)
+    for intent in ('greeting', 'express_sadness', 'breathing_exercise'):
+        assert writer.append('session-1', intent)
+    assert writer.append('session-2', 'greeting')
+    writer.close()
+
+    state, version = store.load('session-1', use_cache=False)
+    assert state['turns'] == 3
+    assert state['last_intent'] == 'breathing_exercise'
+    assert store.load('session-2', use_cache=False)[0]['turns'] == 1
+    assert writer.get_stats()['recorded'] == 4
+
+
+def test_full_queue_drops_turns(tmp_path):
+    writer = SessionTurnWriter(make_store(tmp_path), queue_size=1)
+    writer._thread_pid = os.getpid()  # no writer thread, so nothing drains the queue
+    assert writer.append('session-1', 'greeting')
+    assert not writer.append('session-1', 'greeting')
+    assert writer.get_stats()['dropped'] == 1
+
+
+def test_writes_are_exported_as_metrics(tmp_path):
+    def counts(counter):
+        return {labels[0]: value for labels, value in counter.snapshot()}
+
+    events_before, turns_before = counts(SESSION_EVENTS), counts(SESSION_TURNS)
+    writer = SessionTurnWriter(make_store(tmp_path))
+    writer.append('session-1', 'greeting')
+    writer.close()
+    assert counts(SESSION_EVENTS)['writes'] == events_before.get('writes', 0) + 1
+    assert counts(SESSION_TURNS)['recorded'] == turns_before.get('recorded', 0) + 1
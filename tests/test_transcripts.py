@@ -0,0 +1,85 @@
+import os
+
+import database
+import transcripts
+from transcripts import TRANSCRIPT_BATCHES, TRANSCRIPT_TURNS, TRANSCRIPTS_TABLE, TranscriptSpill, TranscriptWriter
+
+
+def counts(counter):
+    return {tuple(labels): value for labels, value in counter.snapshot()}
+
+
+def test_turns_are_written_and_exported_as_metrics(tmp_path):
+    engine = database.create_database_engine(f"sqlite:///{tmp_path / 'transcripts.db'}")
+    database.METADATA.create_all(engine)
+    turns_before, batches_before = counts(TRANSCRIPT_TURNS), counts(TRANSCRIPT_BATCHES)
+
+    writer = TranscriptWriter(engine=engine, flush_seconds=0.01)
+    for number in range(3):
+        writer.append({'created_at': 0.0, 'channel': 'chat', 'session_id': 's', 'intent': 'greeting',
+                       'message': f"hello {number}", 'response': 'hi', 'latency_ms': 1.0})
+    writer.close()
+
+    with engine.connect() as connection:
+        assert len(connection.execute(TRANSCRIPTS_TABLE.select()).fetchall()) == 3
+    turns = counts(TRANSCRIPT_TURNS)
+    assert turns[('queued',)] == turns_before.get(('queued',), 0) + 3
+    assert turns[('written',)] == turns_before.get(('written',), 0) + 3
+    assert counts(TRANSCRIPT_BATCHES)[()] > batches_before.get((), 0)
+
+
+def make_row(number):
+    return {'created_at': 0.0, 'channel': 'chat', 'session_id': 's', 'intent': 'greeting',
+            'message': f"hello {number}", 'response': 'hi', 'latency_ms': 1.0}
+
+
+def stored_messages(engine):
+    with engine.connect() as connection:
+        return sorted(row.message for row in connection.execute(TRANSCRIPTS_TABLE.select()))
+
+
+def test_full_queue_spills_and_next_start_replays(tmp_path):
+    engine = database.create_database_engine(f"sqlite:///{tmp_path / 'transcripts.db'}")
+    database.METADATA.create_all(engine)
+    spill = TranscriptSpill(str(tmp_path / 'spill'))
+
+    writer = TranscriptWriter(engine=engine, queue_size=1, put_timeout=0, spill=spill)
+    writer._thread_pid = os.getpid()  # no flusher thread, so nothing drains the queue
+    assert writer.append(make_row(0))
+    assert not writer.append(make_row(1))
+    assert writer.get_stats()['spilled'] == 1
+    assert stored_messages(engine) == []
+
+    restarted = TranscriptWriter(engine=engine, flush_seconds=0.01, spill=spill)
+    restarted.start()
+    restarted.close()
+    assert stored_messages(engine) == ['hello 1']
+    assert restarted.get_stats()['replayed'] == 1
+    assert os.listdir(tmp_path / 'spill') == []
+
+
+def test_failing_batch_is_spilled_not_dropped(tmp_path, monkeypatch):
+    monkeypatch.setattr(transcripts.time, 'sleep', lambda seconds: None)
+    engine = database.create_database_engine(f"sqlite:///{tmp_path / 'transcripts.db'}")
+    spill = TranscriptSpill(str(tmp_path / 'spill'))
+
+    writer = TranscriptWriter(engine=engine, flush_seconds=0.01, spill=spill)
+    writer.append(make_row(0))
+    writer.close()  # no table yet, so every insert attempt fails
+    assert writer.get_stats()['spilled'] == 1
+    assert writer.get_stats()['failed'] == 0
+
+    database.METADATA.create_all(engine)
+    assert spill.replay(engine) == 1
+    assert stored_messages(engine) == ['hello 0']
+
+
+def test_replay_keeps_a_file_that_cannot_be_written(tmp_path):
+    engine = database.create_database_engine(f"sqlite:///{tmp_path / 'transcripts.db'}")
+    spill = TranscriptSpill(str(tmp_path / 'spill'))
+    spill.append([make_row(0), make_row(1)])
+
+    assert spill.replay(engine) == 0  # no table
+    database.METADATA.create_all(engine)
+    assert spill.replay(engine) == 2
+    assert stored_messages(engine) == ['hello 0', 'hello 1']
@@ -0,0 +1,141 @@
+"""
+Cheap local text vectors shared by the response cache and the intent classifier
+Text is reduced to stemmed word tokens and embedded as hashed word, word-pair
+and character n-gram counts, so no vocabulary or model file is needed.
+"""
+
+import zlib
+
+import numpy as np
+
+from intent_detection import normalize_message, tokenize
+
+# Inflection endings stripped so "worrying" and "worried" share a stem
+_SUFFIXES = ('ing', 'ied', 'ed', 'ly', 'es', 's')
+
+
+def stem(word):
+    """
+    Strip one common inflection ending from a word
+
+    Args:
+        word (str): Lowercase word token
+
+    Returns:
+        str: The word without its ending, if at least three letters remain
+    """
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+def stemmed_text(message, drop_words=frozenset()):
+    """
+    Reduce a message to space-separated word stems
+
+    Args:
+        message (str): Raw user message
+        drop_words (frozenset): Tokens to leave out before stemming
+
+    Returns:
+        str: Normalized text accepted by HashedNgramVectorizer
+    """
+    return ' '.join(stem(token) for token in tokenize(normalize_message(message)) if token not in drop_words)
+
+
+class HashedNgramVectorizer:
+    """
+    Embeds text as hashed word, word-pair and character n-gram counts
+
+    Hashing uses crc32, so vectors are identical across processes and restarts.
+    """
+
+    def __init__(self, dimensions=512, char_ngram=3):
+        self.dimensions = dimensions
+        self.char_ngram = char_ngram
+
+    def features(self, normalized):
+        """
+        List the n-gram features of normalized text
+
+        Args:
+            normalized (str): Output of stemmed_text()
+
+        Returns:
+            list: Feature strings (words, word pairs and padded character n-grams)
+        """
+        words = normalized.split()
+        features = [f"w:{word}" for word in words]
+        features.extend(f"b:{first} {second}" for first, second in zip(words, words[1:]))
+        size = self.char_ngram
+        for word in words:
+            padded = f"<{word}>"
+            features.extend(f"c:{padded[i:i + size]}" for i in range(len(padded) - size + 1))
+        return features
+
+    def buckets(self, normalized):
+        """
+        Hash the features of normalized text to vector positions
+
+        Args:
+            normalized (str): Output of stemmed_text()
+
+        Returns:
+            list: One column index per feature occurrence
+        """
+        dimensions = self.dimensions
+        return [zlib.crc32(feature.encode('utf-8')) % dimensions for feature in self.features(normalized)]
+
+    def count_matrix(self, texts):
+        """
+        Build raw feature counts for many texts at once
+
+        Args:
+            texts (list): Normalized texts
+
+        Returns:
+            numpy.ndarray: float32 matrix of shape (len(texts), dimensions)
+        """
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        rows = []
+        columns = []
+        for row, text in enumerate(texts):
+            buckets = self.buckets(text)
+            rows.extend([row] * len(buckets))
+            columns.extend(buckets)
+        if columns:
+            np.add.at(matrix, (np.asarray(rows, dtype=np.intp), np.asarray(columns, dtype=np.intp)), 1.0)
+        return matrix
+
+    def embed(self, normalized):
+        """
+        Embed normalized text as a unit vector
+
+        Args:
+            normalized (str): Output of stemmed_text()
+
+        Returns:
+            numpy.ndarray: float32 unit vector, all zeros for empty text
+        """
+        vector = self.count_matrix([normalized])[0]
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        return vector
+
+
+def normalize_rows(matrix):
+    """
+    Scale every non-zero row of a matrix to unit length, in place
+
+    Args:
+        matrix (numpy.ndarray): 2-D float matrix
+
+    Returns:
+        numpy.ndarray: The same matrix
+    """
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
@@ -0,0 +1,452 @@
+"""
+Write-behind persistence of chat and webhook turns for clinical review
+Request handlers only append to a bounded in-memory queue; a background
+thread writes the queued turns to the chat_transcripts table in multi-row
+batches, whenever a batch fills up or the flush interval passes. Turns the
+database cannot take in time (a full queue, a batch that keeps failing, a
+queue left over at shutdown) are appended to a local spill file instead,
+and spill files are written to the table when the next process starts.
+Configured through environment variables:
+
+    AMIGO_TRANSCRIPTS               on (default when DATABASE_URL is set) or off
+    AMIGO_TRANSCRIPT_QUEUE_SIZE     turns buffered in memory (default 10000)
+    AMIGO_TRANSCRIPT_BATCH_SIZE     rows per INSERT (default 500)
+    AMIGO_TRANSCRIPT_FLUSH_SECONDS  longest a turn waits before being written (default 1)
+    AMIGO_TRANSCRIPT_PUT_TIMEOUT    seconds a request may wait for queue space
+                                    before its turn is spilled (default 0.05)
+    AMIGO_TRANSCRIPT_SPILL_DIR      directory of the spill files (default
+                                    <tmp>/amigo-transcripts; use persistent storage)
+"""
+
+import atexit
+import fcntl
+import json
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+
+from sqlalchemy import Column, Float, Index, Integer, String, Table, Text, insert
+
+import database
+from metrics import REGISTRY
+
+TRANSCRIPTS_ENABLED = os.environ.get("AMIGO_TRANSCRIPTS", "on").lower() not in ('off', '0', 'false')
+TRANSCRIPT_QUEUE_SIZE = int(os.environ.get("AMIGO_TRANSCRIPT_QUEUE_SIZE", "10000"))
+TRANSCRIPT_BATCH_SIZE = int(os.environ.get("AMIGO_TRANSCRIPT_BATCH_SIZE", "500"))
+TRANSCRIPT_FLUSH_SECONDS = float(os.environ.get("AMIGO_TRANSCRIPT_FLUSH_SECONDS", "1"))
+TRANSCRIPT_PUT_TIMEOUT = float(os.environ.get("AMIGO_TRANSCRIPT_PUT_TIMEOUT", "0.05"))
+TRANSCRIPT_SPILL_DIR = os.environ.get(
+    "AMIGO_TRANSCRIPT_SPILL_DIR", os.path.join(tempfile.gettempdir(), 'amigo-transcripts')
+)
+
+# Attempts to write a batch before it is spilled
+MAX_WRITE_ATTEMPTS = 3
+
+TRANSCRIPTS_TABLE = Table(
+    'chat_transcripts',
+    database.METADATA,
+    Column('id', Integer, primary_key=True, autoincrement=True),
+    Column('created_at', Float, nullable=False),
+    Column('channel', String(16), nullable=False),
+    Column('session_id', String(128), nullable=False),
+    Column('intent', String(128), nullable=False),
+    Column('message', Text, nullable=False),
+    Column('response', Text, nullable=False),
+    Column('latency_ms', Float, nullable=False),
+    Index('ix_chat_transcripts_session', 'session_id', 'created_at'),
+)
+
+# Built once; SQLAlchemy sends a list of rows as multi-row INSERTs
+_INSERT_TURNS = insert(TRANSCRIPTS_TABLE)
+
+TRANSCRIPT_TURNS = REGISTRY.counter(
+    'amigo_transcript_turns_total',
+    'Transcript turns queued, written, spilled to disk, replayed from disk, and lost', ('outcome',)
+)
+TRANSCRIPT_BATCHES = REGISTRY.counter(
+    'amigo_transcript_batches_total', 'Multi-row transcript inserts written'
+)
+
+# Queue marker asking the flusher to write what it has and stop
+_STOP = object()
+
+
+def _same_file(fd, path):
+    """Check that an open descriptor is still the file at path (not renamed away)"""
+    try:
+        return os.stat(path).st_ino == os.fstat(fd).st_ino
+    except FileNotFoundError:
+        return False
+
+
+def _pid_alive(pid):
+    """Check whether a process with this id is running on this host"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class TranscriptSpill:
+    """
+    Append-only JSON Lines files holding turns the database did not take
+
+    Each process appends to its own spill-<pid>.jsonl under an exclusive
+    file lock and fsyncs every append. replay() claims a file by renaming it
+    while holding the same lock (an appender that opened it just before then
+    sees the rename and opens a fresh file), inserts all its rows in one
+    transaction and deletes it. A file that fails to insert is put back for
+    the next replay; a claim left by a process that died mid-replay is taken
+    over.
+    """
+
+    def __init__(self, directory=TRANSCRIPT_SPILL_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    def append(self, rows):
+        """
+        Append turns to this process's spill file
+
+        Args:
+            rows (list): Column values for chat_transcripts
+
+        Raises:
+            OSError: The file could not be written
+        """
+        data = ''.join(json.dumps(row, separators=(',', ':')) + '\n' for row in rows).encode('utf-8')
+        path = os.path.join(self.directory, f"spill-{os.getpid()}.jsonl")
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            while True:
+                fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                    if not _same_file(fd, path):
+                        continue  # claimed by a replay between open and lock
+                    view = memoryview(data)
+                    while view:
+                        view = view[os.write(fd, view):]
+                    os.fsync(fd)
+                    return
+                finally:
+                    os.close(fd)
+
+    def _claim(self, name):
+        """Rename a spill file to this process's claim, or return None if another process has it"""
+        path = os.path.join(self.directory, name)
+        claimed = os.path.join(self.directory, f"{name.split('.jsonl')[0]}.jsonl.replay-{os.getpid()}")
+        if '.jsonl.replay-' in name:
+            owner = name.rsplit('-', 1)[-1]
+            if not owner.isdigit() or int(owner) == os.getpid() or _pid_alive(int(owner)):
+                return None
+        elif not name.endswith('.jsonl'):
+            return None
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            return None
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            if not _same_file(fd, path):
+                return None
+            os.rename(path, claimed)
+        finally:
+            os.close(fd)
+        return claimed
+
+    def _read(self, path):
+        """Load the rows of a claimed file, skipping a line cut short by a crash"""
+        rows = []
+        with open(path, encoding='utf-8') as spill_file:
+            for line in spill_file:
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    logging.error(f"Skipping an unreadable transcript line in {path}")
+        return rows
+
+    def replay(self, engine, batch_size=TRANSCRIPT_BATCH_SIZE):
+        """
+        Write every spill file in the directory to chat_transcripts
+
+        Args:
+            engine (Engine): Database to insert into
+            batch_size (int): Rows per INSERT
+
+        Returns:
+            int: Turns written
+        """
+        try:
+            names = sorted(os.listdir(self.directory))
+        except FileNotFoundError:
+            return 0
+
+        replayed = 0
+        for name in names:
+            claimed = self._claim(name)
+            if claimed is None:
+                continue
+            rows = self._read(claimed)
+            try:
+                with engine.begin() as connection:
+                    for start in range(0, len(rows), batch_size):
+                        connection.execute(_INSERT_TURNS, rows[start:start + batch_size])
+            except Exception as e:
+                logging.error(f"Failed to replay {len(rows)} spilled transcript rows: {str(e)}")
+                os.rename(claimed, os.path.join(self.directory, f"retry-{os.getpid()}-{time.time_ns()}.jsonl"))
+                continue
+            os.remove(claimed)
+            replayed += len(rows)
+        return replayed
+
+
+class TranscriptWriter:
+    """
+    Bounded write-behind queue with a background batch flusher
+
+    append() never waits longer than put_timeout: when the queue is full the
+    turn goes to the spill file instead, so a slow database cannot slow down
+    replies. A batch that fails MAX_WRITE_ATTEMPTS times is spilled too, and
+    the flusher replays spill files when it starts. Without a spill, such
+    turns are lost and counted as dropped or failed.
+    """
+
+    def __init__(self, engine=None, queue_size=TRANSCRIPT_QUEUE_SIZE, batch_size=TRANSCRIPT_BATCH_SIZE,
+                 flush_seconds=TRANSCRIPT_FLUSH_SECONDS, put_timeout=TRANSCRIPT_PUT_TIMEOUT, spill=None):
+        self.engine = engine
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.put_timeout = put_timeout
+        self.spill = spill
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._thread_pid = None
+        self._lock = threading.Lock()
+        self._stats = {
+            'queued': 0, 'written': 0, 'spilled': 0, 'replayed': 0, 'dropped': 0, 'failed': 0, 'batches': 0
+        }
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+        if name == 'batches':
+            TRANSCRIPT_BATCHES.inc(amount=amount)
+        else:
+            TRANSCRIPT_TURNS.inc((name,), amount)
+
+    def _ensure_started(self):
+        """Start the flusher on first use in this process (threads do not survive fork)"""
+        if self._thread_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread_pid != os.getpid():
+                if self._thread is not None:
+                    # Inherited from the parent: its queue and thread belong to another process
+                    self._queue = queue.Queue(maxsize=self.queue_size)
+                self._thread = threading.Thread(target=self._run, name='amigo-transcripts', daemon=True)
+                self._thread.start()
+                self._thread_pid = os.getpid()
+
+    def start(self):
+        """Start the flusher ahead of the first turn, so spilled turns are replayed at startup"""
+        self._ensure_started()
+
+    def append(self, row):
+        """
+        Queue one turn for writing
+
+        Args:
+            row (dict): Column values for chat_transcripts
+
+        Returns:
+            bool: False when the queue was full (the turn was spilled, or
+                dropped when that failed too)
+        """
+        self._ensure_started()
+        try:
+            if self.put_timeout > 0:
+                self._queue.put(row, timeout=self.put_timeout)
+            else:
+                self._queue.put_nowait(row)
+        except queue.Full:
+            self._spill([row], 'dropped')
+            return False
+        self._count('queued')
+        return True
+
+    def _spill(self, rows, lost):
+        """Append turns the database did not take to the spill file, counting them as lost if that fails"""
+        if self.spill is not None:
+            try:
+                self.spill.append(rows)
+                self._count('spilled', len(rows))
+                return
+            except OSError as e:
+                logging.error(f"Failed to spill {len(rows)} transcript rows: {str(e)}")
+        self._count(lost, len(rows))
+
+    def _replay(self):
+        """Write turns spilled by earlier processes"""
+        try:
+            replayed = self.spill.replay(self.engine or database.get_engine(), self.batch_size)
+        except Exception as e:
+            logging.error(f"Failed to replay spilled transcripts: {str(e)}")
+            return
+        if replayed:
+            self._count('replayed', replayed)
+            logging.info(f"Replayed {replayed} spilled transcript rows")
+
+    def _run(self):
+        """Flusher loop: replay spilled turns, then collect rows until the batch is full or the interval passes"""
+        if self.spill is not None:
+            self._replay()
+        while True:
+            batch = []
+            stopping = False
+            deadline = None
+            while len(batch) < self.batch_size:
+                timeout = None if deadline is None else deadline - time.monotonic()
+                if timeout is not None and timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_seconds
+            if batch:
+                self._write(batch)
+            if stopping:
+                return
+
+    def _write(self, batch):
+        """Insert a batch, retrying briefly before spilling it"""
+        for attempt in range(1, MAX_WRITE_ATTEMPTS + 1):
+            try:
+                with (self.engine or database.get_engine()).begin() as connection:
+                    connection.execute(_INSERT_TURNS, batch)
+                self._count('written', len(batch))
+                self._count('batches')
+                return
+            except Exception as e:
+                logging.error(f"Failed to write {len(batch)} transcript rows (attempt {attempt}): {str(e)}")
+                time.sleep(0.2 * attempt)
+        self._spill(batch, 'failed')
+
+    def close(self, timeout=5.0):
+        """
+        Write every queued turn and stop the flusher
+
+        Turns still queued when the timeout runs out are spilled.
+
+        Args:
+            timeout (float): Seconds to wait for the final flush
+        """
+        thread = self._thread
+        if thread is None or self._thread_pid != os.getpid() or not thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logging.error("Transcript queue still full at shutdown; spilling the queued turns")
+        else:
+            thread.join(timeout)
+
+        leftover = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                leftover.append(item)
+        if leftover:
+            self._spill(leftover, 'dropped')
+        self._thread = None
+        self._thread_pid = None
+
+    def get_stats(self):
+        """
+        Get queue and write statistics since startup
+
+        The counts are also exported as amigo_transcript_turns_total and
+        amigo_transcript_batches_total.
+
+        Returns:
+            dict: Turns queued, written, spilled, replayed, dropped and failed,
+                batches written and current backlog
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats['backlog'] = self._queue.qsize()
+        return stats
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_transcript_writer():
+    """
+    Get the process-wide transcript writer
+
+    Returns:
+        TranscriptWriter: The writer, or None when transcripts are off or
+            DATABASE_URL is not set
+    """
+    global _writer
+    if _writer is None and TRANSCRIPTS_ENABLED and database.is_configured():
+        with _writer_lock:
+            if _writer is None:
+                _writer = TranscriptWriter(spill=TranscriptSpill())
+                atexit.register(_writer.close)
+    return _writer
+
+
+def record_turn(channel, session_id, intent, message, response, latency_ms):
+    """
+    Queue a chat or webhook turn for persistence without blocking
+
+    Args:
+        channel (str): 'chat' or 'webhook'
+        session_id (str): Session identifier
+        intent (str): Detected or Dialogflow intent name
+        message (str): The user's message
+        response (str): The reply sent back
+        latency_ms (float): Time taken to produce the reply
+    """
+    writer = get_transcript_writer()
+    if writer is None:
+        return
+    writer.append({
+        'created_at': time.time(),
+        'channel': channel,
+        'session_id': session_id,
+        'intent': intent or '',
+        'message': message or '',
+        'response': response or '',
+        'latency_ms': latency_ms
+    })
+
+
+def flush_transcripts(timeout=5.0):
+    """
+    Write all queued turns and stop the flusher; called on server shutdown
+
+    Args:
+        timeout (float): Seconds to wait for the final flush
+    """
+    if _writer is not None:
+        _writer.close(timeout)
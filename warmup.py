@@ -0,0 +1,233 @@
+"""
+Cold-start warmup and readiness
+Runs, once at startup, everything the first requests would otherwise pay for
+lazily: the intent engine (and classifier training), one call of every
+handler, the generative client and its SDK, the database pool, the
+transcript flusher (replaying turns spilled by earlier processes), the shared
+cache file, and Flask's URL matcher. Each phase is timed and the breakdown is logged; /ready answers
+200 only once warmup has finished. Configured through AMIGO_WARMUP:
+
+    on          warm up while the app module is imported, before serving (default)
+    background  serve /health at once and warm up in a thread; /ready waits for it
+    off         skip warmup; /ready answers 200 immediately
+"""
+
+import logging
+import os
+import threading
+import time
+
+WARMUP_MODE = os.environ.get("AMIGO_WARMUP", "on").lower()
+
+# One message per intent, run through detection and the matching handler
+WARMUP_MESSAGES = (
+    'hello there', "i'm doing well today", 'i feel sad and down', "i'm anxious about tomorrow",
+    "i'm so frustrated", 'what coping strategies can i use', 'can we do a breathing exercise',
+    'i need a grounding technique', 'i need some encouragement', 'how are you', 'goodbye',
+    'what is the weather like',
+)
+
+
+def warm_intent_detection():
+    """Load the configured engine (training the classifier if selected) and run it once"""
+    from intent_detection import INTENT_ENGINE, detect_intents_from_messages, set_intent_engine
+
+    set_intent_engine(INTENT_ENGINE)
+    intents = detect_intents_from_messages(list(WARMUP_MESSAGES))
+    return {'engine': INTENT_ENGINE, 'intents': len(set(intents))}
+
+
+def warm_handlers():
+    """
+    Re-freeze the dispatch table and call every handler once
+
+    Handlers are called directly, so handler statistics and metrics stay
+    untouched. The fallback handler gets no text, so it never calls the
+    generative backend during warmup.
+    """
+    from intent_detection import detect_intent_from_message
+    from intent_handlers import freeze_dispatch_table
+
+    table = freeze_dispatch_table()
+    samples = {detect_intent_from_message(message): message for message in WARMUP_MESSAGES}
+    for intent_name, handler in table.items():
+        query_text = samples.get(intent_name, '') if intent_name != 'fallback' else ''
+        handler({}, query_text, 'warmup', [])
+    return {'handlers': len(table)}
+
+
+def warm_generative():
+    """Create the generative worker pool and API client, when generation is enabled"""
+    import generative
+
+    client = generative.get_client()
+    if client is None:
+        return {'backend': 'off'}
+    client.warm()
+    return {'backend': client.backend.name}
+
+
+def warm_database():
+    """Create the engine and tables and open one pooled connection, when a database is configured"""
+    import database
+    from sqlalchemy import text
+
+    if not database.is_configured():
+        return {'configured': False}
+    with database.get_engine().connect() as connection:
+        connection.execute(text('SELECT 1'))
+    return {'configured': True}
+
+
+def warm_transcripts():
+    """Start the transcript flusher, which writes turns spilled by earlier processes, when transcripts are on"""
+    from transcripts import get_transcript_writer
+
+    writer = get_transcript_writer()
+    if writer is None:
+        return {'enabled': False}
+    writer.start()
+    return {'enabled': True}
+
+
+def warm_shared_cache():
+    """Create the shared cache file and table before workers race to, when a shared cache is configured"""
+    from shared_cache import get_shared_cache
+
+    cache = get_shared_cache()
+    if cache is None:
+        return {'backend': 'off'}
+    cache.get('warmup', 'ready')
+    return {'backend': cache.name}
+
+
+def warm_routing(app):
+    """Compile Flask's URL matcher and JSON provider"""
+    adapter = app.url_map.bind('localhost')
+    for path in ('/chat', '/chat/stream', '/webhook'):
+        adapter.match(path, method='POST')
+    app.json.dumps({'response': '', 'intent': ''})
+    return {'rules': len(list(app.url_map.iter_rules()))}
+
+
+def run_phases(phases):
+    """
+    Run warmup phases in order, timing each and recording failures
+
+    Args:
+        phases (tuple): (name, function) pairs; functions return a detail dict or None
+
+    Returns:
+        dict: Phase name mapped to its details and 'ms'
+    """
+    results = {}
+    for name, phase in phases:
+        phase_started = time.perf_counter()
+        try:
+            detail = phase() or {}
+        except Exception as e:
+            logging.error(f"Warmup phase {name} failed: {str(e)}")
+            detail = {'error': str(e)}
+        results[name] = dict(detail, ms=round((time.perf_counter() - phase_started) * 1000, 2))
+    return results
+
+
+class Warmup:
+    """
+    Runs the warmup phases once and tracks readiness
+
+    A phase that fails is logged and recorded, and warmup carries on: every
+    component also initializes lazily, so a failure only costs first-request
+    latency, never correctness.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self.started_at = None
+        self.total_ms = None
+        self.phases = {}
+        self._lock = threading.Lock()
+
+    def run(self, app):
+        """
+        Run every phase in order and mark the process ready
+
+        Args:
+            app (Flask): The application to warm up
+
+        Returns:
+            dict: Milliseconds and details per phase
+        """
+        with self._lock:
+            if self.ready:
+                return self.phases
+            started = time.perf_counter()
+            self.started_at = time.time()
+            self.phases = run_phases((
+                ('intent_detection', warm_intent_detection),
+                ('handlers', warm_handlers),
+                ('generative', warm_generative),
+                ('database', warm_database),
+                ('transcripts', warm_transcripts),
+                ('shared_cache', warm_shared_cache),
+                ('routing', lambda: warm_routing(app)),
+            ))
+            self.total_ms = round((time.perf_counter() - started) * 1000, 2)
+            self.ready = True
+
+        logging.info(
+            "Warmup finished in %.1f ms", self.total_ms,
+            extra={'fields': {'warmup_ms': self.total_ms,
+                              'phases_ms': {name: phase['ms'] for name, phase in self.phases.items()}}}
+        )
+        return self.phases
+
+    def warm_worker(self):
+        """
+        Repeat the per-process phases in a worker forked from a warmed-up master
+
+        Returns:
+            dict: Milliseconds and details per phase
+        """
+        phases = run_phases((
+            ('generative', warm_generative),
+            ('database', warm_database),
+            ('transcripts', warm_transcripts),
+        ))
+        logging.info(
+            "Worker warmup finished",
+            extra={'fields': {'phases_ms': {name: phase['ms'] for name, phase in phases.items()}}}
+        )
+        return phases
+
+    def start(self, app, mode=WARMUP_MODE):
+        """
+        Warm up according to the configured mode
+
+        Args:
+            app (Flask): The application to warm up
+            mode (str): 'on', 'background' or 'off'
+        """
+        if mode == 'off':
+            self.ready = True
+        elif mode == 'background':
+            threading.Thread(target=self.run, args=(app,), name='amigo-warmup', daemon=True).start()
+        else:
+            self.run(app)
+
+    def status(self):
+        """
+        Describe readiness for /ready
+
+        Returns:
+            dict: Whether warmup finished, and its total and per-phase timings
+        """
+        return {
+            'status': 'ready' if self.ready else 'warming_up',
+            'pid': os.getpid(),
+            'warmup_ms': self.total_ms,
+            'phases': self.phases,
+        }
+
+
+WARMUP = Warmup()